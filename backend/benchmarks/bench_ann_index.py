@@ -0,0 +1,75 @@
+"""
+Benchmark approximate nearest-neighbour search against exact search.
+
+Builds an exact index and an IVF index over clustered 7-dimensional audio-feature
+vectors, then reports recall@k and p50/p99 query latency for several nprobe values.
+
+Run from the backend directory:
+    python benchmarks/bench_ann_index.py --size 1000000 --queries 500 --k 15
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+
+import numpy as np
+
+from src.utils.ann_index import ExactIndex, IVFIndex
+
+DIM = 7
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000, help="Number of catalog vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--k", type=int, default=15, help="Neighbours per query")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--exclude", type=int, default=0, help="Random rows excluded per query (filtered search)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    # Real audio features cluster; a mixture of Gaussians is closer to that than uniform noise
+    centers = rng.random((64, DIM), dtype=np.float32)
+    vectors = np.clip(centers[rng.integers(0, 64, args.size)] + rng.normal(0, 0.12, (args.size, DIM)), 0, 1).astype(np.float32)
+    queries = rng.random((args.queries, DIM), dtype=np.float32)
+    excludes = [rng.integers(0, args.size, args.exclude).tolist() if args.exclude else None for _ in range(args.queries)]
+
+    exact = ExactIndex(DIM)
+    exact.add(vectors)
+    start = time.perf_counter()
+    ivf = IVFIndex(DIM)
+    ivf.add(vectors)
+    print(f"IVF build: {time.perf_counter() - start:.2f}s, nlist={ivf.nlist}, size={args.size}, k={args.k}, exclude={args.exclude}")
+
+    truth = []
+    exact_latencies = []
+    for query, exclude in zip(queries, excludes):
+        start = time.perf_counter()
+        rows, _ = exact.search(query, args.k, exclude)
+        exact_latencies.append(time.perf_counter() - start)
+        truth.append(set(rows.tolist()))
+
+    print(f"{'index':>12} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':>12} {1.0:>9.3f} {percentile_ms(exact_latencies, 50):>8.3f} {percentile_ms(exact_latencies, 99):>8.3f}")
+
+    for nprobe in args.nprobe:
+        latencies = []
+        hits = 0
+        for query, exclude, expected in zip(queries, excludes, truth):
+            start = time.perf_counter()
+            rows, _ = ivf.search(query, args.k, exclude, nprobe=nprobe)
+            latencies.append(time.perf_counter() - start)
+            hits += len(expected & set(rows.tolist()))
+        recall = hits / sum(len(expected) for expected in truth)
+        print(f"{f'ivf/{nprobe}':>12} {recall:>9.3f} {percentile_ms(latencies, 50):>8.3f} {percentile_ms(latencies, 99):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Load test the API against local stand-ins for Spotify, Nango and Reccobeats.
+
+Starts fake_upstreams.py and the app (uvicorn, pointed at the fakes) as
+subprocesses, then simulates N users: each polls /player/status every
+--poll-interval seconds, occasionally skips (POST /get_songs_recs after moving a
+little) or uses a player control. After a warmup, it reports requests per second
+and p50/p95/p99 latency per endpoint, plus upstream call amplification
+(upstream calls per API request), and saves everything as JSON so runs can be
+compared with --compare.
+
+Run from the backend directory:
+    python benchmarks/bench_load.py --users 100 --duration 60
+    python benchmarks/bench_load.py --users 100 --error-rate 0.05 --spotify-rate-limit 50 \\
+        --compare benchmarks/results/load_20260101-120000.json
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+import httpx
+
+from benchmarks.fake_upstreams import add_arguments as add_fake_arguments
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Around the zones in src/data/zones.json
+START_LAT = 40.11
+START_LON = -88.23
+CONTROL_ACTIONS = ["pause", "play", "next", "previous"]
+# App metrics worth keeping with the results (see /metrics)
+APP_METRIC_FAMILIES = ("cache_hit_ratio", "recommendations_served_total", "spotify_scheduler_throttled_total")
+
+
+def percentile_ms(sorted_samples: List[float], q: float) -> Optional[float]:
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * q / 100))
+    return round(sorted_samples[index] * 1000, 2)
+
+
+class Recorder:
+    """Collects latencies and outcomes per endpoint inside the measurement window"""
+
+    def __init__(self):
+        self.measuring = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, latency: float, status: str):
+        if self.measuring:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][status] += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / duration, 2),
+                "p50_ms": percentile_ms(samples, 50),
+                "p95_ms": percentile_ms(samples, 95),
+                "p99_ms": percentile_ms(samples, 99),
+                "max_ms": round(samples[-1] * 1000, 2),
+                "failed": sum(count for status, count in statuses.items() if not status.startswith("2")),
+                "statuses": dict(statuses),
+            }
+        return endpoints
+
+
+async def timed_request(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        response = None
+        status = type(e).__name__
+    recorder.record(endpoint, time.perf_counter() - started, status)
+    return response
+
+
+async def simulate_user(index: int, client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace, stop_at: float):
+    """One listener: a session-start recommendation, then status polls with occasional skips and controls"""
+    rng = random.Random(args.seed * 100_003 + index)
+    headers = {"X-Connection-Id": f"bench-user-{index}"}
+    latitude = START_LAT + rng.uniform(-0.02, 0.02)
+    longitude = START_LON + rng.uniform(-0.02, 0.02)
+
+    # Users don't all arrive in the same instant
+    await asyncio.sleep(rng.uniform(0, args.poll_interval))
+    recs_body = lambda: {"latitude": latitude, "longitude": longitude, "confirm_playback": not args.no_confirm}
+    await timed_request(client, recorder, "POST /get_songs_recs", "POST", "/get_songs_recs", headers=headers, json=recs_body())
+
+    next_poll = time.monotonic()
+    while True:
+        # Fixed-rate polling like the frontend's interval timer; a slow response delays only this user's next poll
+        next_poll = max(next_poll + args.poll_interval, time.monotonic())
+        if next_poll >= stop_at:
+            return
+        await asyncio.sleep(next_poll - time.monotonic())
+        await timed_request(client, recorder, "GET /player/status", "GET", "/player/status", headers=headers)
+
+        roll = rng.random()
+        if roll < args.skip_probability:
+            latitude += rng.uniform(-0.003, 0.003)
+            longitude += rng.uniform(-0.003, 0.003)
+            await timed_request(client, recorder, "POST /get_songs_recs", "POST", "/get_songs_recs", headers=headers, json=recs_body())
+        elif roll < args.skip_probability + args.control_probability:
+            action = rng.choice(CONTROL_ACTIONS)
+            await timed_request(client, recorder, "POST /player/control", "POST", "/player/control", headers=headers, json={"action": action})
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def fake_argv(args: argparse.Namespace, port: int) -> List[str]:
+    argv = [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_upstreams.py"), "--port", str(port)]
+    for name in (
+        "latency_ms", "spotify_latency_ms", "nango_latency_ms", "reccobeats_latency_ms", "jitter_ms",
+        "error_rate", "spotify_rate_limit", "spotify_429_rate", "retry_after",
+    ):
+        value = getattr(args, name)
+        if value is not None:
+            argv += ["--" + name.replace("_", "-"), str(value)]
+    return argv
+
+
+def app_env(fake_url: str, media_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        SPOTIFY_API_BASE_URL=f"{fake_url}/spotify/v1",
+        NANGO_API_BASE_URL=f"{fake_url}/nango",
+        RECCOBEATS_API_BASE_URL=f"{fake_url}/reccobeats/v1",
+        NANGO_SECRET_KEY="bench-secret",
+        MEDIA_CACHE_DIR=media_dir,
+        LOG_LEVEL=env.get("LOG_LEVEL", "WARNING"),
+    )
+    return env
+
+
+def parse_app_metrics(text: str) -> Dict[str, float]:
+    """Pick the APP_METRIC_FAMILIES samples out of the Prometheus text from /metrics"""
+    metrics = {}
+    for line in text.splitlines():
+        if line.startswith(APP_METRIC_FAMILIES):
+            name, _, value = line.rpartition(" ")
+            metrics[name] = float(value)
+    return metrics
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_port = args.fake_port or free_port()
+    app_port = args.app_port or free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    app_log = open(args.app_log, "w") if args.app_log else subprocess.DEVNULL
+
+    fake = subprocess.Popen(fake_argv(args, fake_port), cwd=BACKEND_DIR)
+    app = None
+    try:
+        await wait_until_ready(f"{fake_url}/_health", fake)
+        with tempfile.TemporaryDirectory(prefix="bench-media-") as media_dir:
+            app = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=BACKEND_DIR,
+                env=app_env(fake_url, media_dir),
+                stdout=app_log,
+                stderr=subprocess.STDOUT,
+            )
+            await wait_until_ready(f"{app_url}/health", app)
+            return await drive_load(args, app_url, fake_url)
+    finally:
+        for process in (app, fake):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        if args.app_log:
+            app_log.close()
+
+
+async def drive_load(args: argparse.Namespace, app_url: str, fake_url: str) -> Dict[str, Any]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client, httpx.AsyncClient(base_url=fake_url) as fake:
+        started = time.monotonic()
+        stop_at = started + args.warmup + args.duration
+        users = [asyncio.ensure_future(simulate_user(index, client, recorder, args, stop_at)) for index in range(args.users)]
+
+        print(f"Warming up {args.users} users for {args.warmup}s...")
+        await asyncio.sleep(args.warmup)
+        await fake.post("/_reset")
+        recorder.measuring = True
+        measure_started = time.monotonic()
+        print(f"Measuring for {args.duration}s...")
+
+        await asyncio.sleep(max(0.0, stop_at - time.monotonic()))
+        recorder.measuring = False
+        duration = time.monotonic() - measure_started
+        upstream = (await fake.get("/_stats")).json()
+        app_metrics = parse_app_metrics((await client.get("/metrics")).text)
+        # Users finish their in-flight request; anything that lands now is outside the window
+        await asyncio.gather(*users, return_exceptions=True)
+
+    endpoints = recorder.summary(duration)
+    total_requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    total_upstream = sum(upstream["calls"].values())
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "label": args.label,
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "app_log")},
+        "duration_seconds": round(duration, 2),
+        "total": {"requests": total_requests, "rps": round(total_requests / duration, 2)},
+        "endpoints": endpoints,
+        "upstream": {
+            "calls": upstream["calls"],
+            "calls_per_request": {name: round(count / total_requests, 3) if total_requests else None for name, count in upstream["calls"].items()},
+            "amplification": round(total_upstream / total_requests, 3) if total_requests else None,
+            "operations": upstream["operations"],
+            "outcomes": upstream["outcomes"],
+        },
+        "app_metrics": app_metrics,
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    print()
+    if not result["total"]["requests"]:
+        print("No requests completed inside the measurement window; try a longer --duration")
+        return
+    print(f"{'endpoint':<24} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'failed':>7}")
+    for name, endpoint in result["endpoints"].items():
+        print(
+            f"{name:<24} {endpoint['requests']:>9} {endpoint['rps']:>8.2f} {endpoint['p50_ms']:>9.1f} "
+            f"{endpoint['p95_ms']:>9.1f} {endpoint['p99_ms']:>9.1f} {endpoint['max_ms']:>9.1f} {endpoint['failed']:>7}"
+        )
+    print(f"{'total':<24} {result['total']['requests']:>9} {result['total']['rps']:>8.2f}")
+
+    upstream = result["upstream"]
+    print()
+    print(f"Upstream calls per API request: {upstream['amplification']}")
+    for name, count in sorted(upstream["calls"].items()):
+        print(f"  {name:<12} {count:>8} calls  {upstream['calls_per_request'][name]:>7} per request")
+    failures = {outcome: count for outcome, count in upstream["outcomes"].items() if not outcome.endswith("2xx")}
+    if failures:
+        print("  injected/returned failures: " + ", ".join(f"{outcome}={count}" for outcome, count in failures.items()))
+
+
+def print_comparison(baseline: Dict[str, Any], result: Dict[str, Any]):
+    def change(old, new):
+        if old in (None, 0) or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print()
+    print(f"Compared with {baseline.get('label') or baseline['timestamp']} ({baseline.get('revision')}):")
+    print(f"{'endpoint':<24} {'rps':>18} {'p95 ms':>22} {'p99 ms':>22}")
+    for name, endpoint in result["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old is None:
+            continue
+        columns = []
+        for key, width in (("rps", 18), ("p95_ms", 22), ("p99_ms", 22)):
+            columns.append(f"{f'{old[key]} -> {endpoint[key]} ({change(old[key], endpoint[key])})':>{width}}")
+        print(f"{name:<24} " + " ".join(columns))
+    old_amplification = baseline["upstream"]["amplification"]
+    new_amplification = result["upstream"]["amplification"]
+    print(f"{'amplification':<24} {old_amplification} -> {new_amplification} ({change(old_amplification, new_amplification)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Simulated concurrent users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10.0, help="Seconds of load before measuring")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between each user's status polls")
+    parser.add_argument("--skip-probability", type=float, default=0.05, help="Chance per poll that the user skips (new recommendation)")
+    parser.add_argument("--control-probability", type=float, default=0.02, help="Chance per poll of a play/pause/next/previous control")
+    parser.add_argument("--no-confirm", action="store_true", help="Send confirm_playback=false with recommendations")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout per request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--app-port", type=int, help="Port for the app (default: a free port)")
+    parser.add_argument("--fake-port", type=int, help="Port for the fake upstreams (default: a free port)")
+    parser.add_argument("--app-log", help="Write the app's output to this file")
+    parser.add_argument("--label", help="Name for this run in saved results and comparisons")
+    parser.add_argument("--output", help="Results JSON path (default: benchmarks/results/load_<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
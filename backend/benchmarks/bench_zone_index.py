@@ -0,0 +1,81 @@
+"""
+Benchmark zone lookup cost versus number of zones.
+
+Compares the grid-based ZoneIndex with a linear scan over the same zones
+(the approach get_genre_from_location_and_time used before).
+
+Run from the backend directory:
+    python benchmarks/bench_zone_index.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import random
+import timeit
+
+from src.utils.zones import Zone, ZoneIndex
+
+# Roughly a metro area around Champaign, IL
+LAT_RANGE = (39.9, 40.3)
+LON_RANGE = (-88.5, -88.0)
+ZONE_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+CELL_SIZES = [0.01, 0.002]
+LOOKUPS = 20_000
+
+
+def random_zone(i: int, rng: random.Random) -> Zone:
+    """Random small bbox or hexagon zone inside the benchmark area"""
+    lat = rng.uniform(*LAT_RANGE)
+    lon = rng.uniform(*LON_RANGE)
+    size = rng.uniform(0.001, 0.01)
+    zone_type = rng.choice(["urban", "suburban", "rural"])
+    if i % 2:
+        polygon = [
+            (lat + size * math.sin(angle), lon + size * math.cos(angle))
+            for angle in (k * math.pi / 3 for k in range(6))
+        ]
+        return Zone.from_dict({"name": f"zone_{i}", "type": zone_type, "priority": rng.randint(0, 3), "polygon": polygon})
+    return Zone(f"zone_{i}", zone_type, lat, lat + size, lon, lon + size, priority=rng.randint(0, 3))
+
+
+def linear_lookup(zones, lat, lon):
+    for zone in zones:
+        if zone.contains(lat, lon):
+            return zone
+    return None
+
+
+def main():
+    rng = random.Random(42)
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(LOOKUPS)]
+
+    grid_columns = " ".join(f"{f'grid@{cell_size} ns':>16}" for cell_size in CELL_SIZES)
+    print(f"{'zones':>8} {'build ms':>10} {grid_columns} {'linear ns':>12} {'hit rate':>9}")
+    for count in ZONE_COUNTS:
+        zones = [random_zone(i, rng) for i in range(count)]
+
+        build_ms = None
+        grid_ns = []
+        for cell_size in CELL_SIZES:
+            start = timeit.default_timer()
+            index = ZoneIndex(zones, cell_size=cell_size)
+            if build_ms is None:
+                build_ms = (timeit.default_timer() - start) * 1000
+
+            lookup = index.lookup
+            grid_seconds = min(timeit.repeat(lambda: [lookup(lat, lon) for lat, lon in points], number=1, repeat=5))
+            grid_ns.append(grid_seconds / len(points) * 1e9)
+        hits = sum(1 for lat, lon in points if lookup(lat, lon) is not None)
+
+        # Linear scans get slow quickly; sample fewer points for large zone counts
+        sample = points[: max(50, LOOKUPS * 100 // count)] if count > 100 else points
+        linear_seconds = min(timeit.repeat(lambda: [linear_lookup(zones, lat, lon) for lat, lon in sample], number=1, repeat=3))
+
+        grid_values = " ".join(f"{ns:>16.0f}" for ns in grid_ns)
+        print(f"{count:>8} {build_ms:>10.1f} {grid_values} {linear_seconds / len(sample) * 1e9:>12.0f} {hits / len(points):>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Local stand-ins for the Spotify Web API, Nango and Reccobeats, for load tests.
+
+One server answers all three under path prefixes, with configurable latency,
+error rate and Spotify 429 behaviour:
+
+    /spotify/v1/...     player state and controls, search, tracks, me
+    /nango/...          connection credentials and connect sessions
+    /reccobeats/v1/...  track recommendations
+
+Point the app at it with SPOTIFY_API_BASE_URL, NANGO_API_BASE_URL and
+RECCOBEATS_API_BASE_URL. GET /_stats returns call counts per upstream and
+operation; POST /_reset clears them. bench_load.py starts this automatically.
+
+Run from the backend directory:
+    python benchmarks/fake_upstreams.py --port 9100 --latency-ms 80 --error-rate 0.01
+"""
+import re
+import time
+import random
+import string
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+UPSTREAMS = ("spotify", "nango", "reccobeats")
+CATALOG_SIZE = 2000
+_ID_SEGMENT = re.compile(r"^[0-9A-Za-z]{22}$|^bench-user-\d+$")
+
+
+class FakeSettings:
+    """Latency and failure behaviour for each upstream"""
+
+    def __init__(
+        self,
+        latency_ms: Dict[str, float],
+        jitter_ms: float = 20.0,
+        error_rate: float = 0.0,
+        spotify_rate_limit: float = 0.0,
+        spotify_429_rate: float = 0.0,
+        retry_after: int = 1,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # Requests per second Spotify accepts before answering 429 (0 disables the limit)
+        self.spotify_rate_limit = spotify_rate_limit
+        self.spotify_429_rate = spotify_429_rate
+        self.retry_after = retry_after
+
+
+def make_track(index: int, host: str) -> Dict[str, Any]:
+    """A deterministic Spotify track object for catalog slot index"""
+    rng = random.Random(index)
+    track_id = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+    artist = f"Bench Artist {index % 150}"
+    return {
+        "id": track_id,
+        "name": f"Bench Track {index}",
+        "uri": f"spotify:track:{track_id}",
+        "duration_ms": rng.randint(120_000, 300_000),
+        "popularity": rng.randint(10, 90),
+        "preview_url": None,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        "artists": [{"name": artist}],
+        "album": {
+            "name": f"Bench Album {index % 400}",
+            # Plain http on a local host, so the app's media cache never fetches them
+            "images": [{"url": f"http://{host}/img/{track_id}/{size}"} for size in (640, 300, 64)],
+        },
+    }
+
+
+def create_app(settings: FakeSettings, host: str = "127.0.0.1") -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    catalog = [make_track(index, host) for index in range(CATALOG_SIZE)]
+    by_id = {track["id"]: track for track in catalog}
+    calls: Counter = Counter()
+    outcomes: Counter = Counter()
+    players: Dict[str, Dict[str, Any]] = {}
+    window = {"started": time.monotonic(), "count": 0}
+
+    def upstream_of(path: str) -> Optional[str]:
+        prefix = path.strip("/").split("/", 1)[0]
+        return prefix if prefix in UPSTREAMS else None
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        upstream = upstream_of(request.url.path)
+        if upstream is None:
+            return await call_next(request)
+
+        operation = request.method + " " + "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in request.url.path.split("/"))
+        calls[(upstream, operation)] += 1
+
+        latency = random.gauss(settings.latency_ms[upstream], settings.jitter_ms)
+        await asyncio.sleep(max(0.0, latency) / 1000)
+
+        if upstream == "spotify" and is_rate_limited():
+            outcomes[(upstream, "429")] += 1
+            return JSONResponse(
+                {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(settings.retry_after)},
+            )
+        if random.random() < settings.error_rate:
+            outcomes[(upstream, "5xx")] += 1
+            return JSONResponse({"error": {"status": 503, "message": "Injected failure"}}, status_code=503)
+
+        response = await call_next(request)
+        outcomes[(upstream, f"{response.status_code // 100}xx")] += 1
+        return response
+
+    def is_rate_limited() -> bool:
+        if settings.spotify_429_rate and random.random() < settings.spotify_429_rate:
+            return True
+        if not settings.spotify_rate_limit:
+            return False
+        # Fixed one-second windows, like a simple upstream limiter
+        now = time.monotonic()
+        if now - window["started"] >= 1.0:
+            window["started"] = now
+            window["count"] = 0
+        window["count"] += 1
+        return window["count"] > settings.spotify_rate_limit
+
+    def player_for(request: Request) -> Dict[str, Any]:
+        token = request.headers.get("authorization", "")
+        player = players.get(token)
+        if player is None:
+            player = players[token] = {
+                "is_playing": True,
+                "item": random.choice(catalog),
+                "progress_ms": 0,
+                "started_at": time.time(),
+                "device": {"name": "Bench Device", "type": "Computer"},
+            }
+        return player
+
+    # Spotify
+
+    @app.get("/spotify/v1/me/player")
+    async def current_playback(request: Request):
+        player = player_for(request)
+        if player["is_playing"]:
+            player["progress_ms"] = min(int((time.time() - player["started_at"]) * 1000), player["item"]["duration_ms"])
+        return {key: value for key, value in player.items() if key != "started_at"}
+
+    @app.put("/spotify/v1/me/player/play")
+    async def play(request: Request):
+        player = player_for(request)
+        body = await request.json() if await request.body() else {}
+        uris = body.get("uris") or []
+        if uris:
+            track_id = uris[0].rsplit(":", 1)[-1]
+            player["item"] = by_id.get(track_id) or {**random.choice(catalog), "id": track_id, "uri": uris[0]}
+            player["started_at"] = time.time()
+        player["is_playing"] = True
+        return Response(status_code=204)
+
+    @app.put("/spotify/v1/me/player/pause")
+    async def pause(request: Request):
+        player_for(request)["is_playing"] = False
+        return Response(status_code=204)
+
+    @app.post("/spotify/v1/me/player/next")
+    @app.post("/spotify/v1/me/player/previous")
+    async def skip(request: Request):
+        player = player_for(request)
+        player.update(item=random.choice(catalog), started_at=time.time(), is_playing=True)
+        return Response(status_code=204)
+
+    @app.put("/spotify/v1/me/player/seek")
+    async def seek(request: Request, position_ms: int = 0):
+        player_for(request)["started_at"] = time.time() - position_ms / 1000
+        return Response(status_code=204)
+
+    @app.get("/spotify/v1/search")
+    async def search(q: str, type: str = "track", limit: int = 10, offset: int = 0):
+        start = (hash(q) + offset) % CATALOG_SIZE
+        items = [catalog[(start + i) % CATALOG_SIZE] for i in range(min(limit, 50))]
+        return {"tracks": {"items": items, "limit": limit, "offset": offset, "total": CATALOG_SIZE}}
+
+    @app.get("/spotify/v1/tracks")
+    async def tracks(ids: str):
+        return {"tracks": [by_id.get(track_id) for track_id in ids.split(",")]}
+
+    @app.get("/spotify/v1/tracks/{track_id}")
+    async def track(track_id: str):
+        if track_id not in by_id:
+            return JSONResponse({"error": {"status": 404, "message": "Non existing id"}}, status_code=404)
+        return by_id[track_id]
+
+    @app.get("/spotify/v1/me")
+    async def me(request: Request):
+        return {"id": "bench", "display_name": "Bench User", "product": "premium"}
+
+    # Nango
+
+    @app.get("/nango/connection/{connection_id}")
+    async def connection(connection_id: str):
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        return {
+            "connection_id": connection_id,
+            "credentials": {
+                "type": "OAUTH2",
+                "access_token": f"bench-token-{connection_id}",
+                "expires_at": expires_at.isoformat().replace("+00:00", "Z"),
+                "raw": {"scope": "user-read-playback-state user-modify-playback-state"},
+            },
+        }
+
+    @app.post("/nango/connect/sessions")
+    async def connect_session():
+        return {"data": {"token": "bench-session-token", "expires_at": None}}
+
+    @app.delete("/nango/connection/{connection_id}")
+    async def delete_connection(connection_id: str):
+        return Response(status_code=204)
+
+    # Reccobeats
+
+    @app.get("/reccobeats/v1/track/recommendation")
+    async def recommendation(size: int = 15):
+        picks = random.sample(catalog, min(size, 100))
+        return {
+            "tracks": [
+                {
+                    "id": f"rb-{track['id']}",
+                    "trackTitle": track["name"],
+                    "artists": [{"name": track["artists"][0]["name"]}],
+                    "durationMs": track["duration_ms"],
+                    "href": track["external_urls"]["spotify"],
+                    "popularity": track["popularity"],
+                }
+                for track in picks
+            ]
+        }
+
+    # Bookkeeping for the load test
+
+    @app.get("/_stats")
+    async def stats():
+        per_upstream = Counter()
+        for (upstream, _), count in calls.items():
+            per_upstream[upstream] += count
+        return {
+            "calls": dict(per_upstream),
+            "operations": {f"{upstream} {operation}": count for (upstream, operation), count in sorted(calls.items())},
+            "outcomes": {f"{upstream} {outcome}": count for (upstream, outcome), count in sorted(outcomes.items())},
+        }
+
+    @app.post("/_reset")
+    async def reset():
+        calls.clear()
+        outcomes.clear()
+        return {"status": "reset"}
+
+    @app.get("/_health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Fake upstream options, shared with bench_load.py"""
+    parser.add_argument("--latency-ms", type=float, default=60.0, help="Mean latency for every upstream")
+    parser.add_argument("--spotify-latency-ms", type=float, help="Override the Spotify latency")
+    parser.add_argument("--nango-latency-ms", type=float, help="Override the Nango latency")
+    parser.add_argument("--reccobeats-latency-ms", type=float, help="Override the Reccobeats latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Standard deviation of upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream calls answered with a 503")
+    parser.add_argument("--spotify-rate-limit", type=float, default=0.0, help="Spotify requests per second before 429s (0: unlimited)")
+    parser.add_argument("--spotify-429-rate", type=float, default=0.0, help="Share of Spotify calls answered with a 429 regardless of rate")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+
+
+def settings_from_args(args: argparse.Namespace) -> FakeSettings:
+    return FakeSettings(
+        latency_ms={
+            upstream: getattr(args, f"{upstream}_latency_ms") if getattr(args, f"{upstream}_latency_ms") is not None else args.latency_ms
+            for upstream in UPSTREAMS
+        },
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        spotify_rate_limit=args.spotify_rate_limit,
+        spotify_429_rate=args.spotify_429_rate,
+        retry_after=args.retry_after,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_app(settings_from_args(args), f"{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Build the local track catalog (LOCAL_CATALOG_PATH) from a CSV of Spotify tracks
+with audio features.
+
+The local_catalog recommendation source is skipped until this file exists. Any
+export with a Spotify track id and the audio features works, including the
+public Spotify track datasets (columns such as track_id, track_name, artists,
+album_name); common column names are recognised, and rows with a malformed id
+or missing features are dropped. Cover art and preview urls are optional: the
+app fills in missing metadata with batched /tracks lookups.
+
+Run from the backend directory:
+    python scripts/build_catalog.py tracks.csv
+    python scripts/build_catalog.py part1.csv part2.csv --min-popularity 20 --limit 200000 --output src/data/catalog.csv
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import ast
+import argparse
+from typing import Optional, Dict, Any, List
+
+from src import config
+from src.utils.local_catalog import FEATURE_KEYS
+from src.utils.track import is_spotify_id
+
+COLUMNS = ("spotify_id", "name", "artist", "album", "duration_ms", "album_cover_url", "preview_url", "popularity") + FEATURE_KEYS
+
+# Output column -> accepted input column names, in order of preference
+ALIASES = {
+    "spotify_id": ("spotify_id", "track_id", "id"),
+    "name": ("name", "track_name", "title"),
+    "artist": ("artist", "artists", "artist_name", "artist_names"),
+    "album": ("album", "album_name"),
+    "duration_ms": ("duration_ms", "duration"),
+    "album_cover_url": ("album_cover_url", "image_url", "cover_url"),
+    "preview_url": ("preview_url",),
+    "popularity": ("popularity",),
+}
+
+
+def pick(record: Dict[str, str], column: str) -> Optional[str]:
+    """Return the first non-empty value among a column's accepted names"""
+    for name in ALIASES.get(column, (column,)):
+        value = record.get(name)
+        if value not in (None, ""):
+            return value.strip()
+    return None
+
+
+def first_artist(value: Optional[str]) -> Optional[str]:
+    """Datasets list artists as "A;B" or as a Python list literal; keep the first"""
+    if not value:
+        return None
+    if value.startswith("["):
+        try:
+            artists = ast.literal_eval(value)
+            return str(artists[0]) if artists else None
+        except (ValueError, SyntaxError):
+            pass
+    return value.split(";")[0].strip()
+
+
+def convert(record: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Map an input row to a catalog row (None if it lacks a valid id or any feature)"""
+    spotify_id = pick(record, "spotify_id")
+    if not is_spotify_id(spotify_id):
+        return None
+
+    row: Dict[str, Any] = {column: pick(record, column) for column in ALIASES}
+    row["spotify_id"] = spotify_id
+    row["artist"] = first_artist(row["artist"])
+    for key in FEATURE_KEYS:
+        try:
+            row[key] = float(record[key])
+        except (KeyError, TypeError, ValueError):
+            return None
+    return row
+
+
+def build(inputs: List[str], output: str, min_popularity: int, limit: Optional[int]) -> int:
+    """Write the catalog, keeping the first row seen per track; returns the number of tracks written"""
+    seen = set()
+    skipped = 0
+    tmp_path = output + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=COLUMNS)
+        writer.writeheader()
+        for path in inputs:
+            with open(path, newline="", encoding="utf-8") as f:
+                for record in csv.DictReader(f):
+                    row = convert(record)
+                    if row is None or row["spotify_id"] in seen:
+                        skipped += 1
+                        continue
+                    if min_popularity and int(float(row["popularity"] or 0)) < min_popularity:
+                        skipped += 1
+                        continue
+                    seen.add(row["spotify_id"])
+                    writer.writerow(row)
+                    if limit and len(seen) >= limit:
+                        break
+            if limit and len(seen) >= limit:
+                break
+    # Replace the old catalog only once the new one is complete
+    os.replace(tmp_path, output)
+    print(f"Wrote {len(seen)} tracks to {output} ({skipped} rows skipped)")
+    return len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="CSV files of Spotify tracks with audio features")
+    parser.add_argument("--output", default=config.LOCAL_CATALOG_PATH, help="Catalog file to write (default: LOCAL_CATALOG_PATH)")
+    parser.add_argument("--min-popularity", type=int, default=0, help="Drop tracks below this Spotify popularity")
+    parser.add_argument("--limit", type=int, help="Stop after this many tracks")
+    args = parser.parse_args()
+
+    if not build(args.inputs, args.output, args.min_popularity, args.limit):
+        sys.exit("No usable rows: inputs need a Spotify track id and the columns " + ", ".join(FEATURE_KEYS))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
 from .get_song import router as get_song_router
 from .auth import router as auth_router
+from .media import router as media_router
@@ -1,13 +1,19 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-import httpx
 import os
 
 from dotenv import load_dotenv
+from src.utils.client_pool import spotify_pool
+from src.utils.credential_cache import credential_cache
+from src.utils.http_clients import get_http_client
+from src.utils.prefetch_queue import prefetch_queue
+from src.utils.playback_cache import playback_cache
+from src.utils.log import get_logger
 
 load_dotenv(".env") 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
+log = get_logger(__name__)
 
 class AuthInfo(BaseModel):
     code: str
@@ -26,13 +32,14 @@ class NangoWebhook(BaseModel):
 
 @router.get("/callback", status_code=201)
 def callback(code: str):
-    print(code)
+    # The authorization code is a credential, so only its arrival is logged
+    log.info("auth.callback", "OAuth callback received")
 
 @router.get("/nango-session-token")
-def nango_session_token(user_id: str):
+async def nango_session_token(user_id: str):
 
-    response = httpx.post(
-        "https://api.nango.dev/connect/sessions",
+    response = await get_http_client("nango").post(
+        "/connect/sessions",
         headers={
             "Authorization": f"Bearer {os.getenv('NANGO_SECRET_KEY')}",
             "Content-Type": "application/json"
@@ -47,7 +54,7 @@ def nango_session_token(user_id: str):
         }
     )
     res = response.json()
-    print(res)
+    log.debug("auth.session_token", "Nango session created", user_id=user_id, status=response.status_code, response=res)
     return res.get("data", {})["token"]
 
 @router.post("/nango-webhook")
@@ -56,7 +63,8 @@ def nango_webhook(webhook_data: NangoWebhook):
     Handle webhooks from Nango for connection creation notifications.
     This endpoint receives POST requests when users successfully authorize connections.
     """
-    print(f"Received Nango webhook: {webhook_data}")
+    log.info("auth.webhook", "Received Nango webhook", type=webhook_data.type, operation=webhook_data.operation,
+             success=webhook_data.success, connection_id=webhook_data.connectionId)
     
     # Check if this is a successful auth creation webhook
     if (webhook_data.type == "auth" and 
@@ -68,7 +76,7 @@ def nango_webhook(webhook_data: NangoWebhook):
         end_user_id = webhook_data.endUser.endUserId
         organization_id = webhook_data.endUser.organizationId
         
-        print(f"New connection created - Connection ID: {connection_id}, User ID: {end_user_id}")
+        log.info("auth.connection_created", "New connection created", connection_id=connection_id, user_id=end_user_id)
         
         # TODO: Persist the connectionId alongside the corresponding user/organization in your database
         # Example database operation (replace with your actual database logic):
@@ -77,7 +85,7 @@ def nango_webhook(webhook_data: NangoWebhook):
         return {"status": "success", "message": "Webhook processed successfully"}
     
     else:
-        print(f"Received non-creation webhook: {webhook_data}")
+        log.info("auth.webhook.ignored", "Received non-creation webhook", type=webhook_data.type, operation=webhook_data.operation)
         return {"status": "received", "message": "Webhook received but not processed"}
 
 @router.post("/logout")
@@ -86,26 +94,33 @@ async def logout(connection_id: str):
     Revoke a Nango connection and sign out the user.
     This will delete the connection and revoke access tokens.
     """
+    # Drop the pooled Spotify client and everything cached for the connection first, so the
+    # token is never reused even if revoking it in Nango fails or times out
+    spotify_pool.evict(connection_id)
+    credential_cache.invalidate(connection_id)
+    prefetch_queue.invalidate(connection_id)
+    playback_cache.forget(connection_id)
+    
     try:
         # Revoke the connection in Nango
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"https://api.nango.dev/connection/{connection_id}",
-                headers={
-                    "Authorization": f"Bearer {os.getenv('NANGO_SECRET_KEY')}",
-                }
-            )
+        response = await get_http_client("nango").delete(
+            f"/connection/{connection_id}",
+            headers={
+                "Authorization": f"Bearer {os.getenv('NANGO_SECRET_KEY')}",
+            }
+        )
         
         if response.status_code == 204:
-            print(f"Successfully revoked connection: {connection_id}")
+            log.info("auth.logout", "Revoked connection", connection_id=connection_id)
             return {"status": "success", "message": "User logged out successfully"}
         else:
-            print(f"Failed to revoke connection {connection_id}: {response.status_code} - {response.text}")
+            log.warning("auth.logout.revoke_failed", "Failed to revoke connection", connection_id=connection_id,
+                        status=response.status_code, body=response.text[:500])
             # Even if Nango deletion fails, we can still consider the user "logged out" locally
             return {"status": "success", "message": "User logged out locally"}
             
     except Exception as e:
-        print(f"Error during logout for connection {connection_id}: {str(e)}")
+        log.exception("auth.logout.error", "Error during logout", connection_id=connection_id, error=str(e))
         return {"status": "error", "message": "Logout failed", "error": str(e)}
 
 
@@ -1,28 +1,47 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import random
 import asyncio
-import traceback
+import json
 from datetime import datetime
-from src.utils.spotify_service import spotify_service
+from src.utils.spotify_service import SpotifyService
+from src.utils.client_pool import spotify_pool
+from src.utils.credential_cache import credential_cache
+from src.utils.http_clients import get_http_client
+from src.utils.playback_cache import playback_cache
+from src.utils.player_stream import player_hub
+from src.utils.recommendation_cache import recommendation_cache, geohash_encode
+from src.utils.prefetch_queue import prefetch_queue
+from src.utils.recommendation_sources import recommendation_sourcer
+from src.utils.local_catalog import get_local_catalog
+from src.utils.track import Track
+from src.utils.track_metadata import track_metadata
+from src.utils.media_cache import media_cache, media_url
+from src.utils.search_cache import search_cache
+from src.utils.spotify_scheduler import spotify_scheduler, default_priority, Priority
+from src.utils.circuit_breaker import breakers, breaker_stats, CircuitOpenError
+from src import config
+from src.utils.log import get_logger, logging_stats
+from src.utils.metrics import Counter
+from src.utils.tracing import tracer, traced, span, annotate, detach
 
-# Try to import aiohttp for Reccobeats API, fallback if not available
-try:
-    import aiohttp
-    AIOHTTP_AVAILABLE = True
-except ImportError:
-    print("⚠️ aiohttp not available. Install with: pip install aiohttp")
-    AIOHTTP_AVAILABLE = False
+log = get_logger(__name__)
+
+recommendations_served = Counter(
+    "recommendations_served_total",
+    "/get_songs_recs responses by the recommendation source that served them",
+    ("source",),
+)
 
 # Try to import the sophisticated location logic, fallback if it fails
 try:
     from src.utils.spotify import get_genre_from_location_and_time
     from src.models.models import LocationPoint
     SOPHISTICATED_LOCATION_AVAILABLE = True
-    print("✅ Sophisticated location logic imported successfully")
 except ImportError as e:
-    print(f"⚠️ Could not import sophisticated location logic: {e}")
+    log.warning("location.import_failed", "Could not import sophisticated location logic", error=str(e))
     SOPHISTICATED_LOCATION_AVAILABLE = False
 
 router = APIRouter()
@@ -39,6 +58,8 @@ class PlaybackRequest(BaseModel):
 class LocationData(BaseModel):
     latitude: float
     longitude: float
+    # Wait until Spotify reports the new track; if False, return an optimistic status right away
+    confirm_playback: bool = True
 
 class LocationSkipRequest(BaseModel):
     latitude: float
@@ -49,11 +70,11 @@ class LocationSkipRequest(BaseModel):
 async def get_player_status(x_connection_id: Optional[str] = Header(None)):
     """Get current Spotify player status"""
     
-    print(f"🔍 Player status request - Connection ID: {x_connection_id}")
+    # Clients poll this every couple of seconds, so the event is sampled (LOG_SAMPLE_RATES)
+    log.info("player.status", "Player status request", connection_id=x_connection_id)
     
     # If no connection ID provided, return a "not authenticated" state
     if not x_connection_id:
-        print("❌ No connection ID provided")
         return {
             "is_playing": False,
             "current_song": None,
@@ -61,17 +82,11 @@ async def get_player_status(x_connection_id: Optional[str] = Header(None)):
             "message": "No Nango connection ID provided. Please authenticate with Spotify first."
         }
     
-    # Set the connection if provided
-    if x_connection_id:
-        print(f"🔗 Setting connection: {x_connection_id}")
-        spotify_service.set_connection(x_connection_id)
-        # Ensure the Spotify client is initialized
-        if not spotify_service.spotify:
-            print("🔄 Initializing Spotify client...")
-            await spotify_service._initialize_spotify_client()
+    # Get this connection's pooled client (initialized on first use)
+    spotify_service = await spotify_pool.get(x_connection_id)
     
     if not spotify_service.spotify:
-        print("❌ Spotify client still not available after initialization")
+        log.warning("player.status.unavailable", "Spotify client not available after initialization", connection_id=x_connection_id)
         return {
             "is_playing": False,
             "current_song": None,
@@ -79,11 +94,9 @@ async def get_player_status(x_connection_id: Optional[str] = Header(None)):
             "message": "Spotify API not available. Please authenticate with Nango first."
         }
     
-    print("✅ Spotify client is available, fetching playback state...")
-    
     try:
-        # Get current playback state from Spotify
-        playback_state = await spotify_service.get_current_playback()
+        # Get current playback state (cached briefly and shared between concurrent requests)
+        playback_state = await playback_cache.get(spotify_service)
         
         if not playback_state:
             return {
@@ -95,12 +108,14 @@ async def get_player_status(x_connection_id: Optional[str] = Header(None)):
         
         # Extract current song info
         track = playback_state.get('item', {})
+        album_cover = track.get('album', {}).get('images', [{}])[0].get('url') if track.get('album', {}).get('images') else None
         current_song = {
             "id": track.get('id'),
             "title": track.get('name'),
             "artist": ', '.join([artist['name'] for artist in track.get('artists', [])]),
             "album": track.get('album', {}).get('name'),
-            "album_cover": track.get('album', {}).get('images', [{}])[0].get('url') if track.get('album', {}).get('images') else None,
+            "album_cover": album_cover,
+            "album_cover_media_url": media_url(album_cover),
             "spotify_id": track.get('id')
         }
         
@@ -115,15 +130,50 @@ async def get_player_status(x_connection_id: Optional[str] = Header(None)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get Spotify status: {str(e)}")
 
+@router.get("/player/stream")
+async def stream_player_status(
+    request: Request,
+    x_connection_id: Optional[str] = Header(None),
+    connection_id: Optional[str] = Query(None),
+):
+    """
+    Stream player status as Server-Sent Events.
+
+    Sends a full "state" event first and "diff" events with only the changed keys
+    afterwards. EventSource can't set headers, so the connection ID may also be
+    passed as a query parameter.
+    """
+    connection_id = x_connection_id or connection_id
+    if not connection_id:
+        raise HTTPException(status_code=400, detail="No Nango connection ID provided. Please authenticate with Spotify first.")
+    
+    async def event_stream():
+        queue = player_hub.subscribe(connection_id, lambda: get_player_status(connection_id))
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event, payload = await asyncio.wait_for(queue.get(), timeout=config.PLAYER_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            player_hub.unsubscribe(connection_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/player/control")
 async def control_player(request: PlaybackRequest, x_connection_id: Optional[str] = Header(None)):
     """Control Spotify playback"""
     
-    # Set the connection if provided
-    if x_connection_id:
-        spotify_service.set_connection(x_connection_id)
+    spotify_service = await spotify_pool.get(x_connection_id) if x_connection_id else None
     
-    if not spotify_service.spotify:
+    if not spotify_service or not spotify_service.spotify:
         raise HTTPException(status_code=503, detail="Spotify API not available. Please authenticate with Nango first.")
     
     try:
@@ -140,6 +190,10 @@ async def control_player(request: PlaybackRequest, x_connection_id: Optional[str
         else:
             raise HTTPException(status_code=400, detail="Invalid action")
         
+        # The cached state is now out of date; let stream subscribers see the change quickly
+        playback_cache.invalidate(x_connection_id)
+        player_hub.nudge(x_connection_id)
+        
         # Return updated status
         return await get_player_status(x_connection_id)
         
@@ -156,11 +210,9 @@ async def get_song(x_connection_id: Optional[str] = Header(None)):
 async def refresh_spotify_metadata(x_connection_id: Optional[str] = Header(None)):
     """Refresh song metadata from Spotify API"""
     
-    # Set the connection if provided
-    if x_connection_id:
-        spotify_service.set_connection(x_connection_id)
+    spotify_service = await spotify_pool.get(x_connection_id) if x_connection_id else None
     
-    if not spotify_service.spotify:
+    if not spotify_service or not spotify_service.spotify:
         raise HTTPException(status_code=503, detail="Spotify API not available. Please authenticate with Nango first.")
     
     try:
@@ -178,13 +230,12 @@ async def refresh_spotify_metadata(x_connection_id: Optional[str] = Header(None)
 async def get_spotify_status(x_connection_id: Optional[str] = Header(None)):
     """Check if Spotify API is available and configured"""
     
-    # Set the connection if provided
-    if x_connection_id:
-        spotify_service.set_connection(x_connection_id)
+    # Only look at the pooled client; don't trigger a Nango lookup from a status check
+    spotify_service = spotify_pool.peek(x_connection_id)
     
-    has_nango_key = spotify_service.nango_secret_key is not None
-    has_connection = spotify_service.connection_id is not None
-    has_spotify_client = spotify_service.spotify is not None
+    has_nango_key = spotify_pool.nango_configured
+    has_connection = x_connection_id is not None
+    has_spotify_client = spotify_service is not None and spotify_service.spotify is not None
     
     return {
         "spotify_available": has_spotify_client,
@@ -197,6 +248,15 @@ async def get_spotify_status(x_connection_id: Optional[str] = Header(None)):
         )
     }
 
+@router.get("/upstream-status")
+async def get_upstream_status():
+    """Circuit breaker state for each upstream (Reccobeats, Nango, Spotify)"""
+    upstreams = breaker_stats()
+    return {
+        "healthy": all(upstream["state"] == "closed" for upstream in upstreams.values()),
+        "upstreams": upstreams
+    }
+
 @router.get("/spotify-auth")
 def spotify_auth():
     """Deprecated: Use Nango for Spotify authentication"""
@@ -213,23 +273,43 @@ def spotify_callback(code: str):
         detail="This endpoint is deprecated. Use Nango authentication instead."
     )
 
+@router.get("/debug/traces")
+def debug_traces(limit: int = Query(20, ge=1, le=config.TRACE_MAX_SLOW_TRACES)):
+    """The most recent slow (or profiled) /get_songs_recs traces, newest first, with their span trees"""
+    return {
+        "tracing": tracer.stats(),
+        "traces": tracer.traces(limit)
+    }
+
 @router.get("/debug/spotify")
 async def debug_spotify(x_connection_id: Optional[str] = Header(None)):
     """Debug endpoint to check Spotify connection and playback"""
     
+    pooled_service = spotify_pool.peek(x_connection_id)
     debug_info = {
         "connection_id_provided": x_connection_id is not None,
         "connection_id": x_connection_id,
-        "nango_key_configured": spotify_service.nango_secret_key is not None,
-        "spotify_client_initialized": spotify_service.spotify is not None,
+        "nango_key_configured": spotify_pool.nango_configured,
+        "spotify_client_initialized": pooled_service is not None and pooled_service.spotify is not None,
+        "client_pool": spotify_pool.stats(),
+        "credential_cache": credential_cache.stats(),
+        "playback_cache": playback_cache.stats(),
+        "player_stream": player_hub.stats(),
+        "recommendation_cache": recommendation_cache.stats(),
+        "recommendation_sources": recommendation_sourcer.stats(),
+        "prefetch_queue": prefetch_queue.stats(),
+        "track_metadata": track_metadata.stats(),
+        "media_cache": media_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "spotify_scheduler": spotify_scheduler.stats(),
+        "circuit_breakers": breaker_stats(),
+        "logging": logging_stats(),
+        "tracing": tracer.stats(),
     }
     
     if x_connection_id:
-        spotify_service.set_connection(x_connection_id)
-        
-        # Try to initialize if not already done
-        if not spotify_service.spotify:
-            await spotify_service._initialize_spotify_client()
+        # Get (and initialize if needed) this connection's pooled client
+        spotify_service = await spotify_pool.get(x_connection_id)
         
         debug_info.update({
             "spotify_client_after_init": spotify_service.spotify is not None,
@@ -238,7 +318,7 @@ async def debug_spotify(x_connection_id: Optional[str] = Header(None)):
         if spotify_service.spotify:
             try:
                 # Try to get user info to test API access
-                user_info = spotify_service.spotify.current_user()
+                user_info = await spotify_service.spotify.current_user()
                 debug_info["user_info"] = {
                     "id": user_info.get("id"),
                     "display_name": user_info.get("display_name"),
@@ -263,135 +343,254 @@ async def debug_spotify(x_connection_id: Optional[str] = Header(None)):
     return debug_info
 
 @router.post("/get_songs_recs")
+@traced("get_songs_recs")
 async def get_songs_recs(location_data: LocationData, x_connection_id: Optional[str] = Header(None)):
     """Get song recommendations based on user's current location and play them"""
     
-    print(f"🗺️ ===== NEW LOCATION-BASED RECOMMENDATION REQUEST =====")
-    print(f"🗺️ Getting location-based recommendations for lat: {location_data.latitude}, long: {location_data.longitude}")
-    print(f"🔗 Connection ID: {x_connection_id}")
+    log.info("recs.request", "Location-based recommendation request", connection_id=x_connection_id,
+             latitude=location_data.latitude, longitude=location_data.longitude)
+    annotate(connection_id=x_connection_id, confirm_playback=location_data.confirm_playback)
     
-    # Set the connection if provided
-    if x_connection_id:
-        spotify_service.set_connection(x_connection_id)
-        # Ensure the Spotify client is initialized
-        if not spotify_service.spotify:
-            print("🔄 Initializing Spotify client...")
-            await spotify_service._initialize_spotify_client()
+    with span("client_init"):
+        spotify_service = await spotify_pool.get(x_connection_id) if x_connection_id else None
     
-    if not spotify_service.spotify:
-        print("❌ Spotify client not available")
+    if not spotify_service or not spotify_service.spotify:
+        log.warning("recs.unavailable", "Spotify client not available", connection_id=x_connection_id)
         raise HTTPException(status_code=503, detail="Spotify API not available. Please authenticate with Nango first.")
     
     try:
-        print("🎵 Generating location-based recommendations...")
-        # Generate location-based search terms and find songs
-        recommended_tracks = await generate_location_recommendations(location_data)
+        with span("classify"):
+            location_analysis = analyze_location(location_data) if SOPHISTICATED_LOCATION_AVAILABLE else None
+            context = prefetch_context(location_data, location_analysis)
         
-        if not recommended_tracks:
-            print("❌ No recommendations generated")
-            return {
-                "message": "No recommendations found for your location",
-                "location": {"latitude": location_data.latitude, "longitude": location_data.longitude},
-                "recommendations": []
-            }
+        # Skips are served straight from the prefetched queue while the user stays in the same zone
+        selected_track = prefetch_queue.pop(x_connection_id, context)
+        if selected_track:
+            log.debug("recs.prefetch_hit", "Using prefetched recommendation", connection_id=x_connection_id)
+            recommendations_served.inc(source="prefetch_queue")
+            annotate(source="prefetch_queue")
+            recommended_tracks = [selected_track] + prefetch_queue.peek(x_connection_id)
+        else:
+            # Generate location-based search terms and find songs
+            with span("recommend"):
+                source, recommended_tracks = await generate_location_recommendations(location_data, spotify_service, location_analysis)
+            recommendations_served.inc(source=source or "none")
+            annotate(source=source or "none")
+            
+            if not recommended_tracks:
+                log.warning("recs.empty", "No recommendations generated", connection_id=x_connection_id)
+                return {
+                    "message": "No recommendations found for your location",
+                    "location": {"latitude": location_data.latitude, "longitude": location_data.longitude},
+                    "recommendations": []
+                }
+            
+            # Pick a random track instead of always the first one, and queue the rest for the next skips
+            selected_track = random.choice(recommended_tracks)
+            prefetch_queue.mark_played(x_connection_id, context, selected_track)
+            prefetch_queue.extend(x_connection_id, context, [track for track in recommended_tracks if track is not selected_track])
+        
+        # Keep the queue topped up in the background for the next skip
+        prefetch_queue.schedule_refill(
+            x_connection_id,
+            context,
+            lambda: prefetch_location_recommendations(location_data, spotify_service, location_analysis)
+        )
+        
+        # Download cover art and previews for this track and the queued ones before the client asks for them
+        media_cache.warm_tracks([selected_track] + prefetch_queue.peek(x_connection_id))
         
-        # Pick a random track instead of always the first one
-        selected_track = random.choice(recommended_tracks)
-        print(f"🎯 Attempting to play: {selected_track['name']} by {selected_track['artist']}")
-        print(f"🆔 Track Spotify ID: {selected_track['spotify_id']}")
-        print(f"🎲 Selected track {recommended_tracks.index(selected_track) + 1} out of {len(recommended_tracks)} recommendations")
+        log.info("recs.selected", "Selected track", connection_id=x_connection_id, spotify_id=selected_track.spotify_id,
+                 name=selected_track.name, artist=selected_track.artist,
+                 position=recommended_tracks.index(selected_track) + 1, count=len(recommended_tracks))
         
         try:
             # Try to start playback with the recommended track
-            print("📡 Calling Spotify API to start playback...")
-            spotify_service.spotify.start_playback(uris=[f"spotify:track:{selected_track['spotify_id']}"])
-            print(f"✅ Started playing recommended track: {selected_track['name']} by {selected_track['artist']}")
+            track_uri = f"spotify:track:{selected_track.spotify_id}"
+            with span("start_playback"):
+                await spotify_service.spotify.start_playback(uris=[track_uri])
+            playback_cache.invalidate(x_connection_id)
+            player_hub.nudge(x_connection_id)
+            log.debug("recs.playback_started", "Started playing recommended track", connection_id=x_connection_id, spotify_id=selected_track.spotify_id)
             
-            # Wait a bit for the track to start playing properly
-            print("⏳ Waiting 2 seconds for track to load...")
-            await asyncio.sleep(2)
-            
-            # Return updated status with the new song
-            print("🔄 Getting updated player status...")
-            status = await get_player_status(x_connection_id)
-            print(f"📊 Current player status: {status}")
+            if location_data.confirm_playback:
+                # Poll until Spotify reports the new track (or the deadline passes)
+                with span("confirm_playback") as confirm_span:
+                    confirmed_state = await spotify_service.wait_for_track(track_uri)
+                    if confirm_span is not None:
+                        confirm_span.attrs["confirmed"] = confirmed_state is not None
+                if confirmed_state:
+                    playback_cache.prime(x_connection_id, confirmed_state)
+                
+                # Return updated status with the new song
+                with span("player_status"):
+                    status = await get_player_status(x_connection_id)
+            else:
+                status = build_optimistic_status(selected_track)
             
-            status['location_recommendations'] = recommended_tracks
-            status['selected_track_info'] = selected_track
+            status['location_recommendations'] = [track.to_dict() for track in recommended_tracks]
+            status['selected_track_info'] = selected_track.to_dict()
             status['location'] = {"latitude": location_data.latitude, "longitude": location_data.longitude}
-            status['message'] = f"Playing location-based recommendation: {selected_track['name']}"
+            status['message'] = f"Playing location-based recommendation: {selected_track.name}"
             
-            print(f"✅ Returning status with current_song: {status.get('current_song', {}).get('title', 'Unknown')}")
+            log.debug("recs.status", "Returning player status", connection_id=x_connection_id,
+                      is_playing=status.get('is_playing'), current_song=(status.get('current_song') or {}).get('title'))
             return status
             
         except Exception as play_error:
-            print(f"❌ Error starting playback: {play_error}")
-            print(f"❌ Error type: {type(play_error).__name__}")
+            log.error("recs.playback_error", "Error starting playback", connection_id=x_connection_id,
+                      error_type=type(play_error).__name__, error=str(play_error))
             # If we can't play, still return the recommendations
             return {
                 "message": f"Found recommendations but couldn't start playback: {str(play_error)}",
                 "location": {"latitude": location_data.latitude, "longitude": location_data.longitude},
-                "recommendations": recommended_tracks,
-                "selected_track_info": selected_track,
+                "recommendations": [track.to_dict() for track in recommended_tracks],
+                "selected_track_info": selected_track.to_dict(),
                 "error": str(play_error)
             }
         
     except Exception as e:
-        print(f"❌ Error getting location recommendations: {e}")
-        print(f"❌ Error type: {type(e).__name__}")
-        import traceback
-        print(f"❌ Full traceback: {traceback.format_exc()}")
+        log.exception("recs.error", "Error getting location recommendations", connection_id=x_connection_id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to get location recommendations: {str(e)}")
 
-async def generate_location_recommendations(location: LocationData) -> List[Dict[str, Any]]:
-    """Generate song recommendations based on location using sophisticated logic if available"""
+def build_optimistic_status(track: Track) -> Dict[str, Any]:
+    """Build a player status for a track we just asked Spotify to play, without confirming it"""
+    return {
+        "is_playing": True,
+        "current_song": {
+            "id": track.spotify_id,
+            "title": track.name,
+            "artist": track.artist,
+            "album": track.album,
+            "album_cover": track.album_cover_url,
+            "album_cover_media_url": media_url(track.album_cover_url),
+            "spotify_id": track.spotify_id
+        },
+        "current_time": 0,
+        "duration": (track.duration_ms or 0) // 1000,
+        "device": "Unknown",
+        "optimistic": True
+    }
+
+async def generate_location_recommendations(
+    location: LocationData,
+    spotify_service: SpotifyService,
+    location_analysis: Optional[Dict[str, Any]] = None
+) -> Tuple[Optional[str], List[Track]]:
+    """Generate song recommendations based on location, hedging the sophisticated logic against search (returns the winning source too)"""
+    
+    sources = []
+    if location_analysis is None and SOPHISTICATED_LOCATION_AVAILABLE:
+        location_analysis = analyze_location(location)
+    if location_analysis:
+        # The local catalog answers in milliseconds, so it goes first when available
+        if get_local_catalog() is not None:
+            sources.append(("local_catalog", lambda: generate_local_catalog_recommendations(location_analysis, spotify_service)))
+        sources.append(("reccobeats", lambda: generate_sophisticated_location_recommendations(location, location_analysis, spotify_service)))
+    # Fallback to simple recommendations, started after the hedge delay or as soon as the above fails
+    sources.append(("spotify_search", lambda: generate_simple_location_recommendations(location, spotify_service)))
+    
+    source, recommended_tracks = await recommendation_sourcer.first(sources)
+    log.info("recs.source", "Recommendations served", source=source, count=len(recommended_tracks))
+    return source, recommended_tracks
+
+async def prefetch_location_recommendations(
+    location: LocationData,
+    spotify_service: SpotifyService,
+    location_analysis: Optional[Dict[str, Any]]
+) -> List[Track]:
+    """Generate recommendations for the prefetch queue, behind user-facing Spotify calls"""
+    # Runs in the queue's refill task, so this only affects that task's Spotify calls (and keeps
+    # its spans out of the trace of the request that scheduled it)
+    default_priority.set(Priority.PREFETCH)
+    detach()
+    _, recommended_tracks = await generate_location_recommendations(location, spotify_service, location_analysis)
+    return recommended_tracks
+
+def prefetch_context(location: LocationData, location_analysis: Optional[Dict[str, Any]]) -> tuple:
+    """Key a user's prefetch queue by zone and time bucket (coarse geohash cell outside known zones)"""
+    if location_analysis:
+        return (location_analysis['zone'] or geohash_encode(location.latitude, location.longitude, 4), location_analysis['time_of_day'])
+    return (geohash_encode(location.latitude, location.longitude, 4), datetime.now().hour)
+
+def analyze_location(location: LocationData) -> Optional[Dict[str, Any]]:
+    """Run the location and time analysis for the current moment (None on failure)"""
+    try:
+        # Create LocationPoint object for your existing function
+        location_point = LocationPoint(
+            latitude=location.latitude,
+            longitude=location.longitude
+        )
+        
+        # Use your sophisticated location and time analysis
+        location_analysis = get_genre_from_location_and_time(location_point, datetime.now())
+        log.debug("location.analysis", "Location analysis", location_type=location_analysis["location_type"],
+                  zone=location_analysis["zone"], time_of_day=location_analysis["time_of_day"])
+        return location_analysis
     
-    if SOPHISTICATED_LOCATION_AVAILABLE:
-        try:
-            print("🎯 Using sophisticated location logic with Reccobeats API...")
-            
-            # Create LocationPoint object for your existing function
-            location_point = LocationPoint(
-                latitude=location.latitude,
-                longitude=location.longitude
-            )
-            
-            # Get current time
-            current_time = datetime.now()
-            
-            # Use your sophisticated location and time analysis
-            location_analysis = get_genre_from_location_and_time(location_point, current_time)
-            
-            print(f"🗺️ Location analysis: {location_analysis}")
-            
-            # Get songs using Reccobeats API with your audio features
-            recommended_tracks = await get_tracks_from_reccobeats(location_analysis["audio_features"])
-            
-            # Add metadata about why this was recommended
-            for track in recommended_tracks:
-                track['recommendation_reason'] = f"{location_analysis['time_of_day'].title()} time in {location_analysis['location_type']} area"
-                track['location_type'] = location_analysis['location_type']
-                track['time_of_day'] = location_analysis['time_of_day']
-                track['audio_features_used'] = location_analysis['audio_features']
-            
-            print(f"✅ Found {len(recommended_tracks)} sophisticated recommendations from Reccobeats")
-            if recommended_tracks:
-                return recommended_tracks
-            else:
-                print("⚠️ No tracks from Reccobeats, falling back...")
-                
-        except Exception as e:
-            print(f"❌ Error in sophisticated location recommendations: {e}")
-            print("🔄 Falling back to simple recommendations...")
+    except Exception as e:
+        log.error("location.analysis.error", "Error in location analysis", error=str(e))
+        return None
+
+async def generate_local_catalog_recommendations(location_analysis: Dict[str, Any], spotify_service: SpotifyService) -> List[Track]:
+    """Generate song recommendations from the local catalog's nearest neighbours"""
+    catalog = get_local_catalog()
+    # Skip tracks this user just heard or already has queued, so skips keep bringing new ones
+    recommended_tracks = catalog.recommend(
+        location_analysis["audio_features"],
+        n=config.LOCAL_CATALOG_RECOMMENDATIONS,
+        exclude_ids=prefetch_queue.known_ids(spotify_service.connection_id),
+    )
+    # Catalog rows may not carry cover art or popularity; fill them in with one batched lookup
+    await track_metadata.enrich(recommended_tracks, spotify_service.spotify)
+    annotate_recommendations(recommended_tracks, location_analysis)
+    log.debug("recs.local_catalog", "Recommendations from the local catalog", count=len(recommended_tracks))
+    return recommended_tracks
+
+async def generate_sophisticated_location_recommendations(
+    location: LocationData,
+    location_analysis: Dict[str, Any],
+    spotify_service: SpotifyService
+) -> List[Track]:
+    """Generate song recommendations using location/time analysis and Reccobeats (empty list on failure)"""
     
-    # Fallback to simple recommendations
-    return await generate_simple_location_recommendations(location)
+    try:
+        # Users in the same cell at the same time share one pool of Reccobeats tracks
+        cache_key = recommendation_cache.make_key(
+            location.latitude,
+            location.longitude,
+            location_analysis['time_of_day'],
+            location_analysis['audio_features']
+        )
+        recommended_tracks = await recommendation_cache.get_or_fetch(
+            cache_key,
+            lambda: get_reccobeats_recommendations(location_analysis, spotify_service)
+        )
+        
+        log.debug("recs.reccobeats", "Recommendations from Reccobeats", count=len(recommended_tracks))
+        return recommended_tracks
+            
+    except Exception as e:
+        log.error("recs.reccobeats.error", "Error in sophisticated location recommendations", error=str(e))
+        return []
+
+async def get_reccobeats_recommendations(location_analysis: Dict[str, Any], spotify_service: SpotifyService) -> List[Track]:
+    """Get tracks from Reccobeats for a location analysis, fill in their Spotify metadata and annotate why they were recommended"""
+    recommended_tracks = await get_tracks_from_reccobeats(location_analysis["audio_features"])
+    # Reccobeats often omits cover art, popularity and previews; the pool is cached, so this runs once per pool
+    await track_metadata.enrich(recommended_tracks, spotify_service.spotify)
+    annotate_recommendations(recommended_tracks, location_analysis)
+    return recommended_tracks
+
+def annotate_recommendations(tracks: List[Track], location_analysis: Dict[str, Any]):
+    """Add metadata about why these tracks were recommended"""
+    reason = f"{location_analysis['time_of_day'].title()} time in {location_analysis['location_type']} area"
+    for track in tracks:
+        track.annotate(reason, location_analysis['location_type'], location_analysis['time_of_day'], location_analysis['audio_features'])
 
-async def generate_simple_location_recommendations(location: LocationData) -> List[Dict[str, Any]]:
+async def generate_simple_location_recommendations(location: LocationData, spotify_service: SpotifyService) -> List[Track]:
     """Fallback simple location-based recommendations that should always work"""
     
-    print("🔄 Using simple location recommendations...")
-    
     latitude = location.latitude
     longitude = location.longitude
     
@@ -406,10 +605,6 @@ async def generate_simple_location_recommendations(location: LocationData) -> Li
     else:  # Default - more global variety
         base_terms = ["popular", "trending", "indie", "rock", "pop", "electronic"]
     
-    # Add some randomness and time-based variety
-    import random
-    from datetime import datetime
-    
     # Add time-based terms
     current_hour = datetime.now().hour
     if 6 <= current_hour <= 12:  # Morning
@@ -425,100 +620,94 @@ async def generate_simple_location_recommendations(location: LocationData) -> Li
     random.shuffle(base_terms)
     search_terms = base_terms[:3]  # Use 3 random terms
     
-    print(f"🎲 Using randomized search terms: {search_terms}")
+    log.debug("recs.search_terms", "Using randomized search terms", terms=search_terms)
+    
+    # Popular tracks are the last resort, searched only if the regional searches find nothing
+    # (search fetches are shared and shielded, so starting them early would spend the rate
+    # limit even if they were cancelled)
+    random_years = ["2024", "2023", "2022", "2021"]
+    random_genres = ["pop", "rock", "indie", "electronic", "alternative"]
+    popular_searches = [(random.choice(random_years), random.choice(random_genres)) for _ in range(3)]
+    
+    semaphore = asyncio.Semaphore(config.SEARCH_FANOUT_CONCURRENCY)
+    # Add randomness to the searches by using different offsets; offsets are whole pages
+    # so repeated terms can be served from the search cache
+    regional_tasks = {
+        asyncio.ensure_future(search_tracks(spotify_service, search_term, 10, random.randint(0, 10) * 10, semaphore)): search_term
+        for search_term in search_terms
+    }
+    popular_tasks: Dict[asyncio.Future, Any] = {}
     
     recommendations = []
+    seen_ids = set()
     
-    for search_term in search_terms:
-        try:
-            print(f"🔍 Searching for: {search_term}")
-            # Add randomness to the search by using different offsets
-            offset = random.randint(0, 100)  # Random offset to get different results
-            results = spotify_service.spotify.search(q=search_term, type='track', limit=10, offset=offset)
-            
-            if results['tracks']['items']:
-                # Take a random selection from the results
-                available_tracks = results['tracks']['items']
-                random.shuffle(available_tracks)
-                
-                for track in available_tracks[:3]:  # Take up to 3 from each search
-                    track_info = {
-                        'spotify_id': track['id'],
-                        'name': track['name'],
-                        'artist': track['artists'][0]['name'],
-                        'album': track['album']['name'],
-                        'duration_ms': track['duration_ms'],
-                        'album_cover_url': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                        'preview_url': track['preview_url'],
-                        'external_urls': track['external_urls'],
-                        'popularity': track['popularity'],
-                        'recommendation_reason': f"Regional recommendation: {search_term}",
-                        'location_type': "regional",
-                        'time_of_day': "any"
-                    }
-                    recommendations.append(track_info)
-                    
-            if len(recommendations) >= 9:  # Get more recommendations
-                break
-                
-        except Exception as e:
-            print(f"❌ Error in search for {search_term}: {e}")
-            continue
+    def add_track(track_data: Dict[str, Any], reason: str, location_type: str):
+        # Deduplicate by spotify_id as results arrive
+        if track_data['id'] in seen_ids:
+            return
+        seen_ids.add(track_data['id'])
+        track = Track.from_spotify(track_data)
+        track.annotate(reason, location_type, "any")
+        recommendations.append(track)
     
-    # If still no recommendations, get some popular tracks with randomness
-    if len(recommendations) == 0:
-        try:
-            print("🔍 Getting popular tracks as last resort...")
-            # Use random years and genres for variety
-            random_years = ["2024", "2023", "2022", "2021"]
-            random_genres = ["pop", "rock", "indie", "electronic", "alternative"]
-            
-            for _ in range(3):  # Try multiple searches
-                year = random.choice(random_years)
-                genre = random.choice(random_genres)
-                search_query = f"year:{year} genre:{genre}"
-                offset = random.randint(0, 500)
-                
-                popular_results = spotify_service.spotify.search(q=search_query, type='track', limit=5, offset=offset)
-                for track in popular_results['tracks']['items']:
-                    track_info = {
-                        'spotify_id': track['id'],
-                        'name': track['name'],
-                        'artist': track['artists'][0]['name'],
-                        'album': track['album']['name'],
-                        'duration_ms': track['duration_ms'],
-                        'album_cover_url': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                        'preview_url': track['preview_url'],
-                        'external_urls': track['external_urls'],
-                        'popularity': track['popularity'],
-                        'recommendation_reason': f"Popular track ({year} {genre})",
-                        'location_type': "global",
-                        'time_of_day': "any"
-                    }
-                    recommendations.append(track_info)
-                    
-                if len(recommendations) >= 6:
-                    break
-                    
-        except Exception as e:
-            print(f"❌ Error getting popular tracks: {e}")
+    try:
+        async for search_term, available_tracks in iterate_as_completed(regional_tasks):
+            # Take a random selection of up to 3 from each search
+            random.shuffle(available_tracks)
+            for track in available_tracks[:3]:
+                add_track(track, f"Regional recommendation: {search_term}", "regional")
+        
+        # If still no recommendations, use the popular tracks with randomness
+        if len(recommendations) == 0:
+            log.debug("recs.search_popular", "Getting popular tracks as last resort")
+            popular_tasks = {
+                asyncio.ensure_future(search_tracks(spotify_service, f"year:{year} genre:{genre}", 5, random.randint(0, 100) * 5, semaphore)): (year, genre)
+                for year, genre in popular_searches
+            }
+            async for (year, genre), available_tracks in iterate_as_completed(popular_tasks):
+                for track in available_tracks:
+                    add_track(track, f"Popular track ({year} {genre})", "global")
+    finally:
+        # Drop searches we no longer need (or everything, if we were cancelled by the hedger)
+        for task in list(regional_tasks) + list(popular_tasks):
+            task.cancel()
     
     # Shuffle the final recommendations for even more randomness
     random.shuffle(recommendations)
     
-    print(f"✅ Simple recommendations found: {len(recommendations)} tracks")
+    log.debug("recs.spotify_search", "Simple recommendations found", count=len(recommendations))
     return recommendations[:12]  # Return up to 12 recommendations
 
-async def get_tracks_from_reccobeats(audio_features: dict) -> List[Dict[str, Any]]:
+async def search_tracks(spotify_service: SpotifyService, query: str, limit: int, offset: int, semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """Run one Spotify track search under the fan-out semaphore and timeout (empty list on failure)"""
+    try:
+        async with semaphore:
+            with span("search", query=query):
+                results = await asyncio.wait_for(
+                    search_cache.search(spotify_service.spotify, q=query, type='track', limit=limit, offset=offset),
+                    timeout=config.SEARCH_FANOUT_TIMEOUT_SECONDS
+                )
+        # Copy the list since cached responses are shared and callers shuffle it
+        return list(results['tracks']['items'])
+    except asyncio.TimeoutError:
+        log.warning("search.timeout", "Search timed out", query=query)
+        return []
+    except Exception as e:
+        log.error("search.error", "Error in search", query=query, error=str(e))
+        return []
+
+async def iterate_as_completed(tasks: Dict[asyncio.Future, Any]):
+    """Yield (label, result) for each task in a {task: label} dict as soon as it finishes"""
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield tasks[task], task.result()
+
+async def get_tracks_from_reccobeats(audio_features: dict) -> List[Track]:
     """Get track recommendations from Reccobeats API based on audio features"""
     
-    if not AIOHTTP_AVAILABLE:
-        print("❌ aiohttp not available, cannot call Reccobeats API")
-        return []
-        
     try:
-        print(f"🎵 Calling Reccobeats API with audio features: {audio_features}")
-        
         # Prepare the query parameters for Reccobeats API
         # Based on the API docs: size, seeds, negativeSeeds, and audio features
         params = {
@@ -548,64 +737,47 @@ async def get_tracks_from_reccobeats(audio_features: dict) -> List[Dict[str, Any
         num_seeds = random.randint(1, 3)
         params["seeds"] = random.sample(popular_seeds, num_seeds)
         
-        print(f"📡 Sending GET request to Reccobeats with params: {params}")
+        log.debug("reccobeats.request", "Requesting Reccobeats recommendations", **params)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://api.reccobeats.com/v1/track/recommendation",
+        # An open breaker fails this immediately, so the hedger moves straight on to the fallback
+        with breakers["reccobeats"].guard() as call:
+            response = await get_http_client("reccobeats").get(
+                "/track/recommendation",
                 params=params,
                 headers={"Content-Type": "application/json"}
-            ) as response:
-                
-                if response.status == 200:
-                    data = await response.json()
-                    print(f"✅ Reccobeats API response received")
-                    print(f"📊 Response data keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-                    
-                    tracks = []
-                    # The API might return tracks in different formats, let's handle multiple possibilities
-                    track_list = []
-                    if isinstance(data, list):
-                        track_list = data
-                    elif isinstance(data, dict):
-                        track_list = data.get('tracks', data.get('recommendations', data.get('data', [])))
-                    
-                    print(f"📊 Found {len(track_list)} tracks in response")
-                    
-                    for track_data in track_list:
-                        # Convert Reccobeats response to our format
-                        # Handle different possible field names
-                        track_info = {
-                            'spotify_id': track_data.get('spotify_id', track_data.get('id', track_data.get('track_id'))),
-                            'name': track_data.get('name', track_data.get('title', track_data.get('track_name', 'Unknown Track'))),
-                            'artist': track_data.get('artist', track_data.get('artist_name', track_data.get('artists', 'Unknown Artist'))),
-                            'album': track_data.get('album', track_data.get('album_name', 'Unknown Album')),
-                            'duration_ms': track_data.get('duration_ms', track_data.get('duration', 0)),
-                            'album_cover_url': track_data.get('album_cover_url', track_data.get('image_url', track_data.get('cover_url'))),
-                            'preview_url': track_data.get('preview_url'),
-                            'external_urls': track_data.get('external_urls', {}),
-                            'popularity': track_data.get('popularity', 50),
-                            'reccobeats_score': track_data.get('score', track_data.get('confidence', 0))
-                        }
-                        
-                        # Only add tracks that have a spotify_id
-                        if track_info['spotify_id']:
-                            tracks.append(track_info)
-                    
-                    print(f"✅ Successfully parsed {len(tracks)} tracks from Reccobeats")
-                    
-                    # Add some randomization
-                    random.shuffle(tracks)
-                    return tracks
-                
-                else:
-                    print(f"❌ Reccobeats API error: {response.status}")
-                    error_text = await response.text()
-                    print(f"❌ Error response: {error_text}")
-                    return []
-                    
+            )
+            if response.status_code >= 500:
+                call.failed()
+        
+        if response.status_code == 200:
+            data = response.json()
+            tracks = []
+            # The API might return tracks in different formats, let's handle multiple possibilities
+            track_list = []
+            if isinstance(data, list):
+                track_list = data
+            elif isinstance(data, dict):
+                track_list = data.get('tracks', data.get('recommendations', data.get('data', [])))
+            
+            for track_data in track_list:
+                # Convert Reccobeats response to our format; tracks without a spotify_id are skipped
+                track = Track.from_reccobeats(track_data)
+                if track:
+                    tracks.append(track)
+            
+            log.debug("reccobeats.response", "Parsed Reccobeats tracks", received=len(track_list), parsed=len(tracks))
+            
+            # Add some randomization
+            random.shuffle(tracks)
+            return tracks
+        
+        else:
+            log.error("reccobeats.http_error", "Reccobeats API error", status=response.status_code, body=response.text[:500])
+            return []
+            
+    except CircuitOpenError as e:
+        log.info("reccobeats.skipped", "Skipping Reccobeats", reason=str(e))
+        return []
     except Exception as e:
-        print(f"❌ Error calling Reccobeats API: {e}")
-        import traceback
-        print(f"❌ Full traceback: {traceback.format_exc()}")
+        log.exception("reccobeats.error", "Error calling Reccobeats API", error=str(e))
         return []
\ No newline at end of file
@@ -0,0 +1,85 @@
+import os
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+from starlette.types import Scope, Receive, Send
+
+from src.utils.media_cache import media_cache, MediaBlob
+from src import config
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+class CachedFileResponse(FileResponse):
+    """FileResponse keeping its blob pinned in the media cache until the file has been sent"""
+
+    def __init__(self, blob: MediaBlob, stat_result: os.stat_result):
+        super().__init__(
+            blob.path,
+            media_type=blob.content_type,
+            headers={
+                # Blobs are content-addressed, so a given response never changes
+                "Cache-Control": f"public, max-age={config.MEDIA_CACHE_MAX_AGE_SECONDS}, immutable",
+                "ETag": f'"{blob.digest}"',
+            },
+            stat_result=stat_result,
+        )
+        self.digest = blob.digest
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            media_cache.release(self.digest)
+
+
+async def media_response(blob: MediaBlob) -> Optional[FileResponse]:
+    """
+    Serve a cached file (FileResponse handles Range requests and uses sendfile where the server supports it).
+
+    Returns None if the blob was evicted before it could be pinned, or its file is missing from disk.
+    """
+    if not media_cache.pin(blob.digest):
+        return None
+    try:
+        stat_result = await asyncio.to_thread(os.stat, blob.path)
+    except OSError:
+        media_cache.release(blob.digest)
+        media_cache.discard(blob.digest)
+        return None
+    return CachedFileResponse(blob, stat_result)
+
+
+@router.get("")
+async def get_media(url: str = Query(..., description="Spotify CDN URL of album art or a preview clip")):
+    """Serve album art or a preview clip from the on-disk cache, downloading it on first use"""
+    if not media_cache.is_allowed(url):
+        raise HTTPException(status_code=400, detail="Only Spotify CDN media URLs can be proxied")
+
+    blob = await media_cache.get(url)
+    response = await media_response(blob) if blob is not None else None
+    if response is None and blob is not None:
+        # Evicted (or deleted from disk) before it could be served; download it once more
+        blob = await media_cache.get(url)
+        response = await media_response(blob) if blob is not None else None
+    if response is None:
+        raise HTTPException(status_code=502, detail="Could not fetch media from Spotify")
+    return response
+
+
+@router.get("/stats")
+async def get_media_stats():
+    """Media cache size and hit ratio"""
+    return media_cache.stats()
+
+
+@router.get("/{digest}")
+async def get_media_blob(digest: str):
+    """Serve a cached file by its SHA-256 digest"""
+    blob = media_cache.get_blob(digest)
+    response = await media_response(blob) if blob is not None else None
+    if response is None:
+        raise HTTPException(status_code=404, detail="Media not cached")
+    return response
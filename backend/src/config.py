@@ -1,8 +1,165 @@
-LOCATION_GRID_GENRE_MAP = {
-    (37.7749, -122.4194): "rock",
-    (37.7749, -122.4194): "rock",
-    (37.7749, -122.4194): "rock",
-    (37.7749, -122.4194): "rock",
-    (37.7749, -122.4194): "rock",
-    (37.7749, -122.4194): "rock",
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Location zones used to classify coordinates as urban/suburban/rural
+ZONES_PATH = os.getenv("ZONES_PATH", os.path.join(DATA_DIR, "zones.json"))
+ZONE_INDEX_CELL_SIZE_DEGREES = float(os.getenv("ZONE_INDEX_CELL_SIZE_DEGREES", "0.01"))
+# Location type used for points outside every zone
+DEFAULT_LOCATION_TYPE = os.getenv("DEFAULT_LOCATION_TYPE", "urban")
+
+# (location type x time bucket) -> audio feature profiles
+AUDIO_PROFILES_PATH = os.getenv("AUDIO_PROFILES_PATH", os.path.join(DATA_DIR, "audio_profiles.json"))
+
+# Per-connection Spotify client pool
+SPOTIFY_POOL_MAX_SIZE = int(os.getenv("SPOTIFY_POOL_MAX_SIZE", "256"))
+SPOTIFY_POOL_IDLE_TTL_SECONDS = float(os.getenv("SPOTIFY_POOL_IDLE_TTL_SECONDS", "900"))
+SPOTIFY_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("SPOTIFY_TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+
+# Nango credential cache
+NANGO_CREDENTIAL_REFRESH_MARGIN_SECONDS = float(os.getenv("NANGO_CREDENTIAL_REFRESH_MARGIN_SECONDS", "60"))
+NANGO_CREDENTIAL_DEFAULT_TTL_SECONDS = float(os.getenv("NANGO_CREDENTIAL_DEFAULT_TTL_SECONDS", "300"))
+NANGO_CREDENTIAL_MIN_REFRESH_SECONDS = float(os.getenv("NANGO_CREDENTIAL_MIN_REFRESH_SECONDS", "5"))
+
+# Upstream HTTP connection pools (one shared client per upstream, see utils/http_clients.py)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+SPOTIFY_API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+SPOTIFY_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_MAX_CONNECTIONS", "100"))
+SPOTIFY_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SPOTIFY_MAX_KEEPALIVE_CONNECTIONS", "20"))
+SPOTIFY_TIMEOUT_SECONDS = float(os.getenv("SPOTIFY_TIMEOUT_SECONDS", "10"))
+SPOTIFY_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SPOTIFY_CONNECT_TIMEOUT_SECONDS", "5"))
+
+NANGO_API_BASE_URL = os.getenv("NANGO_API_BASE_URL", "https://api.nango.dev")
+NANGO_MAX_CONNECTIONS = int(os.getenv("NANGO_MAX_CONNECTIONS", "20"))
+NANGO_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("NANGO_MAX_KEEPALIVE_CONNECTIONS", "10"))
+NANGO_TIMEOUT_SECONDS = float(os.getenv("NANGO_TIMEOUT_SECONDS", "10"))
+NANGO_CONNECT_TIMEOUT_SECONDS = float(os.getenv("NANGO_CONNECT_TIMEOUT_SECONDS", "5"))
+
+RECCOBEATS_API_BASE_URL = os.getenv("RECCOBEATS_API_BASE_URL", "https://api.reccobeats.com/v1")
+RECCOBEATS_MAX_CONNECTIONS = int(os.getenv("RECCOBEATS_MAX_CONNECTIONS", "50"))
+RECCOBEATS_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("RECCOBEATS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+RECCOBEATS_TIMEOUT_SECONDS = float(os.getenv("RECCOBEATS_TIMEOUT_SECONDS", "5"))
+RECCOBEATS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("RECCOBEATS_CONNECT_TIMEOUT_SECONDS", "3"))
+
+# Spotify's image and preview CDN (absolute URLs, so no base URL)
+MEDIA_CDN_MAX_CONNECTIONS = int(os.getenv("MEDIA_CDN_MAX_CONNECTIONS", "20"))
+MEDIA_CDN_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MEDIA_CDN_MAX_KEEPALIVE_CONNECTIONS", "10"))
+MEDIA_CDN_TIMEOUT_SECONDS = float(os.getenv("MEDIA_CDN_TIMEOUT_SECONDS", "10"))
+MEDIA_CDN_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MEDIA_CDN_CONNECT_TIMEOUT_SECONDS", "3"))
+
+# Per-connection playback state cache for /player/status
+PLAYBACK_CACHE_TTL_SECONDS = float(os.getenv("PLAYBACK_CACHE_TTL_SECONDS", "1.0"))
+
+# Server-push player state stream (/player/stream)
+PLAYER_STREAM_PLAYING_INTERVAL_SECONDS = float(os.getenv("PLAYER_STREAM_PLAYING_INTERVAL_SECONDS", "1.0"))
+PLAYER_STREAM_PAUSED_INTERVAL_SECONDS = float(os.getenv("PLAYER_STREAM_PAUSED_INTERVAL_SECONDS", "5.0"))
+PLAYER_STREAM_BOOST_INTERVAL_SECONDS = float(os.getenv("PLAYER_STREAM_BOOST_INTERVAL_SECONDS", "0.25"))
+PLAYER_STREAM_BOOST_DURATION_SECONDS = float(os.getenv("PLAYER_STREAM_BOOST_DURATION_SECONDS", "3.0"))
+PLAYER_STREAM_KEEPALIVE_SECONDS = float(os.getenv("PLAYER_STREAM_KEEPALIVE_SECONDS", "15.0"))
+
+# Confirming playback of a newly started track in /get_songs_recs
+PLAYBACK_CONFIRM_TIMEOUT_SECONDS = float(os.getenv("PLAYBACK_CONFIRM_TIMEOUT_SECONDS", "3.0"))
+PLAYBACK_CONFIRM_INITIAL_INTERVAL_SECONDS = float(os.getenv("PLAYBACK_CONFIRM_INITIAL_INTERVAL_SECONDS", "0.15"))
+PLAYBACK_CONFIRM_MAX_INTERVAL_SECONDS = float(os.getenv("PLAYBACK_CONFIRM_MAX_INTERVAL_SECONDS", "0.8"))
+PLAYBACK_CONFIRM_BACKOFF = float(os.getenv("PLAYBACK_CONFIRM_BACKOFF", "1.5"))
+
+# Shared recommendation pools keyed by geohash cell x time bucket x quantised audio features
+RECOMMENDATION_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "600"))
+RECOMMENDATION_CACHE_STALE_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_STALE_SECONDS", "1800"))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "2048"))
+RECOMMENDATION_CACHE_GEOHASH_PRECISION = int(os.getenv("RECOMMENDATION_CACHE_GEOHASH_PRECISION", "6"))
+RECOMMENDATION_CACHE_FEATURE_QUANTUM = float(os.getenv("RECOMMENDATION_CACHE_FEATURE_QUANTUM", "0.05"))
+RECOMMENDATION_SAMPLE_SIZE = int(os.getenv("RECOMMENDATION_SAMPLE_SIZE", "10"))
+
+# Hedged recommendation sourcing: start the next source after this delay (0 = race all at once, <0 = strictly sequential)
+RECOMMENDATION_HEDGE_DELAY_SECONDS = float(os.getenv("RECOMMENDATION_HEDGE_DELAY_SECONDS", "0.8"))
+
+# Concurrent Spotify searches in the simple recommendation fallback
+SEARCH_FANOUT_CONCURRENCY = int(os.getenv("SEARCH_FANOUT_CONCURRENCY", "6"))
+SEARCH_FANOUT_TIMEOUT_SECONDS = float(os.getenv("SEARCH_FANOUT_TIMEOUT_SECONDS", "3.0"))
+
+# Local track catalog used as a first-class recommendation source (skipped if the file doesn't exist;
+# none ships with the repo, build one with scripts/build_catalog.py)
+LOCAL_CATALOG_PATH = os.getenv("LOCAL_CATALOG_PATH", os.path.join(DATA_DIR, "catalog.csv"))
+LOCAL_CATALOG_RECOMMENDATIONS = int(os.getenv("LOCAL_CATALOG_RECOMMENDATIONS", "15"))
+
+# Nearest-neighbour index behind the local catalog ("exact" or "ivf")
+ANN_INDEX = os.getenv("ANN_INDEX", "exact")
+ANN_IVF_NLIST = int(os.getenv("ANN_IVF_NLIST", "0"))  # 0 = 4 * sqrt(catalog size)
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))
+
+# Per-connection prefetched next-track queue for /get_songs_recs
+PREFETCH_QUEUE_DEPTH = int(os.getenv("PREFETCH_QUEUE_DEPTH", "5"))
+PREFETCH_QUEUE_MAX_CONNECTIONS = int(os.getenv("PREFETCH_QUEUE_MAX_CONNECTIONS", "1024"))
+PREFETCH_RECENTLY_PLAYED = int(os.getenv("PREFETCH_RECENTLY_PLAYED", "20"))
+
+# Batched /tracks metadata lookups (Spotify allows up to 50 ids per call)
+TRACK_METADATA_BATCH_WINDOW_SECONDS = float(os.getenv("TRACK_METADATA_BATCH_WINDOW_SECONDS", "0.02"))
+TRACK_METADATA_BATCH_SIZE = int(os.getenv("TRACK_METADATA_BATCH_SIZE", "50"))
+TRACK_METADATA_CACHE_MAX_ENTRIES = int(os.getenv("TRACK_METADATA_CACHE_MAX_ENTRIES", "20000"))
+TRACK_METADATA_CACHE_TTL_SECONDS = float(os.getenv("TRACK_METADATA_CACHE_TTL_SECONDS", "86400"))
+TRACK_METADATA_NEGATIVE_TTL_SECONDS = float(os.getenv("TRACK_METADATA_NEGATIVE_TTL_SECONDS", "600"))
+TRACK_METADATA_TIMEOUT_SECONDS = float(os.getenv("TRACK_METADATA_TIMEOUT_SECONDS", "2.0"))
+
+# On-disk cache of album art and preview clips served from /media
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "spoton-media-cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MEDIA_CACHE_MAX_FILE_BYTES = int(os.getenv("MEDIA_CACHE_MAX_FILE_BYTES", str(5 * 1024 * 1024)))
+# Source URLs remembered (each a small record file); the least recently used are forgotten past this
+MEDIA_CACHE_MAX_URLS = int(os.getenv("MEDIA_CACHE_MAX_URLS", "50000"))
+# Only media from these hosts (or their subdomains) is fetched
+MEDIA_CACHE_ALLOWED_HOSTS = tuple(host.strip() for host in os.getenv("MEDIA_CACHE_ALLOWED_HOSTS", "scdn.co,spotifycdn.com").split(",") if host.strip())
+MEDIA_CACHE_MAX_AGE_SECONDS = int(os.getenv("MEDIA_CACHE_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+MEDIA_CACHE_WARM_CONCURRENCY = int(os.getenv("MEDIA_CACHE_WARM_CONCURRENCY", "4"))
+
+# Spotify search result cache (search_track and fallback searches)
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+SEARCH_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL_SECONDS", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "4096"))
+
+# Outbound Spotify scheduler: token buckets for the whole app and per user, with priority classes
+SPOTIFY_APP_RATE_PER_SECOND = float(os.getenv("SPOTIFY_APP_RATE_PER_SECOND", "20"))
+SPOTIFY_APP_BURST = float(os.getenv("SPOTIFY_APP_BURST", "40"))
+SPOTIFY_USER_RATE_PER_SECOND = float(os.getenv("SPOTIFY_USER_RATE_PER_SECOND", "4"))
+SPOTIFY_USER_BURST = float(os.getenv("SPOTIFY_USER_BURST", "8"))
+SPOTIFY_SCHEDULER_MAX_USERS = int(os.getenv("SPOTIFY_SCHEDULER_MAX_USERS", "4096"))
+# Background (prefetch) calls are rejected rather than queued beyond this depth
+SPOTIFY_SCHEDULER_MAX_QUEUE = int(os.getenv("SPOTIFY_SCHEDULER_MAX_QUEUE", "1000"))
+# A 429 is retried once, after its Retry-After, if that's no longer than this
+SPOTIFY_MAX_RETRY_AFTER_SECONDS = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER_SECONDS", "5"))
+
+# Circuit breakers for upstreams (Reccobeats, Nango, Spotify), over a rolling window of calls
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_ERROR_RATE_THRESHOLD = float(os.getenv("CIRCUIT_ERROR_RATE_THRESHOLD", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "2.5"))
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD = float(os.getenv("CIRCUIT_SLOW_CALL_RATE_THRESHOLD", "0.8"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+# Structured logging (see utils/log.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Per-event sampling for high-frequency events, e.g. "player.status=0.05,search.request=0.2"
+LOG_SAMPLE_RATES = {
+    event.strip(): float(rate)
+    for event, _, rate in (item.partition("=") for item in os.getenv("LOG_SAMPLE_RATES", "player.status=0.05,player.playback=0.05").split(","))
+    if event.strip() and rate
 }
+
+# Request tracing (see utils/tracing.py): span trees for traced endpoints, keeping the slowest
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_SLOW_THRESHOLD_SECONDS = float(os.getenv("TRACE_SLOW_THRESHOLD_SECONDS", "1.0"))
+TRACE_MAX_SLOW_TRACES = int(os.getenv("TRACE_MAX_SLOW_TRACES", "50"))
+TRACE_MAX_CHILD_SPANS = int(os.getenv("TRACE_MAX_CHILD_SPANS", "100"))
+# Opt-in statistical profiling: share of traced requests to profile (0 disables it)
+TRACE_PROFILE_SAMPLE_RATE = float(os.getenv("TRACE_PROFILE_SAMPLE_RATE", "0"))
+TRACE_PROFILE_INTERVAL_SECONDS = float(os.getenv("TRACE_PROFILE_INTERVAL_SECONDS", "0.005"))
+TRACE_PROFILE_TOP_N = int(os.getenv("TRACE_PROFILE_TOP_N", "25"))
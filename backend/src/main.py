@@ -2,13 +2,44 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
-from src.api import get_song_router, auth_router
+from src.api import get_song_router, auth_router, media_router
+from src.utils.http_clients import start_http_clients, close_http_clients
+from src.utils.zones import get_zone_index
+from src.utils.audio_profiles import get_audio_profile_table
+from src.utils.local_catalog import get_local_catalog
+from src.utils.media_cache import media_cache
+from src.utils.log import close_logging, logging_stats
+from src.utils.metrics import RequestMetricsMiddleware, register_collector, stats_collector, render_metrics
+from src.utils.credential_cache import credential_cache
+from src.utils.playback_cache import playback_cache
+from src.utils.recommendation_cache import recommendation_cache
+from src.utils.prefetch_queue import prefetch_queue
+from src.utils.track_metadata import track_metadata
+from src.utils.search_cache import search_cache
+from src.utils.client_pool import spotify_pool
+from src.utils.spotify_scheduler import spotify_scheduler
+from src.utils.circuit_breaker import breakers, CLOSED, OPEN, HALF_OPEN
 
-app = FastAPI(title="Music Player API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared upstream connection pools on startup and close them on shutdown"""
+    await start_http_clients()
+    # Load zone, audio profile and catalog data (and the media cache index) up front instead of on the first request
+    get_zone_index()
+    get_audio_profile_table()
+    get_local_catalog()
+    media_cache.load()
+    yield
+    await close_http_clients()
+    close_logging()
+
+app = FastAPI(title="Music Player API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +49,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency includes CORS handling and matches what clients see
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(get_song_router)
 app.include_router(auth_router)
+app.include_router(media_router)
 
 @app.get("/health")
 def health_check():
@@ -31,6 +66,67 @@ def root():
     """Root endpoint"""
     return {"message": "SpotOn Music Player API", "docs": "/docs"}
 
+# Cache counters are read from each cache's stats() when /metrics is scraped
+register_collector(stats_collector(
+    "cache",
+    {
+        "credentials": credential_cache.stats,
+        "playback": playback_cache.stats,
+        "recommendations": recommendation_cache.stats,
+        "prefetch": prefetch_queue.stats,
+        "track_metadata": track_metadata.stats,
+        "search": search_cache.stats,
+        "media": media_cache.stats,
+    },
+    {
+        "hits": ("counter", "Cache hits"),
+        "misses": ("counter", "Cache misses"),
+        "hit_ratio": ("gauge", "Share of lookups served from the cache"),
+        "size": ("gauge", "Entries currently cached"),
+        "inflight": ("gauge", "Upstream fetches in flight that concurrent lookups are sharing"),
+    },
+    label="cache",
+))
+register_collector(stats_collector(
+    "spotify_scheduler",
+    {"spotify_scheduler": spotify_scheduler.stats},
+    {
+        "queue_depth": ("gauge", "Spotify calls waiting for a rate-limit token"),
+        "throttled": ("counter", "429 responses that paused the scheduler"),
+        "users": ("gauge", "Users with a token bucket"),
+    },
+))
+register_collector(stats_collector(
+    "client_pool",
+    {"client_pool": spotify_pool.stats},
+    {"size": ("gauge", "Pooled per-connection Spotify clients")},
+))
+register_collector(stats_collector(
+    "log",
+    {"log": logging_stats},
+    {
+        "queued": ("gauge", "Log records waiting to be written"),
+        "dropped": ("counter", "Log records dropped because the queue was full"),
+    },
+))
+
+_BREAKER_STATES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+def collect_breaker_states():
+    yield (
+        "circuit_breaker_state",
+        "gauge",
+        "Upstream circuit state (0 closed, 1 open, 2 half-open)",
+        [({"upstream": name}, _BREAKER_STATES[breaker.state]) for name, breaker in breakers.items()],
+    )
+
+register_collector(collect_breaker_states)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # For development: run with 'python main.py'
 # For production: use 'uvicorn backend.src.main:app --reload'
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+"""
+Nearest-neighbour indexes over the local catalog's audio-feature vectors.
+
+Both indexes share one interface: add() appends vectors (incremental inserts get
+row ids continuing from the current size) and search() returns the k nearest rows
+with their squared distances, optionally skipping excluded rows.
+
+- ExactIndex: brute force, always correct; fine up to a few hundred thousand tracks.
+- IVFIndex: k-means coarse quantiser with inverted lists. Only the nprobe closest
+  lists are scanned, trading recall for latency.
+"""
+from typing import Optional, List, Tuple, Iterable
+
+import numpy as np
+
+from src import config
+
+
+class ExactIndex:
+    """Brute-force squared-Euclidean search"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._squared_norms = np.empty(0, dtype=np.float32)
+        self._pending: List[np.ndarray] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Append vectors and return their row ids"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        rows = np.arange(self._size, self._size + len(vectors))
+        self._pending.append(vectors)
+        self._size += len(vectors)
+        return rows
+
+    def search(self, query: np.ndarray, k: int, exclude_rows: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, squared distances) of the k nearest vectors, nearest first"""
+        self._consolidate()
+        # |x|^2 - 2 x.q + |q|^2 with precomputed norms: one matrix-vector product per query
+        distances = self._squared_norms - 2.0 * (self._vectors @ query) + float(query @ query)
+        if exclude_rows:
+            distances[np.fromiter(exclude_rows, dtype=np.int64)] = np.inf
+            k = min(k, len(distances) - len(set(exclude_rows)))
+        return _top_k(np.arange(len(distances)), distances, k)
+
+    def _consolidate(self):
+        """Merge pending inserts into the main arrays"""
+        if self._pending:
+            self._vectors = np.concatenate([self._vectors] + self._pending)
+            self._squared_norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+            self._pending = []
+
+
+class IVFIndex:
+    """
+    Inverted-file index: vectors are bucketed by their nearest k-means centroid.
+
+    A query scans the nprobe closest buckets (more if they hold fewer than k usable
+    vectors). Raising nprobe increases recall and latency; nprobe == nlist is exact.
+    """
+
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = config.ANN_IVF_NPROBE, train_iterations: int = 10):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.centroids: Optional[np.ndarray] = None
+        self._list_rows: List[np.ndarray] = []
+        self._list_vectors: List[np.ndarray] = []
+        self._pending: List[List[Tuple[np.ndarray, np.ndarray]]] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def train(self, vectors: np.ndarray, sample_size: int = 50_000, seed: int = 0):
+        """Fit the coarse quantiser with k-means on (a sample of) the vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assignment = _nearest_centroid(sample, centroids)
+            counts = np.bincount(assignment, minlength=nlist)
+            sums = np.stack([np.bincount(assignment, weights=sample[:, d], minlength=nlist) for d in range(self.dim)], axis=1)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        self.nlist = nlist
+        self.centroids = centroids
+        self._list_rows = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(nlist)]
+        self._pending = [[] for _ in range(nlist)]
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Append vectors and return their row ids (trains on the first batch if needed)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        rows = np.arange(self._size, self._size + len(vectors))
+        self._size += len(vectors)
+        if self.centroids is None:
+            self.train(vectors)
+        self._insert(rows, vectors)
+        return rows
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        exclude_rows: Optional[Iterable[int]] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, squared distances) of approximately the k nearest vectors"""
+        if self.centroids is None or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        exclude = np.fromiter(exclude_rows, dtype=np.int64) if exclude_rows else None
+        list_order = np.argsort(np.square(self.centroids - query).sum(axis=1))
+        probes = min(nprobe or self.nprobe, self.nlist)
+        scanned = 0
+        candidate_rows: List[np.ndarray] = []
+        candidate_vectors: List[np.ndarray] = []
+
+        while True:
+            for list_id in list_order[scanned:probes]:
+                self._consolidate(list_id)
+                candidate_rows.append(self._list_rows[list_id])
+                candidate_vectors.append(self._list_vectors[list_id])
+            scanned = probes
+
+            # Excluded rows may or may not be in the scanned lists; assume the worst
+            usable = sum(len(rows) for rows in candidate_rows) - (len(exclude) if exclude is not None else 0)
+            # Widen the probe if filtering or sparse lists left too few candidates
+            if usable >= k or probes >= self.nlist:
+                break
+            probes = min(self.nlist, probes * 2)
+
+        rows = np.concatenate(candidate_rows)
+        vectors = np.concatenate(candidate_vectors)
+        distances = np.square(vectors - query).sum(axis=1)
+        return _top_k(rows, distances, k, exclude)
+
+    def _insert(self, rows: np.ndarray, vectors: np.ndarray):
+        """Queue vectors for their nearest lists (merged lazily when a list is next scanned)"""
+        assignment = _nearest_centroid(vectors, self.centroids)
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.cumsum(np.bincount(assignment, minlength=self.nlist))[:-1]
+        for list_id, (list_rows, list_vectors) in enumerate(zip(np.split(rows[order], boundaries), np.split(vectors[order], boundaries))):
+            if len(list_rows):
+                self._pending[list_id].append((list_rows, list_vectors))
+
+    def _consolidate(self, list_id: int):
+        """Merge pending inserts into one list's arrays"""
+        pending = self._pending[list_id]
+        if pending:
+            self._list_rows[list_id] = np.concatenate([self._list_rows[list_id]] + [rows for rows, _ in pending])
+            self._list_vectors[list_id] = np.concatenate([self._list_vectors[list_id]] + [vectors for _, vectors in pending])
+            self._pending[list_id] = []
+
+
+def build_index(dim: int, kind: str = config.ANN_INDEX):
+    """Create an empty index of the configured kind ("exact" or "ivf")"""
+    if kind == "ivf":
+        return IVFIndex(dim, nlist=config.ANN_IVF_NLIST or None, nprobe=config.ANN_IVF_NPROBE)
+    if kind == "exact":
+        return ExactIndex(dim)
+    raise ValueError(f"Unknown ANN index type: {kind}")
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 16_384) -> np.ndarray:
+    """Assign each vector to its closest centroid (in blocks to bound memory)"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        # |c|^2 - 2 x.c (|x|^2 doesn't change the argmin), computed in place
+        distances = block @ centroids.T
+        distances *= -2.0
+        distances += centroid_norms
+        assignment[start:start + block_size] = np.argmin(distances, axis=1)
+    return assignment
+
+
+def _top_k(rows: np.ndarray, distances: np.ndarray, k: int, exclude_rows=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Pick the k smallest distances (ignoring excluded rows), sorted ascending"""
+    if exclude_rows is not None:
+        exclude_rows = np.fromiter(exclude_rows, dtype=np.int64) if not isinstance(exclude_rows, np.ndarray) else exclude_rows
+    if exclude_rows is not None and len(exclude_rows):
+        keep = ~np.isin(rows, exclude_rows)
+        rows = rows[keep]
+        distances = distances[keep]
+
+    k = min(k, len(distances))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    candidates = np.argpartition(distances, k - 1)[:k]
+    candidates = candidates[np.argsort(distances[candidates])]
+    return rows[candidates], distances[candidates]
@@ -0,0 +1,95 @@
+import os
+import json
+from datetime import datetime
+from types import MappingProxyType
+from typing import Optional, Dict, List, Tuple, Mapping
+
+from src import config
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class AudioProfileTable:
+    """
+    Immutable (location type x time bucket) -> audio features lookup table.
+
+    Everything is compiled once: a minute-of-day array maps any time to its bucket,
+    and every profile is a shared read-only mapping, so resolving a profile is a
+    couple of indexed lookups with no per-request allocation.
+    """
+
+    def __init__(self, defaults: Dict[str, float], time_buckets: List[Dict[str, str]], profiles: Dict[str, Dict[str, Dict[str, float]]]):
+        self.bucket_names: Tuple[str, ...] = tuple(bucket["name"] for bucket in time_buckets)
+        self.location_types: Tuple[str, ...] = tuple(profiles)
+        self._location_index = {loc_type: i for i, loc_type in enumerate(self.location_types)}
+        self._minute_buckets = _compile_minute_buckets(time_buckets)
+
+        # Unknown location types and missing buckets resolve to the defaults
+        self.default_profile: Mapping[str, float] = MappingProxyType(dict(defaults))
+        table = []
+        for loc_type in self.location_types:
+            for bucket_name in self.bucket_names:
+                overrides = profiles[loc_type].get(bucket_name, {})
+                table.append(MappingProxyType({**defaults, **overrides}))
+        self._table: Tuple[Mapping[str, float], ...] = tuple(table)
+
+    @classmethod
+    def from_file(cls, path: str) -> "AudioProfileTable":
+        """Load and compile profiles from a JSON data file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["defaults"], data["time_buckets"], data["profiles"])
+
+    def time_bucket(self, time: datetime) -> str:
+        """Return the name of the time bucket a moment falls into"""
+        return self.bucket_names[self._minute_buckets[time.hour * 60 + time.minute]]
+
+    def lookup(self, loc_type: Optional[str], time: datetime) -> Tuple[str, Mapping[str, float]]:
+        """
+        Resolve the audio-feature profile for a location type at a given time.
+
+        Returns:
+            (time bucket name, read-only audio features mapping shared between callers)
+        """
+        bucket_index = self._minute_buckets[time.hour * 60 + time.minute]
+        loc_index = self._location_index.get(loc_type)
+        if loc_index is None:
+            return self.bucket_names[bucket_index], self.default_profile
+        return self.bucket_names[bucket_index], self._table[loc_index * len(self.bucket_names) + bucket_index]
+
+
+def _compile_minute_buckets(time_buckets: List[Dict[str, str]]) -> Tuple[int, ...]:
+    """Build a minute-of-day -> bucket index array; buckets may wrap past midnight"""
+    minute_buckets: List[Optional[int]] = [None] * MINUTES_PER_DAY
+    for index, bucket in enumerate(time_buckets):
+        start = _parse_minutes(bucket["start"])
+        end = _parse_minutes(bucket["end"])
+        minute = start
+        while True:
+            minute_buckets[minute] = index
+            minute = (minute + 1) % MINUTES_PER_DAY
+            if minute == end:
+                break
+
+    if None in minute_buckets:
+        uncovered = minute_buckets.index(None)
+        raise ValueError(f"Time buckets don't cover {uncovered // 60:02d}:{uncovered % 60:02d}")
+    return tuple(minute_buckets)
+
+
+def _parse_minutes(value: str) -> int:
+    """Convert "HH:MM" to minutes after midnight"""
+    hours, minutes = value.split(":")
+    return (int(hours) * 60 + int(minutes)) % MINUTES_PER_DAY
+
+
+_profile_table: Optional[AudioProfileTable] = None
+
+
+def get_audio_profile_table() -> AudioProfileTable:
+    """Return the profile table, compiling it from AUDIO_PROFILES_PATH on first use"""
+    global _profile_table
+    if _profile_table is None:
+        _profile_table = AudioProfileTable.from_file(config.AUDIO_PROFILES_PATH)
+        print(f"🎵 Compiled {len(_profile_table.location_types)}x{len(_profile_table.bucket_names)} audio profiles from {os.path.basename(config.AUDIO_PROFILES_PATH)}")
+    return _profile_table
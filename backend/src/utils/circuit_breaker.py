@@ -0,0 +1,194 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
+
+from src import config
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class _Call:
+    """Outcome of one guarded call; mark it failed for error responses that didn't raise"""
+
+    __slots__ = ("failed_",)
+
+    def __init__(self):
+        self.failed_ = False
+
+    def failed(self):
+        self.failed_ = True
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream.
+
+    Closed: calls go through and their outcomes are kept for a rolling window. The
+    breaker opens once the window has min_calls calls and the share of errors or of
+    slow calls crosses its threshold. Open: calls fail immediately with
+    CircuitOpenError for open_seconds. Half-open: a few probe calls go through; a
+    healthy probe closes the breaker, a failed or slow one opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = config.CIRCUIT_WINDOW_SECONDS,
+        min_calls: int = config.CIRCUIT_MIN_CALLS,
+        error_rate_threshold: float = config.CIRCUIT_ERROR_RATE_THRESHOLD,
+        slow_call_seconds: float = config.CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate_threshold: float = config.CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+        open_seconds: float = config.CIRCUIT_OPEN_SECONDS,
+        half_open_probes: int = config.CIRCUIT_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (finished_at, failed, slow) for calls within the window
+        self._calls: deque = deque()
+        self.opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being short-circuited"""
+        return self.state == OPEN
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_probes):
+            self.rejected += 1
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_in)
+        if state == HALF_OPEN:
+            self._probes += 1
+
+    def record(self, latency: float, failed: bool, error: Optional[str] = None):
+        """Record the outcome of an admitted call"""
+        now = time.monotonic()
+        slow = latency >= self.slow_call_seconds
+        if failed:
+            self.last_error = error or "error"
+
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if failed or slow:
+                self._open(now, "probe failed" if failed else f"probe took {latency:.1f}s")
+            else:
+                self._state = CLOSED
+                self._calls.clear()
+                log.info("circuit.closed", "Circuit closed", breaker=self.name)
+            return
+
+        self._calls.append((now, failed, slow))
+        self._trim(now)
+        if self._state == CLOSED and len(self._calls) >= self.min_calls:
+            total = len(self._calls)
+            errors = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if errors / total >= self.error_rate_threshold:
+                self._open(now, f"{errors}/{total} calls failed")
+            elif slow_calls / total >= self.slow_call_rate_threshold:
+                self._open(now, f"{slow_calls}/{total} calls slower than {self.slow_call_seconds}s")
+
+    def release(self):
+        """Give back a half-open probe slot for a call that never finished (e.g. cancelled)"""
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    @contextmanager
+    def guard(self) -> Iterator[_Call]:
+        """
+        Guard one upstream call.
+
+        Raises CircuitOpenError when the breaker is open. Exceptions raised in the block
+        count as failures; use call.failed() for error responses that don't raise.
+        A cancelled call only counts if it had already been slow.
+        """
+        self.before_call()
+        call = _Call()
+        started = time.monotonic()
+        try:
+            yield call
+        except Exception as e:
+            self.record(time.monotonic() - started, True, f"{type(e).__name__}: {e}")
+            raise
+        except BaseException:
+            elapsed = time.monotonic() - started
+            if elapsed >= self.slow_call_seconds:
+                self.record(elapsed, False)
+            else:
+                self.release()
+            raise
+        else:
+            self.record(time.monotonic() - started, call.failed_)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return state and rolling-window error/slow rates"""
+        now = time.monotonic()
+        self._trim(now)
+        total = len(self._calls)
+        state = self.state
+        return {
+            "state": state,
+            "calls_in_window": total,
+            "error_rate": round(sum(1 for _, failed, _ in self._calls if failed) / total, 4) if total else 0.0,
+            "slow_rate": round(sum(1 for _, _, slow in self._calls if slow) / total, 4) if total else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(max(0.0, self.open_seconds - (now - self._opened_at)), 2) if state == OPEN else 0.0,
+            "last_error": self.last_error,
+        }
+
+    def _open(self, now: float, reason: str):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self._calls.clear()
+        self.opened += 1
+        log.warning("circuit.opened", "Circuit opened", breaker=self.name, open_seconds=self.open_seconds, reason=reason, last_error=self.last_error)
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+
+# One breaker per upstream
+breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(name) for name in ("reccobeats", "nango", "spotify")}
+
+
+def breaker_stats() -> Dict[str, Any]:
+    """Return the state of every upstream breaker"""
+    return {name: breaker.stats() for name, breaker in breakers.items()}
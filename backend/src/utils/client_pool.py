@@ -0,0 +1,101 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from src import config
+from src.utils.spotify_service import SpotifyService
+from src.utils.credential_cache import credential_cache
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class SpotifyClientPool:
+    """
+    Keyed pool of SpotifyService instances, one per Nango connection ID.
+
+    Clients are evicted least-recently-used once the pool is full, dropped after
+    sitting idle for too long, and re-initialized shortly before their access
+    token expires so requests never run with a stale token. Evicting a client also
+    drops its cached credentials.
+    """
+
+    def __init__(
+        self,
+        max_size: int = config.SPOTIFY_POOL_MAX_SIZE,
+        idle_ttl: float = config.SPOTIFY_POOL_IDLE_TTL_SECONDS,
+        refresh_margin: float = config.SPOTIFY_TOKEN_REFRESH_MARGIN_SECONDS,
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.refresh_margin = refresh_margin
+        self._clients: "OrderedDict[str, SpotifyService]" = OrderedDict()
+        self.evictions = 0
+
+        if not os.getenv('NANGO_SECRET_KEY'):
+            log.warning("spotify_pool.no_nango_key", "NANGO_SECRET_KEY not set; Spotify functionality will be limited")
+
+    @property
+    def nango_configured(self) -> bool:
+        """Check if a Nango secret key is available"""
+        return os.getenv('NANGO_SECRET_KEY') is not None
+
+    def peek(self, connection_id: Optional[str]) -> Optional[SpotifyService]:
+        """Return the pooled client for a connection without initializing or reordering it"""
+        if not connection_id:
+            return None
+        return self._clients.get(connection_id)
+
+    async def get(self, connection_id: str) -> SpotifyService:
+        """Return a warm client for the connection, creating and initializing it if needed"""
+        self._expire_idle()
+
+        service = self._clients.get(connection_id)
+        if service is None:
+            service = SpotifyService(connection_id)
+            self._clients[connection_id] = service
+            self._evict_overflow()
+        else:
+            self._clients.move_to_end(connection_id)
+
+        service.touch()
+        await service.ensure_initialized(self.refresh_margin)
+        return service
+
+    def evict(self, connection_id: str):
+        """Drop the client for a connection, e.g. after logout"""
+        self._clients.pop(connection_id, None)
+        credential_cache.invalidate(connection_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and eviction counters"""
+        return {
+            "size": len(self._clients),
+            "max_size": self.max_size,
+            "initialized": sum(1 for service in self._clients.values() if service.spotify),
+            "evictions": self.evictions,
+        }
+
+    def _expire_idle(self):
+        """Remove clients that have not been used within the idle TTL"""
+        cutoff = time.monotonic() - self.idle_ttl
+        # The OrderedDict is kept in LRU order, so idle clients are at the front
+        while self._clients:
+            connection_id, service = next(iter(self._clients.items()))
+            if service.last_used > cutoff:
+                break
+            self._clients.popitem(last=False)
+            credential_cache.invalidate(connection_id)
+            self.evictions += 1
+
+    def _evict_overflow(self):
+        """Remove least-recently-used clients until the pool fits"""
+        while len(self._clients) > self.max_size:
+            connection_id, _ = self._clients.popitem(last=False)
+            credential_cache.invalidate(connection_id)
+            self.evictions += 1
+
+
+# Create a global pool
+spotify_pool = SpotifyClientPool()
@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from src import config
+from src.utils.http_clients import get_http_client
+from src.utils.circuit_breaker import breakers, CircuitOpenError
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class CredentialCache:
+    """
+    In-process cache of Nango connection credentials, keyed by connection ID.
+
+    Entries stay valid until shortly before the access token expires. Concurrent
+    misses for the same connection share one in-flight Nango request instead of
+    each issuing their own. At most max_entries connections are kept (least recently
+    used dropped first), and expired entries are purged whenever one is stored.
+    """
+
+    def __init__(
+        self,
+        refresh_margin: float = config.NANGO_CREDENTIAL_REFRESH_MARGIN_SECONDS,
+        default_ttl: float = config.NANGO_CREDENTIAL_DEFAULT_TTL_SECONDS,
+        min_refresh_interval: float = config.NANGO_CREDENTIAL_MIN_REFRESH_SECONDS,
+        max_entries: int = config.SPOTIFY_POOL_MAX_SIZE,
+    ):
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.max_entries = max_entries
+        # connection_id -> credentials, least recently used first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.stale_served = 0
+
+    async def get(self, connection_id: str, force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Return credentials for a connection, fetching them from Nango if needed.
+
+        Args:
+            connection_id: Nango connection ID
+            force_refresh: Bypass a valid cache entry (e.g. after Spotify rejected the token).
+                Entries fetched within the last few seconds are still reused.
+
+        Returns:
+            Dict with access_token, expires_at and scopes, or None if unavailable
+        """
+        entry = self._entries.get(connection_id)
+        if entry and self._is_fresh(entry, force_refresh):
+            self._entries.move_to_end(connection_id)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        task = self._inflight.get(connection_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Run the fetch as its own task so a cancelled caller doesn't cancel it for the waiters
+            task = asyncio.ensure_future(self._fetch(connection_id))
+            self._inflight[connection_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(connection_id, None))
+        return await asyncio.shield(task)
+
+    def invalidate(self, connection_id: str):
+        """Forget cached credentials for a connection"""
+        self._entries.pop(connection_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss/refresh counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "stale_served": self.stale_served,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _is_fresh(self, entry: Dict[str, Any], force_refresh: bool) -> bool:
+        """Check whether a cache entry can be served without going to Nango"""
+        now = time.time()
+        # Never refetch more often than min_refresh_interval, even when forced
+        if now - entry['fetched_at'] < self.min_refresh_interval:
+            return True
+        if force_refresh:
+            return False
+        return now < entry['expires_at'] - self.refresh_margin
+
+    async def _fetch(self, connection_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch credentials from Nango and store them in the cache"""
+        nango_secret_key = os.getenv('NANGO_SECRET_KEY')
+        if not nango_secret_key:
+            return None
+
+        self.refreshes += 1
+        try:
+            with breakers["nango"].guard() as call:
+                response = await get_http_client("nango").get(
+                    f"/connection/{connection_id}",
+                    headers={
+                        "Authorization": f"Bearer {nango_secret_key}",
+                        "Content-Type": "application/json"
+                    },
+                    params={
+                        "provider_config_key": "spotify"
+                    }
+                )
+                if response.status_code >= 500:
+                    call.failed()
+        except CircuitOpenError:
+            # Nango is down: keep using the token we already have for as long as it's valid
+            entry = self._entries.get(connection_id)
+            if entry and entry['expires_at'] > time.time():
+                self.stale_served += 1
+                return entry
+            self.errors += 1
+            return None
+        except Exception as e:
+            self.errors += 1
+            log.error("nango.credentials.error", "Error fetching Nango connection", connection_id=connection_id, error=str(e))
+            return None
+
+        if response.status_code != 200:
+            self.errors += 1
+            log.error("nango.credentials.http_error", "Failed to get Nango connection", connection_id=connection_id, status=response.status_code)
+            return None
+
+        credentials = response.json().get('credentials', {})
+        access_token = credentials.get('access_token')
+        if not access_token:
+            self.errors += 1
+            log.error("nango.credentials.no_token", "No access token found in Nango connection", connection_id=connection_id)
+            return None
+
+        raw_creds = credentials.get('raw', {})
+        scopes = raw_creds.get('scope', '').split(' ') if raw_creds.get('scope') else []
+        fetched_at = time.time()
+        entry = {
+            'access_token': access_token,
+            'expires_at': _parse_expires_at(credentials) or fetched_at + self.default_ttl,
+            'scopes': scopes,
+            'fetched_at': fetched_at,
+        }
+        self._store(connection_id, entry)
+        log.debug("nango.credentials.fetched", "Fetched Nango credentials", connection_id=connection_id, scopes=len(scopes))
+        return entry
+
+
+    def _store(self, connection_id: str, entry: Dict[str, Any]):
+        """Store credentials, purging expired entries and the least recently used beyond max_entries"""
+        self._entries[connection_id] = entry
+        self._entries.move_to_end(connection_id)
+        now = time.time()
+        for expired_id in [key for key, value in self._entries.items() if value['expires_at'] <= now]:
+            del self._entries[expired_id]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _parse_expires_at(credentials: Dict[str, Any]) -> Optional[float]:
+    """Extract the token expiry from Nango credentials as a unix timestamp"""
+    expires_at = credentials.get('expires_at')
+    if expires_at:
+        try:
+            return datetime.fromisoformat(expires_at.replace('Z', '+00:00')).timestamp()
+        except (AttributeError, ValueError):
+            pass
+
+    expires_in = credentials.get('raw', {}).get('expires_in')
+    if expires_in:
+        try:
+            return time.time() + float(expires_in)
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+# Create a global cache
+credential_cache = CredentialCache()
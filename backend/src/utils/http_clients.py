@@ -0,0 +1,141 @@
+import time
+import asyncio
+import importlib.util
+import httpx
+from typing import Dict, Any
+
+from src import config
+from src.utils.tracing import span
+from src.utils.metrics import (
+    operation_name, upstream_requests, upstream_errors, upstream_request_duration, upstream_requests_in_flight,
+)
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Connection settings for each upstream service
+UPSTREAMS: Dict[str, Dict[str, Any]] = {
+    "spotify": {
+        "base_url": config.SPOTIFY_API_BASE_URL,
+        "max_connections": config.SPOTIFY_MAX_CONNECTIONS,
+        "max_keepalive_connections": config.SPOTIFY_MAX_KEEPALIVE_CONNECTIONS,
+        "timeout": config.SPOTIFY_TIMEOUT_SECONDS,
+        "connect_timeout": config.SPOTIFY_CONNECT_TIMEOUT_SECONDS,
+    },
+    "nango": {
+        "base_url": config.NANGO_API_BASE_URL,
+        "max_connections": config.NANGO_MAX_CONNECTIONS,
+        "max_keepalive_connections": config.NANGO_MAX_KEEPALIVE_CONNECTIONS,
+        "timeout": config.NANGO_TIMEOUT_SECONDS,
+        "connect_timeout": config.NANGO_CONNECT_TIMEOUT_SECONDS,
+    },
+    "reccobeats": {
+        "base_url": config.RECCOBEATS_API_BASE_URL,
+        "max_connections": config.RECCOBEATS_MAX_CONNECTIONS,
+        "max_keepalive_connections": config.RECCOBEATS_MAX_KEEPALIVE_CONNECTIONS,
+        "timeout": config.RECCOBEATS_TIMEOUT_SECONDS,
+        "connect_timeout": config.RECCOBEATS_CONNECT_TIMEOUT_SECONDS,
+    },
+    "media": {
+        "base_url": "",
+        "max_connections": config.MEDIA_CDN_MAX_CONNECTIONS,
+        "max_keepalive_connections": config.MEDIA_CDN_MAX_KEEPALIVE_CONNECTIONS,
+        "timeout": config.MEDIA_CDN_TIMEOUT_SECONDS,
+        "connect_timeout": config.MEDIA_CDN_CONNECT_TIMEOUT_SECONDS,
+    },
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper recording latency, outcome and in-flight calls for one upstream"""
+
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = operation_name(request.method, request.url.path)
+        upstream_requests_in_flight.inc(upstream=self.upstream)
+        started = time.perf_counter()
+        outcome = reason = None
+        try:
+            with span(self.upstream, operation=operation) as call_span:
+                response = await self.transport.handle_async_request(request)
+                if call_span is not None:
+                    call_span.attrs["status"] = response.status_code
+        except asyncio.CancelledError:
+            # Cancelled by us (a hedge or timeout elsewhere won), not an upstream failure
+            outcome = "cancelled"
+            raise
+        except httpx.TimeoutException:
+            outcome = reason = "timeout"
+            raise
+        except httpx.ConnectError:
+            outcome = reason = "connect_error"
+            raise
+        except Exception as e:
+            outcome = reason = type(e).__name__
+            raise
+        else:
+            status = response.status_code
+            outcome = "429" if status == 429 else f"{status // 100}xx"
+            if status == 429 or status >= 500:
+                reason = outcome
+            return response
+        finally:
+            upstream_requests_in_flight.dec(upstream=self.upstream)
+            upstream_request_duration.observe(time.perf_counter() - started, upstream=self.upstream, operation=operation)
+            upstream_requests.inc(upstream=self.upstream, operation=operation, outcome=outcome)
+            if reason:
+                upstream_errors.inc(upstream=self.upstream, operation=operation, reason=reason)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def _create_client(name: str) -> httpx.AsyncClient:
+    """Create a keep-alive client for one upstream using its configured limits and timeouts"""
+    settings = UPSTREAMS[name]
+    # The pool limits and HTTP/2 live on the inner transport, which the metrics wrapper delegates to
+    transport = httpx.AsyncHTTPTransport(
+        http2=config.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+        ),
+    )
+    return httpx.AsyncClient(
+        base_url=settings["base_url"],
+        timeout=httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"]),
+        transport=InstrumentedTransport(name, transport),
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """
+    Return the shared client for an upstream ("spotify", "nango", "reccobeats" or "media").
+
+    Clients are normally created by the app lifespan hook; outside the app
+    (scripts, the REPL) they are created lazily on first use.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _create_client(name)
+        _clients[name] = client
+    return client
+
+
+async def start_http_clients():
+    """Open the shared clients for every upstream"""
+    for name in UPSTREAMS:
+        get_http_client(name)
+    print(f"✅ Upstream HTTP clients ready (HTTP/2: {config.HTTP2_ENABLED and HTTP2_AVAILABLE})")
+
+
+async def close_http_clients():
+    """Close all shared clients and their pooled connections"""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
@@ -0,0 +1,139 @@
+"""
+Local track catalog with a vectorised nearest-neighbour recommender.
+
+The catalog is a CSV file (LOCAL_CATALOG_PATH) with one row per track:
+
+    spotify_id,name,artist,album,duration_ms,album_cover_url,preview_url,popularity,
+    acousticness,danceability,energy,tempo,valence,instrumentalness,speechiness
+
+Audio features use the same keys and 0-1 scale as get_genre_from_location_and_time;
+tempo may be given in BPM and is scaled the same way as the Spotify recommendation
+call (BPM / 200).
+
+No catalog ships with the repo, so the local_catalog recommendation source stays
+off until one is built, e.g. from a public Spotify tracks dataset:
+
+    python scripts/build_catalog.py tracks.csv
+"""
+import os
+import csv
+import random
+from typing import Optional, Dict, List, Mapping, Iterable, Tuple
+
+from src.utils.track import Track, SPOTIFY_TRACK_URL
+from src.utils.log import get_logger
+from src import config
+
+log = get_logger(__name__)
+
+# Try to import numpy for the vectorised scorer, fallback if not available
+try:
+    import numpy as np
+    from src.utils.ann_index import build_index
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("⚠️ numpy not available. Install with: pip install numpy")
+    NUMPY_AVAILABLE = False
+
+FEATURE_KEYS = ("acousticness", "danceability", "energy", "tempo", "valence", "instrumentalness", "speechiness")
+TEMPO_SCALE = 200.0
+
+class LocalCatalog:
+    """
+    In-memory track catalog scored with NumPy.
+
+    Feature vectors live in a nearest-neighbour index (see ann_index): brute force by
+    default, or an IVF index with tunable recall for catalogs in the millions.
+    """
+
+    def __init__(self, tracks: List[Track], features: "np.ndarray", index_kind: str = config.ANN_INDEX):
+        self.tracks: List[Track] = []
+        self._row_by_id: Dict[str, int] = {}
+        self.index = build_index(len(FEATURE_KEYS), index_kind)
+        self.add_tracks(tracks, features)
+
+    def add_tracks(self, tracks: List[Track], features: "np.ndarray"):
+        """Insert tracks (with their normalised feature rows) into the catalog and index"""
+        if not tracks:
+            return
+        rows = self.index.add(np.asarray(features, dtype=np.float32).reshape(len(tracks), len(FEATURE_KEYS)))
+        for row, track in zip(rows, tracks):
+            self._row_by_id[track.spotify_id] = int(row)
+        self.tracks.extend(tracks)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "LocalCatalog":
+        """Load a catalog from CSV"""
+        tracks = []
+        rows = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                if not record.get("spotify_id"):
+                    continue
+                tracks.append(Track(
+                    spotify_id=record["spotify_id"],
+                    name=record.get("name") or None,
+                    artist=record.get("artist") or None,
+                    album=record.get("album") or None,
+                    duration_ms=int(float(record.get("duration_ms") or 0)),
+                    album_cover_url=record.get("album_cover_url") or None,
+                    preview_url=record.get("preview_url") or None,
+                    spotify_url=SPOTIFY_TRACK_URL + record["spotify_id"],
+                    popularity=int(float(record.get("popularity") or 0)),
+                ))
+                rows.append([_normalise(key, float(record.get(key) or 0.5)) for key in FEATURE_KEYS])
+
+        features = np.array(rows, dtype=np.float32).reshape(len(rows), len(FEATURE_KEYS))
+        return cls(tracks, features)
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def target_vector(self, audio_features: Mapping[str, float]) -> "np.ndarray":
+        """Convert an audio features mapping into a query vector"""
+        return np.array([_normalise(key, audio_features.get(key, 0.5)) for key in FEATURE_KEYS], dtype=np.float32)
+
+    def nearest(self, audio_features: Mapping[str, float], k: int, exclude_ids: Optional[Iterable[str]] = None) -> List[Tuple[int, float]]:
+        """Return (catalog row, distance) for the k tracks closest to the target, nearest first"""
+        exclude_rows = [self._row_by_id[track_id] for track_id in exclude_ids if track_id in self._row_by_id] if exclude_ids else None
+        rows, squared_distances = self.index.search(self.target_vector(audio_features), k, exclude_rows)
+        return [(int(row), float(np.sqrt(max(distance, 0.0)))) for row, distance in zip(rows, squared_distances)]
+
+    def recommend(self, audio_features: Mapping[str, float], n: int = 15, exclude_ids: Optional[Iterable[str]] = None) -> List[Track]:
+        """
+        Return n tracks close to the target audio features.
+
+        Tracks are sampled from the nearest 3n so repeated queries don't always return
+        the same list. Each result is a copy with its distance in local_distance.
+        """
+        neighbours = self.nearest(audio_features, n * 3, exclude_ids)
+        neighbours = random.sample(neighbours, min(n, len(neighbours)))
+
+        return [self.tracks[row].replace(local_distance=round(distance, 4)) for row, distance in neighbours]
+
+
+def _normalise(key: str, value: float) -> float:
+    """Scale a feature into 0-1 (tempo may be given in BPM)"""
+    if key == "tempo" and value > 1:
+        value = value / TEMPO_SCALE
+    return min(1.0, max(0.0, value))
+
+
+_local_catalog: Optional[LocalCatalog] = None
+_catalog_loaded = False
+
+
+def get_local_catalog() -> Optional[LocalCatalog]:
+    """Return the local catalog, loading it on first use (None if numpy or the catalog file is missing)"""
+    global _local_catalog, _catalog_loaded
+    if not _catalog_loaded:
+        _catalog_loaded = True
+        if not NUMPY_AVAILABLE or not config.LOCAL_CATALOG_PATH:
+            return None
+        if not os.path.exists(config.LOCAL_CATALOG_PATH):
+            log.info("local_catalog.missing", "No local catalog; the local_catalog source is off (build one with scripts/build_catalog.py)",
+                     path=config.LOCAL_CATALOG_PATH)
+            return None
+        _local_catalog = LocalCatalog.from_csv(config.LOCAL_CATALOG_PATH)
+        log.info("local_catalog.loaded", "Loaded local catalog", tracks=len(_local_catalog), path=config.LOCAL_CATALOG_PATH)
+    return _local_catalog
@@ -0,0 +1,233 @@
+"""
+Queue-backed structured logging on top of the standard logging module.
+
+Each get_logger() wraps a stdlib logger whose only handler is a QueueHandler, so
+callers never format or write anything: the record (an event name, message and
+fields, with credentials redacted) goes on a bounded queue and a QueueListener
+thread writes it to stdout as key=value text or JSON lines (LOG_FORMAT). When the
+queue is full, records are dropped and counted rather than blocking a request.
+Events listed in LOG_SAMPLE_RATES are only logged for that fraction of calls.
+
+    log = get_logger(__name__)
+    log.info("recs.served", "Recommendations served", source=source, count=len(tracks))
+"""
+import re
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any
+
+from src import config
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+REDACTED = "[redacted]"
+_SECRET_KEY = re.compile(r"token|secret|password|authorization|api[_-]?key|credentials", re.IGNORECASE)
+_SECRET_VALUE = re.compile(r"(Bearer\s+|(?:access|refresh)_token=)[^\s&'\",]+", re.IGNORECASE)
+_MAX_DEPTH = 6
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Return a copy of a value with secrets under sensitive keys or in bearer strings masked"""
+    if isinstance(value, str):
+        return _SECRET_VALUE.sub(lambda match: match.group(1) + REDACTED, value)
+    if depth >= _MAX_DEPTH:
+        return repr(value)
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and _SECRET_KEY.search(key) else redact(item, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        return [redact(item, depth + 1) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if hasattr(value, "to_dict"):
+        return redact(value.to_dict(), depth + 1)
+    return redact(str(value), depth + 1)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of blocking"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Fields are already redacted and there's no exc_info to render; formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._unreported += 1
+
+    def take_unreported(self) -> int:
+        """Return and reset the number of records dropped since the last call"""
+        with self._lock:
+            count, self._unreported = self._unreported, 0
+        return count
+
+
+class _StructuredFormatter(logging.Formatter):
+    """Render a record's event, message and fields as key=value text or a JSON line"""
+
+    def __init__(self, json_format: bool):
+        super().__init__()
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+        event = getattr(record, "event", "")
+        fields = dict(getattr(record, "fields", None) or {})
+        stack = fields.pop("traceback", None)
+        message = record.getMessage()
+        if self.json_format:
+            payload = {"ts": timestamp, "level": record.levelname, "logger": record.name, "event": event, "msg": message, **fields}
+            if stack:
+                payload["traceback"] = stack
+            return json.dumps(payload, default=str, ensure_ascii=False)
+
+        text = " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        line = f"{timestamp} {record.levelname:<7} {record.name} {event}: {message}" + (f" {text}" if text else "")
+        return line + ("\n" + stack.rstrip() if stack else "")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes records on the listener thread, reporting records the queue handler had to drop"""
+
+    def emit(self, record: logging.LogRecord):
+        super().emit(record)
+        dropped = _queue_handler.take_unreported()
+        if dropped:
+            super().emit(_internal_record(WARNING, "log.dropped", "Log queue full; records dropped", {"count": dropped}))
+
+
+class _Listener(QueueListener):
+    """QueueListener that can be restarted, and doesn't fail to stop when the queue is full"""
+
+    def start(self):
+        if self._thread is None:
+            super().start()
+
+    def stop(self, timeout: float = 2.0):
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, str):
+        return value if value and " " not in value and "=" not in value else json.dumps(value, ensure_ascii=False)
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def _internal_record(level: int, event: str, message: str, fields: Dict[str, Any]) -> logging.LogRecord:
+    record = logging.LogRecord("log", level, __file__, 0, message, None, None)
+    record.event = event
+    record.fields = fields
+    return record
+
+
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(config.LOG_QUEUE_SIZE)
+_queue_handler = _DroppingQueueHandler(_queue)
+_stdout_handler = _StdoutHandler(sys.stdout)
+_stdout_handler.setFormatter(_StructuredFormatter(config.LOG_FORMAT.lower() == "json"))
+_listener = _Listener(_queue, _stdout_handler)
+_listener_lock = threading.Lock()
+atexit.register(_listener.stop)
+
+
+class Logger:
+    """Structured logger; each call names an event and may add keyword fields"""
+
+    def __init__(self, name: str, level: int = logging.getLevelName(config.LOG_LEVEL)):
+        self.name = name
+        self._logger = logging.getLogger(name)
+        self._logger.setLevel(level if isinstance(level, int) else INFO)
+        self._logger.addHandler(_queue_handler)
+        # Records only go through our queue, not to whatever the root logger is configured with
+        self._logger.propagate = False
+
+    @property
+    def level(self) -> int:
+        return self._logger.level
+
+    def debug(self, event: str, message: str = "", **fields):
+        self.log(DEBUG, event, message, **fields)
+
+    def info(self, event: str, message: str = "", **fields):
+        self.log(INFO, event, message, **fields)
+
+    def warning(self, event: str, message: str = "", **fields):
+        self.log(WARNING, event, message, **fields)
+
+    def error(self, event: str, message: str = "", **fields):
+        self.log(ERROR, event, message, **fields)
+
+    def exception(self, event: str, message: str = "", **fields):
+        """Log an error with the traceback of the exception being handled"""
+        self.log(ERROR, event, message, exc_info=True, **fields)
+
+    def log(self, level: int, event: str, message: str = "", exc_info: bool = False, **fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        rate = config.LOG_SAMPLE_RATES.get(event)
+        if rate is not None:
+            if random.random() >= rate:
+                return
+            fields["sample_rate"] = rate
+
+        fields = redact(fields) if fields else {}
+        if exc_info:
+            # Rendered here so the (redacted) text, not live frames, crosses to the listener thread
+            fields["traceback"] = redact(traceback.format_exc())
+        if _listener._thread is None:
+            # Started on first use, and again after close_logging() (e.g. between test app lifespans)
+            with _listener_lock:
+                _listener.start()
+        # "%s" keeps messages containing % from being treated as format strings
+        self._logger.log(level, "%s", redact(message), extra={"event": event, "fields": fields})
+
+
+_loggers: Dict[str, Logger] = {}
+
+
+def get_logger(name: str) -> Logger:
+    """Return the shared logger for a module (use __name__)"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
+
+
+def close_logging():
+    """Flush queued records (called on shutdown)"""
+    with _listener_lock:
+        _listener.stop()
+
+
+def logging_stats() -> Dict[str, Any]:
+    return {"queued": _queue.qsize(), "dropped": _queue_handler.dropped}
@@ -0,0 +1,372 @@
+import os
+import time
+import asyncio
+import hashlib
+import mimetypes
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, NamedTuple, Tuple, Set, TYPE_CHECKING
+from urllib.parse import urlsplit, quote
+
+from src import config
+from src.utils.http_clients import get_http_client
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+if TYPE_CHECKING:
+    # track.py links its media urls through this module
+    from src.utils.track import Track
+
+_ALLOWED_CONTENT_TYPES = ("image/", "audio/")
+
+
+class MediaBlob(NamedTuple):
+    """A cached file: its SHA-256 digest, location on disk, content type and size"""
+    digest: str
+    path: str
+    content_type: str
+    size: int
+
+
+class MediaCache:
+    """
+    Content-addressed on-disk cache for album art and preview clips.
+
+    Files are stored under their SHA-256 digest (blobs/ab/abcd....jpg), so the same
+    image behind several URLs is stored once; a small record per source URL
+    (urls/<sha256 of url>) maps it to its blob. Only https URLs on the allowed CDN
+    hosts are fetched. Total size is kept under max_bytes by deleting the least
+    recently served blobs, along with the records pointing at them; at most
+    max_urls records are kept.
+
+    Blobs being sent to a client are pinned (pin()/release()), and eviction skips
+    them until the response is done, so a file never disappears mid-response.
+    """
+
+    def __init__(
+        self,
+        directory: str = config.MEDIA_CACHE_DIR,
+        max_bytes: int = config.MEDIA_CACHE_MAX_BYTES,
+        max_file_bytes: int = config.MEDIA_CACHE_MAX_FILE_BYTES,
+        max_urls: int = config.MEDIA_CACHE_MAX_URLS,
+        allowed_hosts: Tuple[str, ...] = config.MEDIA_CACHE_ALLOWED_HOSTS,
+        warm_concurrency: int = config.MEDIA_CACHE_WARM_CONCURRENCY,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.max_urls = max_urls
+        self.allowed_hosts = allowed_hosts
+        self.warm_concurrency = warm_concurrency
+        # digest -> blob, least recently served first
+        self._blobs: "OrderedDict[str, MediaBlob]" = OrderedDict()
+        # url key (sha256 of the url, also its record's file name) -> digest, least recently used first
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        # digest -> keys of the urls pointing at it, so records go with their blob
+        self._blob_urls: Dict[str, Set[str]] = {}
+        # digest -> responses currently sending it
+        self._pins: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._warm_semaphore: Optional[asyncio.Semaphore] = None
+        self._loaded = False
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.bytes_fetched = 0
+        self.errors = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.warmed = 0
+
+    def load(self):
+        """Create the cache directories and index the blobs and url records already on disk (oldest first)"""
+        os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "urls"), exist_ok=True)
+        found = []
+        for shard in os.scandir(os.path.join(self.directory, "blobs")):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    # Left over from an interrupted write
+                    os.remove(entry.path)
+                    continue
+                digest = os.path.splitext(entry.name)[0]
+                stat = entry.stat()
+                content_type = mimetypes.guess_type(entry.name)[0] or "application/octet-stream"
+                found.append((stat.st_mtime, MediaBlob(digest, entry.path, content_type, stat.st_size)))
+
+        self._blobs.clear()
+        self.total_bytes = 0
+        for _, blob in sorted(found):
+            self._blobs[blob.digest] = blob
+            self.total_bytes += blob.size
+
+        records = []
+        for entry in os.scandir(os.path.join(self.directory, "urls")):
+            if entry.name.endswith(".tmp"):
+                _remove(entry.path)
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    digest = f.read().strip()
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if digest in self._blobs:
+                records.append((mtime, entry.name, digest))
+            else:
+                # Its blob was evicted or never finished writing
+                _remove(entry.path)
+
+        self._urls.clear()
+        self._blob_urls.clear()
+        for _, key, digest in sorted(records):
+            self._remember_url(key, digest)
+        self._loaded = True
+        log.info("media_cache.ready", "Media cache ready", files=len(self._blobs), megabytes=round(self.total_bytes / 1e6, 1), urls=len(self._urls), directory=self.directory)
+        self._evict_overflow()
+
+    def is_allowed(self, url: str) -> bool:
+        """Whether a URL points at an allowed media host over https"""
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        return parts.scheme == "https" and any(host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts)
+
+    async def get(self, url: str) -> Optional[MediaBlob]:
+        """
+        Return the cached file for a media URL, downloading it on a miss.
+
+        Returns:
+            The blob, or None if the URL isn't allowed or couldn't be fetched
+        """
+        if not self._loaded:
+            self.load()
+        if not self.is_allowed(url):
+            self.rejected += 1
+            return None
+
+        blob = self._lookup(url)
+        if blob is not None:
+            self.hits += 1
+            return blob
+
+        self.misses += 1
+        return await self._download(url)
+
+    def get_blob(self, digest: str) -> Optional[MediaBlob]:
+        """Return a cached file by digest (None if it isn't cached)"""
+        if not self._loaded:
+            self.load()
+        blob = self._blobs.get(digest)
+        if blob is not None:
+            self._blobs.move_to_end(digest)
+            self.hits += 1
+        return blob
+
+    def pin(self, digest: str) -> bool:
+        """Keep a blob's file on disk until release() (False if it has already been evicted)"""
+        if digest not in self._blobs:
+            return False
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+        return True
+
+    def release(self, digest: str):
+        """Undo a pin(), evicting anything that was held back while the blob was being served"""
+        count = self._pins.get(digest, 0) - 1
+        if count > 0:
+            self._pins[digest] = count
+            return
+        self._pins.pop(digest, None)
+        self._evict_overflow()
+
+    def discard(self, digest: str):
+        """Forget a blob whose file went missing from disk, so the next request downloads it again"""
+        blob = self._blobs.pop(digest, None)
+        if blob is not None:
+            self.total_bytes -= blob.size
+            self._forget_blob(blob)
+
+    def warm(self, urls: Iterable[Optional[str]]):
+        """Download media in the background so it's cached before a client asks for it"""
+        if self._warm_semaphore is None:
+            self._warm_semaphore = asyncio.Semaphore(self.warm_concurrency)
+        for url in dict.fromkeys(urls):
+            if not url or url in self._inflight or not self.is_allowed(url) or self._lookup(url, touch=False):
+                continue
+            asyncio.ensure_future(self._warm(url))
+
+    def warm_tracks(self, tracks: Iterable["Track"]):
+        """Warm the album art and preview clips for upcoming tracks"""
+        self.warm(url for track in tracks for url in (track.album_cover_url, track.album_cover_300, track.preview_url))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size, hit ratio and download counters"""
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self._blobs),
+            "urls": len(self._urls),
+            "pinned": len(self._pins),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "fetches": self.fetches,
+            "bytes_fetched": self.bytes_fetched,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+            "warmed": self.warmed,
+            "inflight": len(self._inflight),
+        }
+
+    def _lookup(self, url: str, touch: bool = True) -> Optional[MediaBlob]:
+        """Find the blob for a URL (records on disk were all indexed by load())"""
+        key = _url_key(url)
+        digest = self._urls.get(key)
+        if digest is None:
+            return None
+        blob = self._blobs.get(digest)
+        if blob is None:
+            return None
+        if touch:
+            self._urls.move_to_end(key)
+            self._blobs.move_to_end(digest)
+        return blob
+
+    async def _warm(self, url: str):
+        async with self._warm_semaphore:
+            if self._lookup(url, touch=False) is None and await self._download(url) is not None:
+                self.warmed += 1
+
+    async def _download(self, url: str) -> Optional[MediaBlob]:
+        """Fetch a URL into the cache, sharing one download between concurrent callers"""
+        task = self._inflight.get(url)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Run the download as its own task so a client disconnecting doesn't cancel it for other waiters
+            task = asyncio.ensure_future(self._fetch(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, url: str) -> Optional[MediaBlob]:
+        self.fetches += 1
+        try:
+            async with get_http_client("media").stream("GET", url) as response:
+                content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                if response.status_code != 200 or not content_type.startswith(_ALLOWED_CONTENT_TYPES):
+                    self.errors += 1
+                    log.warning("media_cache.rejected", "Not caching media", url=url, status=response.status_code, content_type=content_type)
+                    return None
+
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_file_bytes:
+                        self.errors += 1
+                        log.warning("media_cache.too_large", "Not caching media larger than the file limit", url=url, max_file_bytes=self.max_file_bytes)
+                        return None
+                    chunks.append(chunk)
+        except Exception as e:
+            self.errors += 1
+            log.error("media_cache.download_error", "Error downloading media", url=url, error=str(e))
+            return None
+
+        data = b"".join(chunks)
+        self.bytes_fetched += size
+        digest = hashlib.sha256(data).hexdigest()
+        key = _url_key(url)
+        # Keep disk writes off the event loop. The record goes first: one pointing at a
+        # blob that isn't indexed yet is harmless, and nothing below awaits once the blob is
+        # indexed, so eviction can't run between indexing it and recording its url
+        await asyncio.to_thread(_write_atomic, self._url_record_path(key), digest.encode())
+        blob = self._blobs.get(digest)
+        if blob is None:
+            extension = mimetypes.guess_extension(content_type) or ""
+            path = os.path.join(self.directory, "blobs", digest[:2], digest + extension)
+            blob = MediaBlob(digest, path, content_type, size)
+            await asyncio.to_thread(_write_atomic, path, data)
+            if digest not in self._blobs:
+                self._blobs[digest] = blob
+                self.total_bytes += size
+            blob = self._blobs[digest]
+        self._remember_url(key, digest)
+        self._blobs.move_to_end(digest)
+        self._evict_overflow()
+        return blob
+
+    def _url_record_path(self, key: str) -> str:
+        return os.path.join(self.directory, "urls", key)
+
+    def _remember_url(self, key: str, digest: str):
+        """Index a url record, forgetting the least recently used ones past max_urls"""
+        previous = self._urls.get(key)
+        if previous is not None and previous != digest:
+            self._blob_urls.get(previous, set()).discard(key)
+        self._urls[key] = digest
+        self._urls.move_to_end(key)
+        self._blob_urls.setdefault(digest, set()).add(key)
+        while len(self._urls) > self.max_urls:
+            old_key, old_digest = self._urls.popitem(last=False)
+            self._blob_urls.get(old_digest, set()).discard(old_key)
+            _remove(self._url_record_path(old_key))
+
+    def _forget_blob(self, blob: MediaBlob):
+        """Delete a blob's file and the url records pointing at it"""
+        for key in self._blob_urls.pop(blob.digest, ()):
+            self._urls.pop(key, None)
+            _remove(self._url_record_path(key))
+        _remove(blob.path)
+
+    def _evict_overflow(self):
+        """Delete least recently served blobs until the cache fits in max_bytes (skipping pinned ones)"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for digest in list(self._blobs):
+            if self.total_bytes <= self.max_bytes or len(self._blobs) <= 1:
+                break
+            if digest in self._pins:
+                # Being served; evicted on release() if the cache is still too big
+                continue
+            blob = self._blobs.pop(digest)
+            self.total_bytes -= blob.size
+            self.evictions += 1
+            self._forget_blob(blob)
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write a file via a temporary name so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# Create a global cache
+media_cache = MediaCache()
+
+
+def media_url(url: Optional[str]) -> Optional[str]:
+    """API path serving a media URL from the cache (None if the cache won't proxy it)"""
+    if not url or not media_cache.is_allowed(url):
+        return None
+    return "/media?url=" + quote(url, safe="")
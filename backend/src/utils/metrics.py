@@ -0,0 +1,238 @@
+"""
+Prometheus-style metrics in the text exposition format.
+
+Counters, gauges and histograms are registered globally when created and rendered
+by render_metrics() for the /metrics endpoint. Values that already live elsewhere
+(cache stats, breaker states) are exported through collectors, functions that
+return metric families when scraped, so nothing is counted twice.
+"""
+import re
+import math
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (name, type, help, [(labels, value)])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+Collector = Callable[[], Iterable[MetricFamily]]
+
+_registry: List["_Metric"] = []
+_collectors: List[Collector] = []
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, self._labels(key), value) for key, value in list(self._values.items())]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket counts (made cumulative when rendered), then sum and count
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][index] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        for key, (counts, total, count) in list(self._values.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((self.name + "_bucket", {**labels, "le": _format_number(bound)}, cumulative))
+            samples.append((self.name + "_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append((self.name + "_sum", labels, total))
+            samples.append((self.name + "_count", labels, count))
+        return samples
+
+
+def register_collector(collector: Collector):
+    """Add a function that returns metric families computed at scrape time"""
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """Render every registered metric and collector in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        _render_family(lines, metric.name, metric.type, metric.help, metric.samples())
+    for collector in _collectors:
+        for name, metric_type, help, values in collector():
+            _render_family(lines, name, metric_type, help, [(name, labels, value) for labels, value in values])
+    return "\n".join(lines) + "\n"
+
+
+def _render_family(lines: List[str], name: str, metric_type: str, help: str, samples: List[Tuple[str, Dict[str, str], float]]):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for sample_name, labels, value in samples:
+        if labels:
+            label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+            lines.append(f"{sample_name}{{{label_text}}} {_format_number(value)}")
+        else:
+            lines.append(f"{sample_name} {_format_number(value)}")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# HTTP server metrics (recorded by RequestMetricsMiddleware)
+http_requests = Counter("http_requests_total", "HTTP requests handled, by route template, method and status code", ("route", "method", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template and method", ("route", "method"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+
+# Upstream metrics (recorded by the instrumented transport in http_clients)
+upstream_requests = Counter("upstream_requests_total", "Upstream HTTP calls by upstream, operation and outcome", ("upstream", "operation", "outcome"))
+upstream_errors = Counter("upstream_errors_total", "Failed upstream calls (5xx, 429, timeouts, connection errors) by upstream, operation and reason", ("upstream", "operation", "reason"))
+upstream_request_duration = Histogram("upstream_request_duration_seconds", "Upstream call latency until response headers, by upstream and operation", ("upstream", "operation"))
+upstream_requests_in_flight = Gauge("upstream_requests_in_flight", "Upstream calls currently waiting for a response", ("upstream",))
+
+# Path segments that identify a resource rather than an operation (ids, tokens, digests)
+_ID_SEGMENT = re.compile(r"^\d+$|^[0-9A-Za-z]{22}$|^(?=.*\d)[\w\-.~%]{8,}$")
+
+
+def operation_name(method: str, path: str) -> str:
+    """Label an upstream call by method and path, with id-like segments collapsed (e.g. "GET /v1/tracks/{id}")"""
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+
+def route_name(scope: Scope) -> str:
+    """The route template the router matched for a request ("unmatched" for 404s, to keep label values bounded)"""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording latency and status per route, and requests in flight.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses (the player
+    event stream) pass through untouched; their latency is the stream's lifetime.
+    The route is read after the call, once the router has stored it in the scope.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_name(scope)
+            http_request_duration.observe(time.perf_counter() - started, route=route, method=method)
+            http_requests.inc(route=route, method=method, status=status)
+            http_requests_in_flight.dec()
+
+
+def stats_collector(
+    prefix: str,
+    sources: Dict[str, Callable[[], Dict[str, Any]]],
+    fields: Dict[str, Tuple[str, str]],
+    label: Optional[str] = None,
+) -> Collector:
+    """
+    Build a collector exporting numeric fields of stats() dicts.
+
+    Args:
+        prefix: Metric name prefix, e.g. "cache"
+        sources: source name -> stats function, e.g. {"search": search_cache.stats}
+        fields: stats key -> (metric type, help); keys a source doesn't report are skipped
+        label: Label holding the source name (None to export unlabelled, for a single source)
+    """
+
+    def collect() -> Iterable[MetricFamily]:
+        snapshots = {name: stats() for name, stats in sources.items()}
+        for field, (metric_type, help) in fields.items():
+            name = f"{prefix}_{field}_total" if metric_type == "counter" else f"{prefix}_{field}"
+            values = [
+                ({label: source} if label else {}, snapshot[field])
+                for source, snapshot in snapshots.items()
+                if isinstance(snapshot.get(field), (int, float))
+            ]
+            if values:
+                yield name, metric_type, help, values
+
+    return collect
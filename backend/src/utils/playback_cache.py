@@ -0,0 +1,137 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+from src import config
+from src.utils.spotify_service import SpotifyService
+
+
+class PlaybackStateCache:
+    """
+    Short-TTL cache of Spotify playback state, keyed by connection ID.
+
+    Concurrent requests for the same connection share one upstream fetch. While a
+    track is playing, progress_ms is extrapolated from the time of the last fetch
+    so cached responses don't report a frozen position. Expired entries are dropped
+    on every write, and both entries and generations are capped at max_entries
+    (one per pooled client by default).
+    """
+
+    def __init__(self, ttl: float = config.PLAYBACK_CACHE_TTL_SECONDS, max_entries: int = config.SPOTIFY_POOL_MAX_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # connection_id -> entry, least recently stored (so oldest) first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Bumped on invalidation so fetches started before a control action aren't stored
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, spotify_service: SpotifyService) -> Optional[Dict[str, Any]]:
+        """Return the current playback state for the service's connection"""
+        connection_id = spotify_service.connection_id
+        entry = self._entries.get(connection_id)
+        if entry is not None:
+            elapsed = time.monotonic() - entry['fetched_at']
+            if elapsed < self.ttl:
+                state = _extrapolate(entry['state'], elapsed)
+                # A None from _extrapolate means the cached track has ended; refetch instead
+                if state is not None or entry['state'] is None:
+                    self.hits += 1
+                    return state
+
+        self.misses += 1
+        task = self._inflight.get(connection_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._fetch(spotify_service))
+            self._inflight[connection_id] = task
+            task.add_done_callback(lambda done: self._inflight.get(connection_id) is done and self._inflight.pop(connection_id))
+        return await asyncio.shield(task)
+
+    def prime(self, connection_id: str, state: Optional[Dict[str, Any]]):
+        """Store a playback state that was just fetched elsewhere"""
+        self._inflight.pop(connection_id, None)
+        self._bump_generation(connection_id)
+        self._store(connection_id, state)
+
+    def invalidate(self, connection_id: str):
+        """Drop the cached state, e.g. after a control action changed it"""
+        self._entries.pop(connection_id, None)
+        self._inflight.pop(connection_id, None)
+        self._bump_generation(connection_id)
+
+    def forget(self, connection_id: str):
+        """Drop everything kept for a connection, e.g. on logout"""
+        self.invalidate(connection_id)
+        self._generations.pop(connection_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def _fetch(self, spotify_service: SpotifyService) -> Optional[Dict[str, Any]]:
+        """Fetch playback state from Spotify and store it"""
+        connection_id = spotify_service.connection_id
+        generation = self._generations.get(connection_id, 0)
+        state = await spotify_service.get_current_playback()
+        if self._generations.get(connection_id, 0) == generation:
+            self._store(connection_id, state)
+        return state
+
+    def _store(self, connection_id: str, state: Optional[Dict[str, Any]]):
+        """Store a state, dropping expired entries and the oldest ones beyond max_entries"""
+        now = time.monotonic()
+        self._entries.pop(connection_id, None)
+        self._entries[connection_id] = {
+            'state': state,
+            'fetched_at': now,
+        }
+        while self._entries:
+            oldest_id, oldest = next(iter(self._entries.items()))
+            if now - oldest['fetched_at'] < self.ttl and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[oldest_id]
+
+    def _bump_generation(self, connection_id: str):
+        self._generations[connection_id] = self._generations.get(connection_id, 0) + 1
+        self._generations.move_to_end(connection_id)
+        while len(self._generations) > self.max_entries:
+            self._generations.popitem(last=False)
+
+
+def _extrapolate(state: Optional[Dict[str, Any]], elapsed: float) -> Optional[Dict[str, Any]]:
+    """
+    Advance progress_ms by the time elapsed since the state was fetched.
+
+    Returns None if the track would already have ended, so the caller refetches
+    instead of guessing what plays next.
+    """
+    if not state or not state.get('is_playing') or state.get('progress_ms') is None:
+        return state
+
+    progress_ms = state['progress_ms'] + int(elapsed * 1000)
+    duration_ms = (state.get('item') or {}).get('duration_ms')
+    if duration_ms and progress_ms >= duration_ms:
+        return None
+
+    extrapolated = dict(state)
+    extrapolated['progress_ms'] = progress_ms
+    return extrapolated
+
+
+# Create a global cache
+playback_cache = PlaybackStateCache()
@@ -0,0 +1,161 @@
+import time
+import asyncio
+from typing import Optional, Dict, Any, Set, Callable, Awaitable, Tuple
+
+from src import config
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+# (event name, payload) pairs delivered to each subscriber
+PlayerEvent = Tuple[str, Dict[str, Any]]
+FetchStatus = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class _Channel:
+    """Poller state and subscribers for one connection"""
+
+    def __init__(self, fetch_status: FetchStatus):
+        self.fetch_status = fetch_status
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_state: Optional[Dict[str, Any]] = None
+        self.boost_until = 0.0
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.polls = 0
+
+
+class PlayerStateHub:
+    """
+    Fans out player state for each connection to any number of stream subscribers.
+
+    A single background poller runs per connection ID while it has subscribers.
+    It polls quickly right after a control action, at a normal pace while music
+    plays and slowly while paused, and only publishes the keys that changed.
+    """
+
+    def __init__(
+        self,
+        playing_interval: float = config.PLAYER_STREAM_PLAYING_INTERVAL_SECONDS,
+        paused_interval: float = config.PLAYER_STREAM_PAUSED_INTERVAL_SECONDS,
+        boost_interval: float = config.PLAYER_STREAM_BOOST_INTERVAL_SECONDS,
+        boost_duration: float = config.PLAYER_STREAM_BOOST_DURATION_SECONDS,
+        queue_size: int = 16,
+    ):
+        self.playing_interval = playing_interval
+        self.paused_interval = paused_interval
+        self.boost_interval = boost_interval
+        self.boost_duration = boost_duration
+        self.queue_size = queue_size
+        self._channels: Dict[str, _Channel] = {}
+
+    def subscribe(self, connection_id: str, fetch_status: FetchStatus) -> asyncio.Queue:
+        """
+        Register a subscriber for a connection and start its poller if needed.
+
+        Args:
+            connection_id: Nango connection ID
+            fetch_status: Coroutine function returning the current player status dict
+
+        Returns:
+            Queue of (event, payload) tuples; the first event is a full "state" snapshot
+            if one is already known
+        """
+        channel = self._channels.get(connection_id)
+        if channel is None:
+            channel = _Channel(fetch_status)
+            self._channels[connection_id] = channel
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        if channel.last_state is not None:
+            queue.put_nowait(("state", channel.last_state))
+        channel.subscribers.add(queue)
+
+        if channel.task is None or channel.task.done():
+            channel.task = asyncio.create_task(self._poll(connection_id, channel))
+        return queue
+
+    def unsubscribe(self, connection_id: str, queue: asyncio.Queue):
+        """Remove a subscriber, stopping the poller when it was the last one"""
+        channel = self._channels.get(connection_id)
+        if channel is None:
+            return
+
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            if channel.task is not None:
+                channel.task.cancel()
+            del self._channels[connection_id]
+
+    def nudge(self, connection_id: str):
+        """Poll immediately and at the boosted rate for a while, e.g. after a control action"""
+        channel = self._channels.get(connection_id)
+        if channel is None:
+            return
+        channel.boost_until = time.monotonic() + self.boost_duration
+        channel.wake.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of active pollers and subscribers"""
+        return {
+            "pollers": len(self._channels),
+            "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+            "polls": sum(channel.polls for channel in self._channels.values()),
+        }
+
+    def _next_interval(self, channel: _Channel) -> float:
+        """Pick how long to wait before the next poll"""
+        if time.monotonic() < channel.boost_until:
+            return self.boost_interval
+        if channel.last_state and channel.last_state.get("is_playing"):
+            return self.playing_interval
+        return self.paused_interval
+
+    async def _poll(self, connection_id: str, channel: _Channel):
+        """Poll player state for one connection and publish changes until cancelled"""
+        while True:
+            channel.wake.clear()
+            try:
+                state = await channel.fetch_status()
+                channel.polls += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("player_stream.poll_error", "Player stream poll failed", connection_id=connection_id, error=str(e))
+                state = None
+
+            if state is not None and state != channel.last_state:
+                previous = channel.last_state
+                channel.last_state = state
+                if previous is None:
+                    self._publish(channel, ("state", state))
+                else:
+                    self._publish(channel, ("diff", _diff(previous, state)))
+
+            try:
+                await asyncio.wait_for(channel.wake.wait(), timeout=self._next_interval(channel))
+            except asyncio.TimeoutError:
+                pass
+
+    def _publish(self, channel: _Channel, event: PlayerEvent):
+        """Deliver an event to every subscriber"""
+        for queue in channel.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow subscriber missed diffs; replace its backlog with a full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("state", channel.last_state))
+
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the keys whose values changed (removed keys are reported as None)"""
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    for key in old.keys() - new.keys():
+        changed[key] = None
+    return changed
+
+
+# Create a global hub
+player_hub = PlayerStateHub()
@@ -0,0 +1,154 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, List, Set, Hashable, Callable, Awaitable
+
+from src.utils.track import Track
+from src.utils.log import get_logger
+from src import config
+
+log = get_logger(__name__)
+
+FetchTracks = Callable[[], Awaitable[List[Track]]]
+
+
+class _UserQueue:
+    """Queued tracks for one connection and the context they were picked for"""
+
+    def __init__(self, context: Hashable, recently_played: int):
+        self.context = context
+        self.tracks: deque = deque()
+        self.recently_played: deque = deque(maxlen=recently_played)
+        self.refill_task: Optional[asyncio.Task] = None
+
+
+class PrefetchQueue:
+    """
+    Per-connection queue of upcoming recommended tracks.
+
+    Each queue belongs to a context (zone and time bucket). Skips pop from the queue
+    immediately while a background task tops it back up to the configured depth;
+    a request from a different context discards the queue.
+    """
+
+    def __init__(
+        self,
+        depth: int = config.PREFETCH_QUEUE_DEPTH,
+        max_connections: int = config.PREFETCH_QUEUE_MAX_CONNECTIONS,
+        recently_played: int = config.PREFETCH_RECENTLY_PLAYED,
+    ):
+        self.depth = depth
+        self.max_connections = max_connections
+        self.recently_played = recently_played
+        self._queues: "OrderedDict[str, _UserQueue]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.refills = 0
+
+    def pop(self, connection_id: str, context: Hashable) -> Optional[Track]:
+        """Take the next queued track for this context, or None if there isn't one"""
+        queue = self._queue_for(connection_id, context)
+        if not queue.tracks:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        track = queue.tracks.popleft()
+        queue.recently_played.append(track.spotify_id)
+        return track
+
+    def peek(self, connection_id: str) -> List[Track]:
+        """Return the currently queued tracks without removing them"""
+        queue = self._queues.get(connection_id)
+        return list(queue.tracks) if queue else []
+
+    def known_ids(self, connection_id: str) -> Set[str]:
+        """Return the ids of tracks recently played or already queued for a connection"""
+        queue = self._queues.get(connection_id)
+        if queue is None:
+            return set()
+        return set(queue.recently_played) | {track.spotify_id for track in queue.tracks}
+
+    def mark_played(self, connection_id: str, context: Hashable, track: Track):
+        """Record a track that was played without coming from the queue"""
+        self._queue_for(connection_id, context).recently_played.append(track.spotify_id)
+
+    def extend(self, connection_id: str, context: Hashable, tracks: List[Track]):
+        """Add tracks to the queue, skipping ones already queued or recently played"""
+        queue = self._queue_for(connection_id, context)
+        known = self.known_ids(connection_id)
+        for track in tracks:
+            if len(queue.tracks) >= self.depth:
+                break
+            if track.spotify_id not in known:
+                known.add(track.spotify_id)
+                queue.tracks.append(track)
+
+    def schedule_refill(self, connection_id: str, context: Hashable, fetch: FetchTracks):
+        """Top the queue up in the background if it's below depth and not already refilling"""
+        queue = self._queue_for(connection_id, context)
+        if len(queue.tracks) >= self.depth:
+            return
+        if queue.refill_task is not None and not queue.refill_task.done():
+            return
+        queue.refill_task = asyncio.create_task(self._refill(connection_id, context, fetch))
+
+    def invalidate(self, connection_id: str):
+        """Drop a connection's queue"""
+        queue = self._queues.pop(connection_id, None)
+        if queue and queue.refill_task is not None:
+            queue.refill_task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue counts and hit/miss counters"""
+        pops = self.hits + self.misses
+        return {
+            "connections": len(self._queues),
+            "depth": self.depth,
+            "queued_tracks": sum(len(queue.tracks) for queue in self._queues.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / pops, 4) if pops else 0.0,
+            "invalidations": self.invalidations,
+            "refills": self.refills,
+        }
+
+    def _queue_for(self, connection_id: str, context: Hashable) -> _UserQueue:
+        """Return the connection's queue, replacing it if the context changed"""
+        queue = self._queues.get(connection_id)
+        if queue is not None and queue.context != context:
+            # The user moved to a different zone or time bucket; queued tracks no longer fit
+            self.invalidations += 1
+            if queue.refill_task is not None:
+                queue.refill_task.cancel()
+            recently_played = queue.recently_played
+            queue = _UserQueue(context, self.recently_played)
+            queue.recently_played.extend(recently_played)
+            self._queues[connection_id] = queue
+        elif queue is None:
+            queue = _UserQueue(context, self.recently_played)
+            self._queues[connection_id] = queue
+            while len(self._queues) > self.max_connections:
+                _, evicted = self._queues.popitem(last=False)
+                if evicted.refill_task is not None:
+                    evicted.refill_task.cancel()
+
+        self._queues.move_to_end(connection_id)
+        return queue
+
+    async def _refill(self, connection_id: str, context: Hashable, fetch: FetchTracks):
+        """Fetch recommendations and add them to the queue if the context still matches"""
+        self.refills += 1
+        try:
+            tracks = await fetch()
+        except Exception as e:
+            log.error("prefetch.refill_error", "Error refilling prefetch queue", connection_id=connection_id, error=str(e))
+            return
+
+        queue = self._queues.get(connection_id)
+        if queue is not None and queue.context == context:
+            self.extend(connection_id, context, tracks)
+
+
+# Create a global queue
+prefetch_queue = PrefetchQueue()
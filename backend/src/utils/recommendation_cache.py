@@ -0,0 +1,156 @@
+import time
+import random
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Mapping, Callable, Awaitable, Hashable
+
+from src.utils.track import Track
+from src.utils.log import get_logger
+from src import config
+
+log = get_logger(__name__)
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+FetchPool = Callable[[], Awaitable[List[Track]]]
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Encode a coordinate as a geohash string of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    use_lon = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if use_lon else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        use_lon = not use_lon
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+class RecommendationCache:
+    """
+    Shared pools of recommended tracks for users in the same place at the same time.
+
+    Pools are keyed by geohash cell, time bucket and quantised audio features. Fresh
+    pools are served directly; stale ones are served while a single background task
+    refreshes them; cold keys share one upstream fetch. Entries are evicted
+    least-recently-used beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.RECOMMENDATION_CACHE_TTL_SECONDS,
+        stale_ttl: float = config.RECOMMENDATION_CACHE_STALE_SECONDS,
+        max_entries: int = config.RECOMMENDATION_CACHE_MAX_ENTRIES,
+        geohash_precision: int = config.RECOMMENDATION_CACHE_GEOHASH_PRECISION,
+        feature_quantum: float = config.RECOMMENDATION_CACHE_FEATURE_QUANTUM,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.geohash_precision = geohash_precision
+        self.feature_quantum = feature_quantum
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def make_key(self, latitude: float, longitude: float, time_bucket: str, audio_features: Mapping[str, float]) -> Tuple:
+        """Build the cache key for a location, time bucket and feature target"""
+        quantised = tuple(
+            (name, round(value / self.feature_quantum))
+            for name, value in sorted(audio_features.items())
+        )
+        return (geohash_encode(latitude, longitude, self.geohash_precision), time_bucket, quantised)
+
+    async def get_or_fetch(self, key: Hashable, fetch: FetchPool, sample_size: int = config.RECOMMENDATION_SAMPLE_SIZE) -> List[Track]:
+        """
+        Return a random sample of the pool for a key, fetching it from upstream when cold.
+
+        Args:
+            key: Key from make_key()
+            fetch: Coroutine function returning the full pool; empty results aren't cached
+            sample_size: Number of tracks to sample from the pool
+
+        Returns:
+            The sampled tracks, shared with the pool (use Track.replace() to modify one)
+        """
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry['fetched_at'] < self.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            if now - entry['fetched_at'] < self.ttl:
+                self.hits += 1
+            else:
+                # Serve the stale pool now and refresh it in the background
+                self.stale_hits += 1
+                self._start_fetch(key, fetch)
+            pool = entry['pool']
+        else:
+            self.misses += 1
+            pool = await asyncio.shield(self._start_fetch(key, fetch))
+
+        return random.sample(pool, min(sample_size, len(pool)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss counters"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _start_fetch(self, key: Hashable, fetch: FetchPool) -> asyncio.Task:
+        """Start (or join) the single upstream fetch for a key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: Hashable, fetch: FetchPool) -> List[Track]:
+        """Fetch a pool from upstream and store it if it isn't empty"""
+        self.refreshes += 1
+        try:
+            pool = await fetch()
+        except Exception as e:
+            log.error("recommendation_cache.refresh_error", "Error refreshing recommendation pool", error=str(e))
+            entry = self._entries.get(key)
+            # Keep serving what we had rather than failing a background refresh
+            return entry['pool'] if entry else []
+
+        if pool:
+            self._entries[key] = {'pool': pool, 'fetched_at': time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return pool
+
+
+# Create a global cache
+recommendation_cache = RecommendationCache()
@@ -0,0 +1,123 @@
+import time
+import asyncio
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+
+from src.utils.track import Track
+from src.utils.tracing import span
+from src.utils.log import get_logger
+from src import config
+
+log = get_logger(__name__)
+
+FetchTracks = Callable[[], Awaitable[List[Track]]]
+
+
+class SourceStats:
+    """Latency and win counters for one recommendation source"""
+
+    def __init__(self, window: int = 200):
+        self.started = 0
+        self.wins = 0
+        self.empty = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies_ms)
+        return {
+            "started": self.started,
+            "wins": self.wins,
+            "win_rate": round(self.wins / self.started, 4) if self.started else 0.0,
+            "empty": self.empty,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "latency_ms_p50": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+        }
+
+
+class HedgedSourcer:
+    """
+    Races recommendation sources in priority order and keeps the first non-empty result.
+
+    The first source starts immediately. Each following source starts once the hedge
+    delay has passed or every source already running has come back empty, whichever
+    is sooner. When one source wins, the others are cancelled.
+    """
+
+    def __init__(self, hedge_delay: float = config.RECOMMENDATION_HEDGE_DELAY_SECONDS):
+        self.hedge_delay = hedge_delay
+        self._stats: Dict[str, SourceStats] = {}
+
+    async def first(self, sources: List[Tuple[str, FetchTracks]]) -> Tuple[Optional[str], List[Track]]:
+        """
+        Return (winning source name, tracks), or (None, []) if every source came back empty.
+
+        Args:
+            sources: (name, coroutine function) pairs in priority order
+        """
+        pending_sources = list(sources)
+        running: Dict[asyncio.Task, Tuple[str, float]] = {}
+
+        def start_next():
+            name, fetch = pending_sources.pop(0)
+            self._source_stats(name).started += 1
+            running[asyncio.ensure_future(_run_source(name, fetch))] = (name, time.monotonic())
+
+        start_next()
+        try:
+            while running:
+                # Strictly sequential mode never hedges; otherwise wait at most the hedge delay
+                timeout = None if self.hedge_delay < 0 or not pending_sources else self.hedge_delay
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name, started_at = running.pop(task)
+                    stats = self._source_stats(name)
+                    stats.latencies_ms.append((time.monotonic() - started_at) * 1000)
+                    try:
+                        tracks = task.result()
+                    except Exception as e:
+                        log.error("recs.source.error", "Recommendation source failed", source=name, error=str(e))
+                        stats.errors += 1
+                        continue
+                    if tracks:
+                        stats.wins += 1
+                        return name, tracks
+                    stats.empty += 1
+
+                # Hedge delay passed, or everything running came back empty
+                if pending_sources and (not done or not running):
+                    start_next()
+            return None, []
+        finally:
+            for task, (name, _) in running.items():
+                task.cancel()
+                self._source_stats(name).cancelled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-source latency percentiles and win rates"""
+        return {
+            "hedge_delay_seconds": self.hedge_delay,
+            "sources": {name: stats.to_dict() for name, stats in self._stats.items()},
+        }
+
+    def _source_stats(self, name: str) -> SourceStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = SourceStats()
+        return stats
+
+
+async def _run_source(name: str, fetch: FetchTracks) -> List[Track]:
+    with span(f"source.{name}") as source_span:
+        tracks = await fetch()
+        if source_span is not None:
+            source_span.attrs["tracks"] = len(tracks)
+        return tracks
+
+
+# Create a global sourcer
+recommendation_sourcer = HedgedSourcer()
@@ -0,0 +1,123 @@
+import time
+import asyncio
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from src import config
+from src.utils.spotify_client import AsyncSpotifyClient
+from src.utils.spotify_scheduler import default_priority, Priority
+
+SearchKey = Tuple[str, str, int, int]
+
+
+def normalise_query(query: str) -> str:
+    """Normalise a search query so trivially different spellings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class SearchCache:
+    """
+    Cache of Spotify search responses keyed by normalised query, type, limit and offset.
+
+    Results aren't user-specific, so all connections share one cache. Responses with
+    results live for ttl and empty ones for negative_ttl; errors aren't cached.
+    Concurrent misses for the same key share one request, and entries are evicted
+    least-recently-used beyond max_entries. Cached responses are shared between
+    callers, so treat them as read-only.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.SEARCH_CACHE_TTL_SECONDS,
+        negative_ttl: float = config.SEARCH_CACHE_NEGATIVE_TTL_SECONDS,
+        max_entries: int = config.SEARCH_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # key -> (response, expires_at)
+        self._entries: "OrderedDict[SearchKey, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._inflight: Dict[SearchKey, asyncio.Task] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, type: str = 'track', limit: int = 10, offset: int = 0) -> SearchKey:
+        return (normalise_query(query), type, limit, offset)
+
+    async def search(self, client: AsyncSpotifyClient, q: str, type: str = 'track', limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """Run a Spotify search through the cache (same arguments as AsyncSpotifyClient.search)"""
+        key = self.make_key(q, type, limit, offset)
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                if _is_empty(response, type):
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return response
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Run the search as its own task so a caller timing out doesn't cancel it for the other waiters
+            task = asyncio.ensure_future(self._fetch(key, client, q, type, limit, offset))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit/miss counters"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _finish(self, key: SearchKey, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark a failure as retrieved: when every waiter was cancelled (e.g. by the hedger), nobody else will
+            task.exception()
+
+    async def _fetch(self, key: SearchKey, client: AsyncSpotifyClient, q: str, type: str, limit: int, offset: int) -> Dict[str, Any]:
+        # Shared with every caller of this key, so don't inherit a prefetch priority from whoever started it
+        default_priority.set(Priority.STATUS)
+        try:
+            response = await client.search(q=q, type=type, limit=limit, offset=offset)
+        except Exception:
+            self.errors += 1
+            raise
+
+        ttl = self.negative_ttl if _is_empty(response, type) else self.ttl
+        self._entries[key] = (response, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return response
+
+
+def _is_empty(response: Optional[Dict[str, Any]], type: str) -> bool:
+    """Whether a search response has no items for the searched type"""
+    return not ((response or {}).get(f"{type}s") or {}).get('items')
+
+
+# Create a global cache
+search_cache = SearchCache()
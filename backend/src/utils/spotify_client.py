@@ -0,0 +1,149 @@
+import httpx
+from typing import Optional, Dict, Any, List
+
+from src import config
+from src.utils.http_clients import get_http_client
+from src.utils.spotify_scheduler import spotify_scheduler, Priority
+from src.utils.circuit_breaker import breakers
+from src.utils.tracing import span
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class SpotifyAPIError(Exception):
+    """Error response from the Spotify Web API"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"http status: {status}, {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AsyncSpotifyClient:
+    """
+    Minimal asyncio-native Spotify Web API client.
+
+    Covers the endpoints the app uses (player state and controls, search, tracks, me)
+    and shares the app's pooled Spotify httpx.AsyncClient across all connections,
+    so no call ever blocks the event loop. Every call is admitted by the shared
+    rate-limit scheduler (see spotify_scheduler) under the client's user key.
+    """
+
+    def __init__(self, access_token: str, user_key: Optional[str] = None):
+        self.access_token = access_token
+        self.user_key = user_key or access_token
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        priority: Optional[Priority] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Send a request to the Web API and return the decoded JSON body (None if empty).
+
+        The call waits for the scheduler at the given priority (default: the current
+        context's). A 429 holds all calls for its Retry-After, and this call is retried
+        once after it if the wait is short.
+        """
+        response = await self._send(method, path, params, json, priority)
+        if response.status_code == 429:
+            retry_after = _retry_after(response)
+            spotify_scheduler.throttle(retry_after)
+            if retry_after is not None and retry_after <= config.SPOTIFY_MAX_RETRY_AFTER_SECONDS:
+                log.warning("spotify.rate_limited", "Spotify rate limited; retrying", method=method, path=path, retry_after=retry_after)
+                response = await self._send(method, path, params, json, priority)
+                if response.status_code == 429:
+                    spotify_scheduler.throttle(_retry_after(response))
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error', {}).get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise SpotifyAPIError(response.status_code, message, _retry_after(response))
+
+        if response.status_code == 204 or not response.content:
+            return None
+        return response.json()
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        priority: Optional[Priority],
+    ) -> httpx.Response:
+        """Wait for the scheduler, then send one request through the Spotify circuit breaker"""
+        breaker = breakers["spotify"]
+        # Fail fast instead of queueing for a call that would be short-circuited anyway
+        if breaker.is_open:
+            breaker.before_call()
+        with span("spotify.scheduler_wait"):
+            await spotify_scheduler.acquire(self.user_key, priority)
+        with breaker.guard() as call:
+            response = await get_http_client("spotify").request(
+                method,
+                path,
+                params=params,
+                json=json,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+            )
+            if response.status_code >= 500:
+                call.failed()
+        return response
+
+    async def current_playback(self) -> Optional[Dict[str, Any]]:
+        """Get the user's current playback state (None if nothing is active)"""
+        return await self._request("GET", "/me/player")
+
+    async def start_playback(self, uris: Optional[List[str]] = None, device_id: Optional[str] = None):
+        """Start or resume playback, optionally with a list of track URIs"""
+        params = {"device_id": device_id} if device_id else None
+        body = {"uris": uris} if uris else None
+        await self._request("PUT", "/me/player/play", params=params, json=body, priority=Priority.CONTROL)
+
+    async def pause_playback(self):
+        """Pause playback"""
+        await self._request("PUT", "/me/player/pause", priority=Priority.CONTROL)
+
+    async def next_track(self):
+        """Skip to the next track"""
+        await self._request("POST", "/me/player/next", priority=Priority.CONTROL)
+
+    async def previous_track(self):
+        """Skip to the previous track"""
+        await self._request("POST", "/me/player/previous", priority=Priority.CONTROL)
+
+    async def seek_track(self, position_ms: int):
+        """Seek to a position in the current track"""
+        await self._request("PUT", "/me/player/seek", params={"position_ms": position_ms}, priority=Priority.CONTROL)
+
+    async def search(self, q: str, type: str = 'track', limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """Search the Spotify catalog"""
+        return await self._request("GET", "/search", params={"q": q, "type": type, "limit": limit, "offset": offset})
+
+    async def track(self, track_id: str) -> Dict[str, Any]:
+        """Get a single track by ID"""
+        return await self._request("GET", f"/tracks/{track_id}")
+
+    async def tracks(self, track_ids: List[str]) -> Dict[str, Any]:
+        """Get up to 50 tracks by ID in one call"""
+        return await self._request("GET", "/tracks", params={"ids": ",".join(track_ids)})
+
+    async def current_user(self) -> Dict[str, Any]:
+        """Get the current user's profile"""
+        return await self._request("GET", "/me")
+
+
+def _retry_after(response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds (None if missing or malformed)"""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
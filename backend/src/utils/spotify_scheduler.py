@@ -0,0 +1,231 @@
+import time
+import heapq
+import asyncio
+import itertools
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Optional, Dict, Any, List, Tuple
+
+from src import config
+
+
+class Priority(IntEnum):
+    """Spotify call priority classes (lower goes first)"""
+    CONTROL = 0   # user-initiated player actions
+    STATUS = 1    # playback state polls and live recommendation requests
+    PREFETCH = 2  # background work nobody is waiting on
+
+
+# Priority for calls that don't pass one explicitly; background tasks set it to PREFETCH
+default_priority: ContextVar[Priority] = ContextVar("spotify_priority", default=Priority.STATUS)
+
+
+class RateLimitedError(Exception):
+    """Raised instead of queueing a background call when the scheduler is saturated"""
+
+
+class TokenBucket:
+    """Token bucket refilled at rate per second up to capacity, which can also be blocked until a time"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def ready_in(self, now: float) -> float:
+        """Seconds until a token can be taken (0 if one is available now)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float):
+        """Hand out nothing before the given time, then restart with a single token"""
+        if until > self.blocked_until:
+            self.blocked_until = until
+            self.tokens = min(self.capacity, 1.0)
+            self.updated = until
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+
+class _Waiter:
+    __slots__ = ("user_key", "future", "enqueued_at")
+
+    def __init__(self, user_key: str, future: asyncio.Future, enqueued_at: float):
+        self.user_key = user_key
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class SpotifyScheduler:
+    """
+    Central admission control for outbound Spotify Web API calls.
+
+    Every call takes a token from the app-wide bucket and from its user's bucket.
+    When tokens run out, calls queue by priority (then arrival), and a user who is
+    out of tokens doesn't hold up other users' calls behind them. A 429 blocks the
+    app bucket for its Retry-After. Queue depth and wait times are tracked per
+    priority class.
+    """
+
+    def __init__(
+        self,
+        app_rate: float = config.SPOTIFY_APP_RATE_PER_SECOND,
+        app_burst: float = config.SPOTIFY_APP_BURST,
+        user_rate: float = config.SPOTIFY_USER_RATE_PER_SECOND,
+        user_burst: float = config.SPOTIFY_USER_BURST,
+        max_users: int = config.SPOTIFY_SCHEDULER_MAX_USERS,
+        max_queue: int = config.SPOTIFY_SCHEDULER_MAX_QUEUE,
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.max_queue = max_queue
+        self._app = TokenBucket(app_rate, app_burst)
+        self._users: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.throttled = 0
+        self.rejected = 0
+        self._granted = {priority: 0 for priority in Priority}
+        self._total_wait = {priority: 0.0 for priority in Priority}
+        self._max_wait = {priority: 0.0 for priority in Priority}
+        self._recent_waits = {priority: deque(maxlen=512) for priority in Priority}
+
+    async def acquire(self, user_key: str, priority: Optional[Priority] = None):
+        """Wait until a call for this user may be sent"""
+        priority = Priority(priority if priority is not None else default_priority.get())
+        now = time.monotonic()
+        user = self._user_bucket(user_key)
+        if not self._queue and self._app.ready_in(now) == 0 and user.ready_in(now) == 0:
+            self._grant(user, now)
+            self._record_wait(priority, 0.0)
+            return
+
+        if priority == Priority.PREFETCH and len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitedError("Spotify call queue is full")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(user_key, loop.create_future(), now)
+        heapq.heappush(self._queue, (int(priority), next(self._seq), waiter))
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+
+        # A cancelled caller leaves a done future behind, which the dispatcher skips
+        await waiter.future
+        self._record_wait(priority, time.monotonic() - now)
+
+    def throttle(self, retry_after: Optional[float]):
+        """Record a 429 from Spotify and hold every call until Retry-After has passed"""
+        self.throttled += 1
+        self._app.block(time.monotonic() + (retry_after if retry_after is not None else 1.0))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and wait times per priority class"""
+        queued = {priority: 0 for priority in Priority}
+        for priority, _, waiter in self._queue:
+            if not waiter.future.done():
+                queued[Priority(priority)] += 1
+
+        classes = {}
+        for priority in Priority:
+            waits = sorted(self._recent_waits[priority])
+            granted = self._granted[priority]
+            classes[priority.name.lower()] = {
+                "queued": queued[priority],
+                "granted": granted,
+                "avg_wait_ms": round(self._total_wait[priority] / granted * 1000, 2) if granted else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                "max_wait_ms": round(self._max_wait[priority] * 1000, 2),
+            }
+        return {
+            "queue_depth": sum(queued.values()),
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "blocked_for_seconds": round(max(0.0, self._app.blocked_until - time.monotonic()), 3),
+            "app_tokens": round(self._app.tokens, 2),
+            "users": len(self._users),
+            "priorities": classes,
+        }
+
+    def _user_bucket(self, user_key: str) -> TokenBucket:
+        bucket = self._users.get(user_key)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate, self.user_burst)
+            self._users[user_key] = bucket
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_key)
+        return bucket
+
+    def _grant(self, user: TokenBucket, now: float):
+        self._app.take(now)
+        user.take(now)
+
+    def _record_wait(self, priority: Priority, wait: float):
+        self._granted[priority] += 1
+        self._total_wait[priority] += wait
+        self._max_wait[priority] = max(self._max_wait[priority], wait)
+        self._recent_waits[priority].append(wait)
+
+    async def _dispatch(self):
+        """Release queued calls in priority order as tokens become available"""
+        while True:
+            self._queue = [entry for entry in self._queue if not entry[2].future.done()]
+            if not self._queue:
+                return
+            heapq.heapify(self._queue)
+
+            now = time.monotonic()
+            delay = self._app.ready_in(now)
+            chosen = None
+            if delay == 0:
+                delay = float("inf")
+                for entry in sorted(self._queue):
+                    user_delay = self._user_bucket(entry[2].user_key).ready_in(now)
+                    if user_delay == 0:
+                        chosen = entry
+                        break
+                    delay = min(delay, user_delay)
+
+            if chosen is None:
+                # Sleep until a bucket refills, or until a new call (or a 429) changes the picture
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._queue.remove(chosen)
+            waiter = chosen[2]
+            self._grant(self._user_bucket(waiter.user_key), now)
+            waiter.future.set_result(None)
+
+
+# Create a global scheduler
+spotify_scheduler = SpotifyScheduler()
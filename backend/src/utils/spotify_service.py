@@ -1,176 +1,152 @@
-import spotipy
 import os
-import httpx
+import time
+import asyncio
 from typing import Optional, Dict, Any
 
+from src import config
+from src.utils.credential_cache import credential_cache
+from src.utils.spotify_client import AsyncSpotifyClient, SpotifyAPIError
+from src.utils.spotify_scheduler import RateLimitedError
+from src.utils.circuit_breaker import breakers, CircuitOpenError
+from src.utils.track import Track
+from src.utils.track_metadata import track_metadata
+from src.utils.search_cache import search_cache
+from src.utils.log import get_logger
+
+log = get_logger(__name__)
+
 class SpotifyService:
-    def __init__(self):
-        """Initialize Spotify API client with Nango integration"""
+    def __init__(self, connection_id: Optional[str] = None):
+        """Initialize Spotify API client with Nango integration for a single connection"""
         self.nango_secret_key = os.getenv('NANGO_SECRET_KEY')
         self.spotify = None
-        self.connection_id = None
-        
-        if not self.nango_secret_key:
-            print("⚠️  Warning: NANGO_SECRET_KEY not set. Spotify functionality will be limited.")
-    
-    def set_connection(self, connection_id: str) -> bool:
-        """Set the Nango connection ID - actual initialization happens lazily"""
         self.connection_id = connection_id
-        # Don't initialize immediately since this is a sync method
-        # Initialization will happen on first API call
-        return True
-    
-    async def _initialize_spotify_client(self) -> bool:
-        """Initialize Spotify client using Nango credentials"""
+        # Unix timestamp at which the current access token stops being valid (None if unknown)
+        self.token_expires_at: Optional[float] = None
+        self.last_used = time.monotonic()
+        self._init_lock = asyncio.Lock()
+
+    def touch(self):
+        """Mark this client as recently used"""
+        self.last_used = time.monotonic()
+
+    def token_expires_within(self, seconds: float) -> bool:
+        """Check whether the access token expires within the given number of seconds"""
+        if self.token_expires_at is None:
+            return False
+        return self.token_expires_at - time.time() <= seconds
+
+    async def ensure_initialized(self, refresh_margin: float = 0) -> bool:
+        """Initialize the client if needed, or re-initialize it if the token is about to expire"""
+        if self.spotify and not self.token_expires_within(refresh_margin):
+            return True
+
+        # Only one request per connection talks to Nango; the others wait and reuse its result
+        async with self._init_lock:
+            if self.spotify and not self.token_expires_within(refresh_margin):
+                return True
+            return await self._initialize_spotify_client()
+
+    async def _initialize_spotify_client(self, force_refresh: bool = False) -> bool:
+        """Initialize Spotify client using (cached) Nango credentials"""
         if not self.connection_id or not self.nango_secret_key:
             return False
             
         try:
-            # Get connection credentials from Nango
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"https://api.nango.dev/connection/{self.connection_id}",
-                    headers={
-                        "Authorization": f"Bearer {self.nango_secret_key}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "provider_config_key": "spotify"
-                    }
-                )
-                
-                if response.status_code == 200:
-                    connection_data = response.json()
-                    print(f"🔍 Nango connection data: {connection_data}")
-                    
-                    # Check what scopes are available
-                    credentials = connection_data.get('credentials', {})
-                    raw_creds = credentials.get('raw', {})
-                    scopes = raw_creds.get('scope', '').split(' ') if raw_creds.get('scope') else []
-                    print(f"🔑 Available scopes: {scopes}")
-                    
-                    access_token = credentials.get('access_token')
-                    
-                    if access_token:
-                        # Print first few characters of token for debugging (don't log full token for security)
-                        print(f"🔑 Access token received: {access_token[:20]}...")
-                        # Initialize Spotipy client with the access token
-                        self.spotify = spotipy.Spotify(auth=access_token)
-                        print("✅ Spotify API client initialized with Nango credentials")
-                        return True
-                    else:
-                        print("❌ No access token found in Nango connection")
-                        return False
-                else:
-                    print(f"❌ Failed to get Nango connection: {response.status_code}")
-                    return False
+            credentials = await credential_cache.get(self.connection_id, force_refresh=force_refresh)
+            if not credentials:
+                log.warning("spotify.init.no_credentials", "No Nango credentials available for this connection", connection_id=self.connection_id)
+                return False
+            
+            self.token_expires_at = credentials['expires_at']
+            # Initialize the async Web API client with the access token
+            self.spotify = AsyncSpotifyClient(credentials['access_token'], user_key=self.connection_id)
+            log.info("spotify.init", "Spotify API client initialized with Nango credentials", connection_id=self.connection_id)
+            return True
                     
         except Exception as e:
-            print(f"❌ Error initializing Spotify client with Nango: {e}")
+            log.error("spotify.init.error", "Error initializing Spotify client with Nango", connection_id=self.connection_id, error=str(e))
             return False
 
-    def search_track(self, track_name: str, artist_name: str) -> Optional[Dict[str, Any]]:
+    async def search_track(self, track_name: str, artist_name: str) -> Optional[Dict[str, Any]]:
         """Search for a track and return metadata including album cover"""
         if not self.spotify:
-            print("❌ Spotify API not available")
+            log.warning("spotify.unavailable", "Spotify API not available")
             return None
             
         try:
-            # Search for the track
+            # Search for the track (repeated lookups are served from the shared search cache)
             query = f"track:{track_name} artist:{artist_name}"
-            results = self.spotify.search(q=query, type='track', limit=1)
+            results = await search_cache.search(self.spotify, q=query, type='track', limit=1)
             
             if results['tracks']['items']:
-                track = results['tracks']['items'][0]
+                # Extract relevant information, including every album cover size
+                track_info = Track.from_spotify(results['tracks']['items'][0]).to_dict(cover_sizes=True)
                 
-                # Extract relevant information
-                track_info = {
-                    'spotify_id': track['id'],
-                    'name': track['name'],
-                    'artist': track['artists'][0]['name'],
-                    'album': track['album']['name'],
-                    'duration_ms': track['duration_ms'],
-                    'album_cover_url': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                    'album_cover_640': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                    'album_cover_300': track['album']['images'][1]['url'] if len(track['album']['images']) > 1 else None,
-                    'album_cover_64': track['album']['images'][2]['url'] if len(track['album']['images']) > 2 else None,
-                    'preview_url': track['preview_url'],  # 30-second preview
-                    'external_urls': track['external_urls'],
-                    'popularity': track['popularity']
-                }
-                
-                print(f"✅ Found track: {track_info['name']} by {track_info['artist']}")
+                log.debug("spotify.search.found", "Found track", name=track_info['name'], artist=track_info['artist'])
                 return track_info
             else:
-                print(f"❌ No results found for {track_name} by {artist_name}")
+                log.debug("spotify.search.not_found", "No results found", name=track_name, artist=artist_name)
                 return None
                 
         except Exception as e:
-            print(f"❌ Error searching for track: {e}")
+            log.error("spotify.search.error", "Error searching for track", error=str(e))
             return None
 
-    def get_track_by_id(self, spotify_id: str) -> Optional[Dict[str, Any]]:
+    async def get_track_by_id(self, spotify_id: str) -> Optional[Dict[str, Any]]:
         """Get track information by Spotify ID"""
         if not self.spotify:
             return None
             
         try:
-            track = self.spotify.track(spotify_id)
-            return {
-                'spotify_id': track['id'],
-                'name': track['name'],
-                'artist': track['artists'][0]['name'],
-                'album': track['album']['name'],
-                'duration_ms': track['duration_ms'],
-                'album_cover_url': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                'preview_url': track['preview_url'],
-                'external_urls': track['external_urls']
-            }
+            # Goes through the shared resolver, so concurrent lookups are batched and cached
+            tracks = await track_metadata.resolve([spotify_id], self.spotify)
+            track = tracks.get(spotify_id)
+            return track.to_dict() if track else None
         except Exception as e:
-            print(f"❌ Error getting track by ID: {e}")
+            log.error("spotify.track.error", "Error getting track by ID", spotify_id=spotify_id, error=str(e))
             return None
 
     async def get_current_playback(self) -> Optional[Dict[str, Any]]:
         """Get current playback state"""
         if not self.spotify:
-            print("❌ Spotify client not initialized")
+            log.warning("spotify.unavailable", "Spotify client not initialized")
             return None
             
         try:
-            print("🔍 Fetching current playback state...")
-            playback = self.spotify.current_playback()
+            playback = await self.spotify.current_playback()
             
             if playback is None:
-                print("⚠️  No active playback session found")
+                log.debug("player.playback.none", "No active playback session found", connection_id=self.connection_id)
                 return None
             elif not playback:
-                print("⚠️  Empty playback response")
+                log.debug("player.playback.empty", "Empty playback response", connection_id=self.connection_id)
                 return None
             else:
-                print(f"✅ Got playback state: playing={playback.get('is_playing')}, device={playback.get('device', {}).get('name', 'Unknown')}")
+                log.info("player.playback", "Got playback state", connection_id=self.connection_id, playing=playback.get('is_playing'),
+                         device=(playback.get('device') or {}).get('name', 'Unknown'))
                 return playback
                 
         except Exception as e:
-            print(f"❌ Error getting current playback: {e}")
-            print(f"❌ Error type: {type(e).__name__}")
-            print(f"❌ Error details: {str(e)}")
+            log.error("player.playback.error", "Error getting current playback", connection_id=self.connection_id,
+                      error_type=type(e).__name__, error=str(e))
             
-            # Try to refresh connection and retry once
-            print("🔄 Attempting to refresh Spotify connection...")
-            if await self._initialize_spotify_client():
+            # Try to refresh connection and retry once (not for rate limiting, which a retry only makes worse)
+            if not _should_reconnect(e):
+                return None
+            if await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    print("🔄 Retrying playback request...")
-                    playback = self.spotify.current_playback()
+                    playback = await self.spotify.current_playback()
                     if playback:
-                        print("✅ Retry successful!")
+                        log.info("player.playback.retry", "Playback retry after reconnect succeeded", connection_id=self.connection_id)
                         return playback
                     else:
-                        print("⚠️  Retry returned empty playback")
+                        log.debug("player.playback.retry_empty", "Retry returned empty playback", connection_id=self.connection_id)
                         return None
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.playback.retry_failed", "Playback retry failed", connection_id=self.connection_id, error=str(retry_e))
             else:
-                print("❌ Failed to refresh Spotify connection")
+                log.error("spotify.reconnect_failed", "Failed to refresh Spotify connection", connection_id=self.connection_id)
             return None
 
     async def start_playback(self):
@@ -179,15 +155,15 @@ class SpotifyService:
             raise Exception("Spotify API not available")
             
         try:
-            self.spotify.start_playback()
+            await self.spotify.start_playback()
         except Exception as e:
-            print(f"❌ Error starting playback: {e}")
+            log.error("player.control.error", "Error starting playback", action="play", connection_id=self.connection_id, error=str(e))
             # Try to refresh connection and retry
-            if await self._initialize_spotify_client():
+            if _should_reconnect(e) and await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    self.spotify.start_playback()
+                    await self.spotify.start_playback()
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.control.retry_failed", "Retry failed", connection_id=self.connection_id, error=str(retry_e))
                     raise
             else:
                 raise
@@ -198,15 +174,15 @@ class SpotifyService:
             raise Exception("Spotify API not available")
             
         try:
-            self.spotify.pause_playback()
+            await self.spotify.pause_playback()
         except Exception as e:
-            print(f"❌ Error pausing playback: {e}")
+            log.error("player.control.error", "Error pausing playback", action="pause", connection_id=self.connection_id, error=str(e))
             # Try to refresh connection and retry
-            if await self._initialize_spotify_client():
+            if _should_reconnect(e) and await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    self.spotify.pause_playback()
+                    await self.spotify.pause_playback()
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.control.retry_failed", "Retry failed", connection_id=self.connection_id, error=str(retry_e))
                     raise
             else:
                 raise
@@ -217,15 +193,15 @@ class SpotifyService:
             raise Exception("Spotify API not available")
             
         try:
-            self.spotify.next_track()
+            await self.spotify.next_track()
         except Exception as e:
-            print(f"❌ Error skipping to next track: {e}")
+            log.error("player.control.error", "Error skipping to next track", action="next", connection_id=self.connection_id, error=str(e))
             # Try to refresh connection and retry
-            if await self._initialize_spotify_client():
+            if _should_reconnect(e) and await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    self.spotify.next_track()
+                    await self.spotify.next_track()
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.control.retry_failed", "Retry failed", connection_id=self.connection_id, error=str(retry_e))
                     raise
             else:
                 raise
@@ -236,15 +212,15 @@ class SpotifyService:
             raise Exception("Spotify API not available")
             
         try:
-            self.spotify.previous_track()
+            await self.spotify.previous_track()
         except Exception as e:
-            print(f"❌ Error skipping to previous track: {e}")
+            log.error("player.control.error", "Error skipping to previous track", action="previous", connection_id=self.connection_id, error=str(e))
             # Try to refresh connection and retry
-            if await self._initialize_spotify_client():
+            if _should_reconnect(e) and await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    self.spotify.previous_track()
+                    await self.spotify.previous_track()
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.control.retry_failed", "Retry failed", connection_id=self.connection_id, error=str(retry_e))
                     raise
             else:
                 raise
@@ -255,22 +231,56 @@ class SpotifyService:
             raise Exception("Spotify API not available")
             
         try:
-            self.spotify.seek_track(position_ms)
+            await self.spotify.seek_track(position_ms)
         except Exception as e:
-            print(f"❌ Error seeking to position: {e}")
+            log.error("player.control.error", "Error seeking to position", action="seek", connection_id=self.connection_id, error=str(e))
             # Try to refresh connection and retry
-            if await self._initialize_spotify_client():
+            if _should_reconnect(e) and await self._initialize_spotify_client(force_refresh=True):
                 try:
-                    self.spotify.seek_track(position_ms)
+                    await self.spotify.seek_track(position_ms)
                 except Exception as retry_e:
-                    print(f"❌ Retry failed: {retry_e}")
+                    log.error("player.control.retry_failed", "Retry failed", connection_id=self.connection_id, error=str(retry_e))
                     raise
             else:
                 raise
 
+    async def wait_for_track(
+        self,
+        track_uri: str,
+        timeout: float = config.PLAYBACK_CONFIRM_TIMEOUT_SECONDS,
+        initial_interval: float = config.PLAYBACK_CONFIRM_INITIAL_INTERVAL_SECONDS,
+        max_interval: float = config.PLAYBACK_CONFIRM_MAX_INTERVAL_SECONDS,
+        backoff: float = config.PLAYBACK_CONFIRM_BACKOFF,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Poll playback state until the player reports the given track, with backing-off intervals.
+
+        Returns:
+            The confirming playback state, or None if the deadline passed first
+        """
+        deadline = time.monotonic() + timeout
+        interval = initial_interval
+        while True:
+            playback = await self.get_current_playback()
+            if playback and (playback.get('item') or {}).get('uri') == track_uri:
+                return playback
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                log.warning("player.confirm_timeout", "Playback not confirmed in time", track_uri=track_uri, timeout=timeout)
+                return None
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * backoff, max_interval)
+
     def is_available(self) -> bool:
         """Check if Spotify API is available"""
         return self.spotify is not None
 
-# Create a global instance
-spotify_service = SpotifyService()
+
+def _should_reconnect(error: Exception) -> bool:
+    """Whether an error is worth fetching fresh credentials and retrying for (auth or transport failures, never 429s)"""
+    if isinstance(error, (RateLimitedError, CircuitOpenError)) or breakers["nango"].is_open:
+        return False
+    if isinstance(error, SpotifyAPIError):
+        return error.status == 401
+    return True
@@ -0,0 +1,264 @@
+"""
+Lightweight per-request tracing.
+
+A traced endpoint opens a root span; span() blocks inside it (including in tasks
+started from it, which inherit the context) record nested stage timings. When the
+request takes longer than the slow threshold, its span tree is kept in a bounded
+buffer for /debug/traces. With TRACE_PROFILE_SAMPLE_RATE set, a share of traced
+requests also get a statistical profile of the event loop thread attached.
+
+span() costs one ContextVar lookup when no trace is active, so it is safe on hot paths.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import functools
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Iterator
+
+from src import config
+
+
+class Span:
+    """One timed stage of a request, with the stages nested inside it"""
+
+    __slots__ = ("name", "attrs", "start", "end", "error", "children")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List["Span"] = []
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """Serialise the span tree, with times in ms relative to origin (the trace start)"""
+        result = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round((self.end - self.start) * 1000, 2) if self.end is not None else None,
+        }
+        if self.attrs:
+            result["attrs"] = dict(self.attrs)
+        if self.error:
+            result["error"] = self.error
+        if self.children:
+            result["children"] = [child.to_dict(origin) for child in list(self.children)]
+        return result
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span (does nothing outside a trace)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, attrs)
+    if len(parent.children) < config.TRACE_MAX_CHILD_SPANS:
+        parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except asyncio.CancelledError:
+        child.error = "cancelled"
+        raise
+    except Exception as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def annotate(**attrs):
+    """Add attributes to the current span"""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def detach():
+    """Stop recording spans in the current context (for background work outliving the request)"""
+    _current_span.set(None)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling one thread's Python stack from a background thread.
+
+    The event loop runs every request, so samples include whatever else the loop was
+    doing at the time; the idle loop shows up as selector waits.
+    """
+
+    def __init__(self, thread_id: int, interval: float = config.TRACE_PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, top_n: int = config.TRACE_PROFILE_TOP_N) -> Dict[str, Any]:
+        """Stop sampling and summarise the hottest stacks and functions"""
+        self._stop.set()
+        # Called on the event loop: don't wait on a sample in progress, just stop counting new ones
+        self._thread.join(timeout=0.01)
+        with self._lock:
+            stacks = Counter(self._stacks)
+            samples = self.samples
+
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in stacks.items():
+            self_samples[stack[-1]] += count
+            for function in set(stack):
+                total_samples[function] += count
+
+        return {
+            "samples": samples,
+            "interval_ms": self.interval * 1000,
+            # Folded stacks (root;...;leaf), the input format for flame graph tools
+            "top_stacks": [{"stack": ";".join(stack), "samples": count} for stack, count in stacks.most_common(top_n)],
+            "top_functions": [
+                {"function": function, "self_samples": count, "total_samples": total_samples[function]}
+                for function, count in self_samples.most_common(top_n)
+            ],
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < 64:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack and not self._stop.is_set():
+                with self._lock:
+                    self._stacks[tuple(reversed(stack))] += 1
+                    self.samples += 1
+
+
+class Tracer:
+    """Records span trees for traced requests and keeps the slowest ones"""
+
+    def __init__(
+        self,
+        enabled: bool = config.TRACE_ENABLED,
+        slow_threshold: float = config.TRACE_SLOW_THRESHOLD_SECONDS,
+        max_traces: int = config.TRACE_MAX_SLOW_TRACES,
+        profile_rate: float = config.TRACE_PROFILE_SAMPLE_RATE,
+    ):
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.profile_rate = profile_rate
+        self._traces: deque = deque(maxlen=max_traces)
+        self._profiling = False
+        self.traced = 0
+        self.slow = 0
+        self.profiled = 0
+
+    @contextmanager
+    def trace(self, name: str, **attrs) -> Iterator[Optional[Span]]:
+        """Record a root span for a request; kept if slow (or profiled)"""
+        if not self.enabled:
+            yield None
+            return
+
+        root = Span(name, attrs)
+        token = _current_span.set(root)
+        profiler = self._start_profiler()
+        self.traced += 1
+        try:
+            yield root
+        except asyncio.CancelledError:
+            root.error = "cancelled"
+            raise
+        except Exception as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.end = time.perf_counter()
+            _current_span.reset(token)
+            profile = None
+            if profiler is not None:
+                profile = profiler.stop()
+                self._profiling = False
+            self._finish(root, profile)
+
+    def traces(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return kept traces, newest first"""
+        traces = list(reversed(self._traces))
+        return traces[:limit] if limit is not None else traces
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "slow_threshold_seconds": self.slow_threshold,
+            "profile_sample_rate": self.profile_rate,
+            "traced": self.traced,
+            "slow": self.slow,
+            "profiled": self.profiled,
+            "kept": len(self._traces),
+        }
+
+    def _start_profiler(self) -> Optional[SamplingProfiler]:
+        # One profile at a time: overlapping profilers would sample the same loop twice
+        if self.profile_rate <= 0 or self._profiling or random.random() >= self.profile_rate:
+            return None
+        self._profiling = True
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        return profiler
+
+    def _finish(self, root: Span, profile: Optional[Dict[str, Any]]):
+        duration = root.end - root.start
+        slow = duration >= self.slow_threshold
+        if slow:
+            self.slow += 1
+        if profile is not None:
+            self.profiled += 1
+        if not slow and profile is None:
+            return
+
+        trace = {
+            "name": root.name,
+            "timestamp": time.time() - duration,
+            "duration_ms": round(duration * 1000, 2),
+            "slow": slow,
+            # Serialised now; background work still running appears without a duration
+            "spans": root.to_dict(root.start),
+        }
+        if profile is not None:
+            trace["profile"] = profile
+        self._traces.append(trace)
+
+
+def traced(name: str):
+    """Decorator tracing every call of an async endpoint as a root span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.trace(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Create a global tracer
+tracer = Tracer()
@@ -0,0 +1,202 @@
+import re
+import sys
+from typing import Optional, Dict, Any, Mapping
+
+from src.utils.media_cache import media_url
+
+SPOTIFY_TRACK_URL = "https://open.spotify.com/track/"
+
+UNKNOWN_TRACK = "Unknown Track"
+UNKNOWN_ARTIST = "Unknown Artist"
+UNKNOWN_ALBUM = "Unknown Album"
+
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+_SPOTIFY_TRACK_URL = re.compile(r"open\.spotify\.com/track/([0-9A-Za-z]{22})")
+
+# Fields that can be filled in from a Spotify /tracks lookup, and the ones worth a lookup when missing
+_METADATA_SLOTS = (
+    "name", "artist", "album", "duration_ms", "album_cover_url", "album_cover_300",
+    "album_cover_64", "preview_url", "spotify_url", "popularity",
+)
+_REQUIRED_SLOTS = ("name", "artist", "album", "duration_ms", "album_cover_url", "spotify_url", "popularity")
+
+# Optional keys that only appear in responses when they've been set
+_OPTIONAL_KEYS = ("reccobeats_score", "local_distance", "recommendation_reason", "location_type", "time_of_day")
+
+
+def is_spotify_id(value: Any) -> bool:
+    """Whether a value looks like a Spotify base62 track id"""
+    return isinstance(value, str) and _SPOTIFY_ID.match(value) is not None
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern repeated strings (artists, albums, annotations) so cached tracks share one copy"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Track:
+    """
+    Compact record for a recommended track.
+
+    Tracks are shared between the recommendation cache, the local catalog and the
+    prefetch queues, so treat them as read-only once annotated (use replace() to get
+    a modified copy). to_dict() produces the track dict the API has always returned.
+    """
+
+    __slots__ = (
+        "spotify_id", "name", "artist", "album", "duration_ms", "album_cover_url", "album_cover_300",
+        "album_cover_64", "preview_url", "spotify_url", "popularity", "reccobeats_score", "local_distance",
+        "recommendation_reason", "location_type", "time_of_day", "audio_features",
+    )
+
+    def __init__(
+        self,
+        spotify_id: str,
+        name: str,
+        artist: str,
+        album: str,
+        duration_ms: int = 0,
+        album_cover_url: Optional[str] = None,
+        preview_url: Optional[str] = None,
+        spotify_url: Optional[str] = None,
+        popularity: Optional[int] = None,
+        album_cover_300: Optional[str] = None,
+        album_cover_64: Optional[str] = None,
+    ):
+        self.spotify_id = spotify_id
+        self.name = name
+        self.artist = _intern(artist)
+        self.album = _intern(album)
+        self.duration_ms = duration_ms
+        self.album_cover_url = album_cover_url
+        self.album_cover_300 = album_cover_300
+        self.album_cover_64 = album_cover_64
+        self.preview_url = preview_url
+        self.spotify_url = spotify_url
+        self.popularity = popularity
+        self.reccobeats_score = None
+        self.local_distance = None
+        self.recommendation_reason = None
+        self.location_type = None
+        self.time_of_day = None
+        self.audio_features = None
+
+    @classmethod
+    def from_spotify(cls, data: Dict[str, Any]) -> "Track":
+        """Parse a Spotify Web API track object"""
+        album = data.get('album') or {}
+        images = album.get('images') or ()
+        artists = data.get('artists') or ()
+        return cls(
+            spotify_id=data['id'],
+            name=data['name'],
+            artist=artists[0]['name'] if artists else None,
+            album=album.get('name'),
+            duration_ms=data.get('duration_ms') or 0,
+            album_cover_url=images[0]['url'] if images else None,
+            album_cover_300=images[1]['url'] if len(images) > 1 else None,
+            album_cover_64=images[2]['url'] if len(images) > 2 else None,
+            preview_url=data.get('preview_url'),
+            spotify_url=(data.get('external_urls') or {}).get('spotify'),
+            popularity=data.get('popularity'),
+        )
+
+    @classmethod
+    def from_reccobeats(cls, data: Dict[str, Any]) -> Optional["Track"]:
+        """Parse a Reccobeats recommendation, accepting its alternative field names (None without an id)"""
+        # Reccobeats uses its own ids; the Spotify id is in the track's Spotify link when not given directly
+        href_match = _SPOTIFY_TRACK_URL.search(data.get('href') or '')
+        spotify_id = data.get('spotify_id') or (href_match and href_match.group(1)) or data.get('id', data.get('track_id'))
+        if not spotify_id:
+            return None
+
+        artist = data.get('artist', data.get('artist_name', data.get('artists', UNKNOWN_ARTIST)))
+        if isinstance(artist, list):
+            artist = _name_of(artist[0]) if artist else UNKNOWN_ARTIST
+        album = data.get('album', data.get('album_name', UNKNOWN_ALBUM))
+
+        track = cls(
+            spotify_id=spotify_id,
+            name=data.get('name', data.get('title', data.get('track_name', data.get('trackTitle', UNKNOWN_TRACK)))),
+            artist=_name_of(artist),
+            album=_name_of(album),
+            duration_ms=data.get('duration_ms', data.get('duration', data.get('durationMs', 0))),
+            album_cover_url=data.get('album_cover_url', data.get('image_url', data.get('cover_url'))),
+            preview_url=data.get('preview_url'),
+            spotify_url=(data.get('external_urls') or {}).get('spotify') or data.get('href'),
+            popularity=data.get('popularity'),
+        )
+        track.reccobeats_score = data.get('score', data.get('confidence', 0))
+        return track
+
+    def needs_metadata(self) -> bool:
+        """Whether cover art, popularity or other basic metadata is missing"""
+        return any(_is_missing(getattr(self, slot)) for slot in _REQUIRED_SLOTS)
+
+    def fill_missing(self, other: "Track"):
+        """Copy metadata from another record of the same track into fields this one lacks"""
+        for slot in _METADATA_SLOTS:
+            if _is_missing(getattr(self, slot)):
+                setattr(self, slot, getattr(other, slot))
+
+    def annotate(self, reason: str, location_type: str, time_of_day: str, audio_features: Optional[Mapping[str, float]] = None):
+        """Record why the track was recommended (audio_features is shared, not copied)"""
+        self.recommendation_reason = _intern(reason)
+        self.location_type = _intern(location_type)
+        self.time_of_day = _intern(time_of_day)
+        self.audio_features = audio_features
+
+    def replace(self, **changes) -> "Track":
+        """Return a shallow copy with some fields changed"""
+        track = Track.__new__(Track)
+        for slot in Track.__slots__:
+            setattr(track, slot, changes[slot] if slot in changes else getattr(self, slot))
+        return track
+
+    def to_dict(self, cover_sizes: bool = False) -> Dict[str, Any]:
+        """
+        Serialise to the API's track dict (cover_sizes adds the 640/300/64 album art urls).
+
+        The *_media_url keys are API paths serving the same files from the media cache
+        (None when the source url can't be proxied); clients should prefer them.
+        """
+        result = {
+            'spotify_id': self.spotify_id,
+            'name': self.name,
+            'artist': self.artist,
+            'album': self.album,
+            'duration_ms': self.duration_ms,
+            'album_cover_url': self.album_cover_url,
+            'album_cover_media_url': media_url(self.album_cover_url),
+            'preview_url': self.preview_url,
+            'preview_media_url': media_url(self.preview_url),
+            'external_urls': {'spotify': self.spotify_url} if self.spotify_url else {},
+            'popularity': self.popularity,
+        }
+        if cover_sizes:
+            result['album_cover_640'] = self.album_cover_url
+            result['album_cover_300'] = self.album_cover_300
+            result['album_cover_64'] = self.album_cover_64
+            result['album_cover_300_media_url'] = media_url(self.album_cover_300)
+            result['album_cover_64_media_url'] = media_url(self.album_cover_64)
+        for key in _OPTIONAL_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
+        if self.audio_features is not None:
+            result['audio_features_used'] = dict(self.audio_features)
+        return result
+
+    def __repr__(self) -> str:
+        return f"Track({self.spotify_id!r}, {self.name!r}, {self.artist!r})"
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or value == 0 or value in (UNKNOWN_TRACK, UNKNOWN_ARTIST, UNKNOWN_ALBUM)
+
+
+def _name_of(value: Any) -> Any:
+    """Reccobeats sometimes nests artists/albums as objects with a name"""
+    if isinstance(value, dict):
+        return value.get('name')
+    return value
@@ -0,0 +1,209 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+from src.utils.spotify_client import AsyncSpotifyClient, SpotifyAPIError
+from src.utils.spotify_scheduler import default_priority, Priority
+from src.utils.track import Track, is_spotify_id
+from src.utils.tracing import span
+from src.utils.log import get_logger
+from src import config
+
+log = get_logger(__name__)
+
+
+class TrackMetadataResolver:
+    """
+    Batched, cached lookups of Spotify track metadata.
+
+    Ids requested within a short window (across concurrent requests) are collected
+    into one multi-id /tracks call of up to batch_size ids, using the client of the
+    request that opened the batch; if Spotify rejects its token, the batch is retried
+    once with the client of another request that joined it. Results, including ids
+    Spotify doesn't know, are kept in a bounded LRU cache; ids already being fetched
+    are shared rather than requested again.
+    """
+
+    def __init__(
+        self,
+        batch_window: float = config.TRACK_METADATA_BATCH_WINDOW_SECONDS,
+        batch_size: int = config.TRACK_METADATA_BATCH_SIZE,
+        max_entries: int = config.TRACK_METADATA_CACHE_MAX_ENTRIES,
+        ttl: float = config.TRACK_METADATA_CACHE_TTL_SECONDS,
+        negative_ttl: float = config.TRACK_METADATA_NEGATIVE_TTL_SECONDS,
+    ):
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # track id -> (track or None if Spotify doesn't know it, expires_at)
+        self._entries: "OrderedDict[str, Tuple[Optional[Track], float]]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Clients of the requests waiting on pending ids, in the order they joined
+        self._pending_clients: List[AsyncSpotifyClient] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_ids = 0
+        self.errors = 0
+        self.auth_retries = 0
+        self.timeouts = 0
+        self.evictions = 0
+
+    async def resolve(self, track_ids: Iterable[str], client: AsyncSpotifyClient) -> Dict[str, Optional[Track]]:
+        """
+        Look up tracks by Spotify id.
+
+        Args:
+            track_ids: Spotify track ids (anything that isn't a valid id resolves to None)
+            client: Spotify client for the batch these ids join
+
+        Returns:
+            Dict of id -> Track, or None for ids that couldn't be resolved
+        """
+        results: Dict[str, Optional[Track]] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        joined_pending = False
+        now = time.monotonic()
+
+        for track_id in dict.fromkeys(track_ids):
+            if not is_spotify_id(track_id):
+                # One malformed id would make Spotify reject the whole batch
+                results[track_id] = None
+                continue
+
+            entry = self._entries.get(track_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(track_id)
+                self.hits += 1
+                results[track_id] = entry[0]
+                continue
+
+            self.misses += 1
+            future = self._pending.get(track_id)
+            joined_pending = joined_pending or future is not None
+            if future is None:
+                future = self._inflight.get(track_id)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._pending[track_id] = future
+                joined_pending = True
+            waiting[track_id] = future
+
+        if joined_pending and client not in self._pending_clients:
+            self._pending_clients.append(client)
+        if len(self._pending) >= self.batch_size:
+            self._flush(full_batches_only=True)
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+        for track_id, future in waiting.items():
+            # Shielded so a cancelled caller doesn't fail the lookup for everyone else waiting on it
+            results[track_id] = await asyncio.shield(future)
+        return results
+
+    async def enrich(self, tracks: List[Track], client: Optional[AsyncSpotifyClient], timeout: float = config.TRACK_METADATA_TIMEOUT_SECONDS):
+        """Fill in missing cover art, popularity and other metadata in place (best effort, bounded by timeout)"""
+        missing = [track for track in tracks if track.needs_metadata()]
+        if not missing or client is None:
+            return
+
+        try:
+            with span("track_metadata.enrich", tracks=len(missing)):
+                resolved = await asyncio.wait_for(self.resolve([track.spotify_id for track in missing], client), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            log.warning("track_metadata.timeout", "Track metadata lookup timed out", tracks=len(missing))
+            return
+
+        for track in missing:
+            metadata = resolved.get(track.spotify_id)
+            if metadata is not None:
+                track.fill_missing(metadata)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size, hit ratio and batching counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "pending": len(self._pending),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_ids / self.batches, 2) if self.batches else 0.0,
+            "errors": self.errors,
+            "auth_retries": self.auth_retries,
+            "timeouts": self.timeouts,
+            "evictions": self.evictions,
+        }
+
+    def _flush(self, full_batches_only: bool = False):
+        """
+        Send pending ids as /tracks calls of up to batch_size ids.
+
+        With full_batches_only, a partial remainder stays pending for the window timer.
+        """
+        track_ids = list(self._pending)
+        send = len(track_ids) - len(track_ids) % self.batch_size if full_batches_only else len(track_ids)
+        clients = list(self._pending_clients)
+        for start in range(0, send, self.batch_size):
+            batch = {track_id: self._pending.pop(track_id) for track_id in track_ids[start:min(start + self.batch_size, send)]}
+            self._inflight.update(batch)
+            asyncio.ensure_future(self._fetch_batch(batch, clients))
+
+        if not self._pending:
+            self._pending_clients = []
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+
+    async def _fetch_batch(self, batch: Dict[str, asyncio.Future], clients: List[AsyncSpotifyClient]):
+        # The batch serves every request that joined it, so don't inherit a prefetch priority from the one that opened it
+        default_priority.set(Priority.STATUS)
+        self.batches += 1
+        self.batched_ids += len(batch)
+        found: Optional[Dict[str, Track]] = None
+        try:
+            try:
+                response = await clients[0].tracks(list(batch))
+            except SpotifyAPIError as e:
+                if e.status != 401 or len(clients) < 2:
+                    raise
+                # The opener's token was rejected; the others waiting on the batch shouldn't fail with it
+                self.auth_retries += 1
+                response = await clients[1].tracks(list(batch))
+            found = {data['id']: Track.from_spotify(data) for data in (response or {}).get('tracks') or [] if data}
+        except Exception as e:
+            # Not cached, so the next request tries again
+            self.errors += 1
+            log.error("track_metadata.error", "Error fetching track metadata", tracks=len(batch), error=str(e))
+        finally:
+            now = time.monotonic()
+            for track_id, future in batch.items():
+                self._inflight.pop(track_id, None)
+                track = found.get(track_id) if found is not None else None
+                if found is not None:
+                    self._store(track_id, track, now + (self.ttl if track else self.negative_ttl))
+                if not future.done():
+                    future.set_result(track)
+
+    def _store(self, track_id: str, track: Optional[Track], expires_at: float):
+        self._entries[track_id] = (track, expires_at)
+        self._entries.move_to_end(track_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+# Create a global resolver
+track_metadata = TrackMetadataResolver()
@@ -0,0 +1,142 @@
+import os
+import json
+import math
+from typing import Optional, Dict, Any, List, Tuple
+
+from src import config
+
+# Coordinates are (latitude, longitude) pairs
+Point = Tuple[float, float]
+
+
+class Zone:
+    """A named area with a location type, described by a bounding box and optional polygon"""
+
+    __slots__ = ("name", "type", "priority", "lat_min", "lat_max", "lon_min", "lon_max", "polygon", "building_types", "area")
+
+    def __init__(
+        self,
+        name: str,
+        type: str,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float,
+        priority: int = 0,
+        polygon: Optional[List[Point]] = None,
+        building_types: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.type = type
+        self.priority = priority
+        self.lat_min = lat_min
+        self.lat_max = lat_max
+        self.lon_min = lon_min
+        self.lon_max = lon_max
+        self.polygon = tuple(polygon) if polygon else None
+        self.building_types = tuple(building_types or ())
+        self.area = (lat_max - lat_min) * (lon_max - lon_min)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Zone":
+        """Build a zone from its data-file entry (either a "bbox" or a "polygon" of [lat, lon] points)"""
+        polygon = [tuple(point) for point in data["polygon"]] if data.get("polygon") else None
+        if polygon:
+            lats = [lat for lat, _ in polygon]
+            lons = [lon for _, lon in polygon]
+            bbox = {"lat_min": min(lats), "lat_max": max(lats), "lon_min": min(lons), "lon_max": max(lons)}
+        else:
+            bbox = data["bbox"]
+
+        return cls(
+            name=data["name"],
+            type=data["type"],
+            priority=data.get("priority", 0),
+            polygon=polygon,
+            building_types=data.get("building_types"),
+            **bbox,
+        )
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Check whether a point lies inside this zone"""
+        if not (self.lat_min <= lat <= self.lat_max and self.lon_min <= lon <= self.lon_max):
+            return False
+        if self.polygon is None:
+            return True
+        return _point_in_polygon(lat, lon, self.polygon)
+
+
+class ZoneIndex:
+    """
+    Uniform-grid spatial index over zones.
+
+    Each grid cell stores the zones whose bounding box overlaps it, pre-sorted so
+    that higher-priority (then smaller) zones come first. A lookup is one dict access
+    plus a containment test on the few candidates in that cell.
+    """
+
+    def __init__(self, zones: List[Zone], cell_size: float = config.ZONE_INDEX_CELL_SIZE_DEGREES):
+        self.cell_size = cell_size
+        self.zones = list(zones)
+        self._cells: Dict[Tuple[int, int], Tuple[Zone, ...]] = {}
+
+        cells: Dict[Tuple[int, int], List[Zone]] = {}
+        for zone in self.zones:
+            for cell in self._cells_for_bbox(zone):
+                cells.setdefault(cell, []).append(zone)
+
+        # Overlaps resolve to the highest priority, then the most specific (smallest) zone
+        for cell, candidates in cells.items():
+            candidates.sort(key=lambda zone: (-zone.priority, zone.area))
+            self._cells[cell] = tuple(candidates)
+
+    @classmethod
+    def from_file(cls, path: str, cell_size: float = config.ZONE_INDEX_CELL_SIZE_DEGREES) -> "ZoneIndex":
+        """Load zones from a JSON data file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        zones = [Zone.from_dict(entry) for entry in data.get("zones", [])]
+        return cls(zones, cell_size=cell_size)
+
+    def __len__(self) -> int:
+        return len(self.zones)
+
+    def lookup(self, lat: float, lon: float) -> Optional[Zone]:
+        """Return the zone containing the point, or None if it isn't in any zone"""
+        candidates = self._cells.get((math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)))
+        if candidates:
+            for zone in candidates:
+                if zone.contains(lat, lon):
+                    return zone
+        return None
+
+    def _cells_for_bbox(self, zone: Zone):
+        """Yield every grid cell the zone's bounding box overlaps"""
+        for lat_cell in range(math.floor(zone.lat_min / self.cell_size), math.floor(zone.lat_max / self.cell_size) + 1):
+            for lon_cell in range(math.floor(zone.lon_min / self.cell_size), math.floor(zone.lon_max / self.cell_size) + 1):
+                yield (lat_cell, lon_cell)
+
+
+def _point_in_polygon(lat: float, lon: float, polygon: Tuple[Point, ...]) -> bool:
+    """Ray-casting point-in-polygon test"""
+    inside = False
+    lat_j, lon_j = polygon[-1]
+    for lat_i, lon_i in polygon:
+        if (lat_i > lat) != (lat_j > lat):
+            crossing_lon = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < crossing_lon:
+                inside = not inside
+        lat_j, lon_j = lat_i, lon_i
+    return inside
+
+
+_zone_index: Optional[ZoneIndex] = None
+
+
+def get_zone_index() -> ZoneIndex:
+    """Return the zone index, loading it from ZONES_PATH on first use"""
+    global _zone_index
+    if _zone_index is None:
+        _zone_index = ZoneIndex.from_file(config.ZONES_PATH)
+        print(f"🗺️ Loaded {len(_zone_index)} zones from {os.path.basename(config.ZONES_PATH)}")
+    return _zone_index
@@ -11,7 +11,7 @@ import cuid from 'cuid';
 
 import ExploreIcon from '@mui/icons-material/Explore';
 import RepeatIcon from '@mui/icons-material/Repeat';
-import { getPlayerStatus, playMusic, pauseMusic, nextTrack, previousTrack, seekToPosition, setConnectionId as setApiConnectionId } from './services/api';
+import { getPlayerStatus, playMusic, pauseMusic, nextTrack, previousTrack, seekToPosition, setConnectionId as setApiConnectionId, albumCoverSrc } from './services/api';
 import type { PlayerState } from './services/api';
 
 function formatTime(seconds: number) {
@@ -526,7 +526,7 @@ function App() {
               </div>
             )}
             <img
-              src={playerState.current_song.album_cover}
+              src={albumCoverSrc(playerState.current_song)}
               alt="Album Cover"
               className="w-32 h-32 lg:w-40 lg:h-40 rounded-lg mb-3 lg:mb-4 shadow-md object-cover"
             />
@@ -32,9 +32,14 @@ export interface Song {
   artist: string;
   album: string;
   album_cover: string;
+  album_cover_media_url?: string | null; // Same image served from the backend's media cache
   spotify_id?: string; // Spotify track ID
 }
 
+// Album art URL, preferring the backend's media cache over Spotify's CDN
+export const albumCoverSrc = (song: Song): string =>
+  song.album_cover_media_url ? `${API_BASE_URL}${song.album_cover_media_url}` : song.album_cover;
+
 export interface PlayerState {
   is_playing: boolean;
   current_song: Song | null;